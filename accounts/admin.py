@@ -1,7 +1,7 @@
 # admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Resident, BarangayStaff
+from .models import CustomUser, Resident, BarangayStaff, OutboundEmail, DocumentUpload
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -23,3 +23,17 @@ class CustomUserAdmin(UserAdmin):
 admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(Resident)
 admin.site.register(BarangayStaff)
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
+
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
+
+class DocumentUploadAdmin(admin.ModelAdmin):
+    list_display = ('original_name', 'resident', 'status', 'attempts', 'next_attempt_at', 'uploaded_at')
+    list_filter = ('status',)
+    search_fields = ('original_name', 'resident__last_name', 'resident__user__email')
+
+admin.site.register(DocumentUpload, DocumentUploadAdmin)
@@ -0,0 +1,49 @@
+from .models import AuditEvent
+
+
+def record_event(actor, action, target_id=None, **data):
+    """
+    Append an audit event.
+
+    Call it inside the transaction that makes the change, so the event and the
+    change are committed or rolled back together.
+
+    Args:
+        actor: The user who made the change (or None for system changes)
+        action: One of the AuditEvent action constants
+        target_id: Id of the resident, appointment or account that changed
+        **data: Extra details worth keeping, such as a reason or the previous value
+
+    Returns:
+        AuditEvent: The stored event
+    """
+    data = {key: value for key, value in data.items() if value not in (None, '')}
+    return AuditEvent.objects.create(
+        actor_id=getattr(actor, 'pk', actor),
+        action=action,
+        target_id=target_id,
+        data=data or None,
+    )
+
+
+def record_events(actor, action, target_ids, **data):
+    """
+    Append one audit event per target in a single INSERT.
+
+    Used by bulk changes such as the expiry sweep, which change many rows
+    with one UPDATE but still need an event for each of them.
+
+    Args:
+        actor: The user who made the change (or None for system changes)
+        action: One of the AuditEvent action constants
+        target_ids: Ids of the residents, appointments or accounts that changed
+        **data: Extra details shared by every event
+
+    Returns:
+        list[AuditEvent]: The stored events
+    """
+    data = {key: value for key, value in data.items() if value not in (None, '')}
+    return AuditEvent.objects.bulk_create([
+        AuditEvent(actor_id=getattr(actor, 'pk', actor), action=action, target_id=target_id, data=data or None)
+        for target_id in target_ids
+    ])
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 60 * 60
+# A claimed email becomes due again after this long if its worker dies mid-send
+EMAIL_LEASE_SECONDS = 10 * 60
+
+
+def queue_email(subject, template_name, context, recipient, from_email='no-reply@barangay-office.com'):
+    """
+    Render a notification email and store it in the outbox.
+
+    The templates are rendered now, so the email can still be sent after the
+    objects in ``context`` have been deleted.
+
+    Args:
+        subject: Email subject line
+        template_name: Template path without extension; both ``.txt`` and ``.html`` are rendered
+        context: Template context
+        recipient: Recipient email address
+        from_email: Sender address
+
+    Returns:
+        OutboundEmail: The queued email
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        from_email=from_email,
+        to=recipient,
+        text_body=render_to_string(f'{template_name}.txt', context),
+        html_body=render_to_string(f'{template_name}.html', context),
+    )
+
+
+def _schedule_retry(email, error, now):
+    email.attempts += 1
+    email.last_error = error
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        delay = min(RETRY_BASE_SECONDS * 2 ** (email.attempts - 1), RETRY_MAX_SECONDS)
+        email.next_attempt_at = now + timedelta(seconds=delay)
+
+
+def _claim_batch(batch_size, now):
+    """Lease a batch of due emails so no other worker picks them up while they are being sent."""
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_at=now + timedelta(seconds=EMAIL_LEASE_SECONDS)
+        )
+    return batch
+
+
+def send_queued_emails(batch_size=50):
+    """
+    Send one batch of due outbox emails over a single SMTP connection.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED in a short
+    transaction that leases them for EMAIL_LEASE_SECONDS, so several workers
+    can drain the outbox without sending the same email twice and a slow SMTP
+    server never holds row locks or a database transaction open. Failed sends
+    are retried with exponential backoff until MAX_ATTEMPTS.
+
+    Args:
+        batch_size: Maximum number of emails to send
+
+    Returns:
+        tuple[int, int]: Number of emails sent and number that failed this round
+    """
+    now = timezone.now()
+    sent = failed = 0
+
+    batch = _claim_batch(batch_size, now)
+    if not batch:
+        return sent, failed
+
+    mail_connection = get_connection()
+    try:
+        mail_connection.open()
+    except Exception as e:
+        for email in batch:
+            _schedule_retry(email, f"Could not connect: {e}", now)
+        failed = len(batch)
+    else:
+        for email in batch:
+            try:
+                message = EmailMultiAlternatives(
+                    email.subject, email.text_body, email.from_email, [email.to],
+                    connection=mail_connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, "text/html")
+                message.send()
+            except Exception as e:
+                _schedule_retry(email, str(e), now)
+                failed += 1
+            else:
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.attempts += 1
+                sent += 1
+    finally:
+        mail_connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+
+    return sent, failed
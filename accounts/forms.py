@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from .models import CustomUser, Resident, BarangayStaff
 
@@ -226,6 +227,21 @@ class ResidentForm(forms.ModelForm):
         widget=forms.TextInput(attrs={'placeholder': 'Enter your nationality'})
     )
 
+    @staticmethod
+    def document_size_message():
+        return f"Document must be {settings.MAX_DOCUMENT_UPLOAD_SIZE // (1024 * 1024)} MB or smaller."
+
+    def reject_oversized_document(self):
+        """Flag a document whose upload was stopped for passing MAX_DOCUMENT_UPLOAD_SIZE."""
+        self.is_valid()
+        self.add_error('address_document_file', self.document_size_message())
+
+    def clean_address_document_file(self):
+        document_file = self.cleaned_data.get('address_document_file')
+        if document_file and document_file.size > settings.MAX_DOCUMENT_UPLOAD_SIZE:
+            raise forms.ValidationError(self.document_size_message())
+        return document_file
+
     def clean_phone_number(self):
         phone_number = self.cleaned_data.get('phone_number')
         if phone_number:
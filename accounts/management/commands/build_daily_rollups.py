@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.reports import build_pending_rollups, rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recount the daily report rollups for the days that changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild every day from scratch instead of only the changed ones',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and build every N seconds (default: build once and exit)',
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            rows = rebuild_daily_rollups()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt report rollups: {rows} rows written.'))
+            return
+
+        interval = options['interval']
+        while True:
+            close_old_connections()
+            days = build_pending_rollups()
+            self.stdout.write(self.style.SUCCESS(f'Recounted report rollups for {days} changed day(s).'))
+
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from accounts.utils import process_document_uploads
+
+
+class Command(BaseCommand):
+    help = 'Upload staged registration documents to Supabase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Maximum uploads per round')
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and poll for staged documents every N seconds (default: run once and exit)',
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        interval = options['interval']
+
+        while True:
+            close_old_connections()
+            uploaded, failed = process_document_uploads(limit)
+
+            if uploaded or failed or interval <= 0:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Uploaded {uploaded} document(s), {failed} failed.')
+                )
+
+            if interval <= 0:
+                break
+            time.sleep(interval)
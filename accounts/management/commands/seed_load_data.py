@@ -0,0 +1,226 @@
+import csv
+import io
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import BarangayStaff, CustomUser, Resident
+from accounts.reports import rebuild_daily_rollups
+from appointments.models import Appointment, SlotUsage
+
+# Every generated account uses this domain so the dataset can be found and flushed
+LOAD_EMAIL_DOMAIN = 'load.test'
+
+FIRST_NAMES = [
+    'Juan', 'Maria', 'Jose', 'Ana', 'Pedro', 'Rosa', 'Mark', 'Grace', 'John', 'Mary',
+    'Angelo', 'Kristine', 'Carlo', 'Joy', 'Miguel', 'Andrea', 'Paolo', 'Camille', 'Rafael', 'Bea',
+]
+LAST_NAMES = [
+    'Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Gonzales', 'Bautista', 'Villanueva',
+    'Ramos', 'Aquino', 'Castillo', 'Rivera', 'Navarro', 'Fernandez', 'Lopez', 'Tan', 'Lim', 'Cabrera',
+]
+STREETS = ['Rizal St.', 'Mabini St.', 'Bonifacio St.', 'Luna St.', 'Colon St.', 'Osmena Blvd.', 'Jakosalem St.']
+
+# 30-minute slots from 8:00 AM to 4:30 PM; mornings are busiest and lunch is quiet
+TIME_SLOTS = [time(hour, minute) for hour in range(8, 17) for minute in (0, 30)]
+TIME_WEIGHTS = [1 if slot.hour == 12 else 4 if slot.hour < 12 else 3 for slot in TIME_SLOTS]
+
+CERTIFICATE_WEIGHTS = {
+    'barangay_clearance': 50,
+    'certificate_of_indigency': 25,
+    'community_tax_certificate': 15,
+    'solo_parent_certificate': 10,
+}
+PURPOSE_WEIGHTS = {
+    'employment': 30,
+    'education': 20,
+    'government_benefits': 15,
+    'business_permit': 10,
+    'loan_application': 10,
+    'others': 10,
+    'travel': 5,
+}
+PAST_STATUS_WEIGHTS = {'completed': 55, 'claimed': 20, 'cancelled': 15, 'no_show': 10}
+UPCOMING_STATUS_WEIGHTS = {'approved': 50, 'pending': 40, 'cancelled': 10}
+APPROVAL_WEIGHTS = {'approved': 85, 'pending': 10, 'rejected': 5}
+
+APPOINTMENT_COLUMNS = [
+    'resident_id', 'certificate_type', 'preferred_date', 'preferred_time', 'purpose',
+    'specify_purpose', 'status', 'cancellation_reason', 'created_at',
+]
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset of residents, staff and appointments for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residents', type=int, default=1000, help='Number of resident accounts')
+        parser.add_argument('--staff', type=int, default=10, help='Number of staff accounts')
+        parser.add_argument('--appointments', type=int, default=100000, help='Number of appointments')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same dataset')
+        parser.add_argument('--today', type=str, help='Anchor date for the generated schedule (YYYY-MM-DD, default: today)')
+        parser.add_argument('--days-back', type=int, default=365, help='How far into the past appointments go')
+        parser.add_argument('--days-ahead', type=int, default=60, help='How far into the future appointments go')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per insert')
+        parser.add_argument('--password', type=str, default='loadtest', help='Password for every generated account')
+        parser.add_argument('--flush', action='store_true', help='Delete a previously generated dataset first')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        try:
+            today = datetime.strptime(options['today'], '%Y-%m-%d').date() if options['today'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('--today must use the YYYY-MM-DD format.')
+        if options['residents'] < 1 and options['appointments'] > 0:
+            raise CommandError('Appointments need at least one resident.')
+
+        load_users = CustomUser.objects.filter(email__endswith=f'@{LOAD_EMAIL_DOMAIN}')
+        if options['flush']:
+            self.flush(load_users)
+        elif load_users.exists():
+            raise CommandError('A load dataset already exists. Run again with --flush to replace it.')
+
+        rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        password = make_password(options['password'])
+
+        resident_ids = self.create_residents(rng, options['residents'], password, today)
+        self.create_staff(rng, options['staff'], password, today)
+
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        dates = [
+            today + timedelta(days=offset)
+            for offset in range(-options['days_back'], options['days_ahead'] + 1)
+            if (today + timedelta(days=offset)).weekday() < 5
+        ]
+        if not dates:
+            raise CommandError('The date range contains no weekdays.')
+        self.create_appointments(rng, options['appointments'], resident_ids, dates, today, use_copy)
+
+        rows = SlotUsage.rebuild()
+        rebuild_daily_rollups()
+        # Cached dashboard summaries predate the generated rows
+        cache.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['residents']} residents, {options['staff']} staff and "
+            f"{options['appointments']} appointments ({rows} slot usage rows)."
+        ))
+
+    def flush(self, load_users):
+        # Raw delete: the ORM collector would fire a post_delete signal per appointment
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Appointment._meta.db_table} WHERE resident_id IN '
+                f'(SELECT id FROM {CustomUser._meta.db_table} WHERE email LIKE %s)',
+                [f'%@{LOAD_EMAIL_DOMAIN}'],
+            )
+            deleted, _ = load_users.delete()
+        self.stdout.write(f'Removed the previous load dataset ({deleted} rows).')
+
+    def create_users(self, rng, count, role, password, today):
+        users = []
+        for index in range(count):
+            joined = today - timedelta(days=rng.randint(0, 730))
+            users.append(CustomUser(
+                email=f'{role}{index}@{LOAD_EMAIL_DOMAIN}',
+                role=role,
+                password=password,
+                date_joined=timezone.make_aware(datetime.combine(joined, time())),
+            ))
+        CustomUser.objects.bulk_create(users, batch_size=self.batch_size)
+        # Re-read the ids so this works on backends that do not return them from bulk inserts
+        return list(
+            CustomUser.objects.filter(role=role, email__endswith=f'@{LOAD_EMAIL_DOMAIN}')
+            .order_by('id').values_list('id', 'email')
+        )
+
+    def create_residents(self, rng, count, password, today):
+        users = self.create_users(rng, count, 'resident', password, today)
+        residents = []
+        for user_id, email in users:
+            approval_status = weighted(rng, APPROVAL_WEIGHTS)
+            resident = Resident(
+                user_id=user_id,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                date_of_birth=today - timedelta(days=rng.randint(18 * 365, 80 * 365)),
+                address=f'{rng.randint(1, 999)} {rng.choice(STREETS)}, Labangon, Cebu City',
+                phone_number=f'09{rng.randint(0, 999999999):09d}',
+                sex=rng.choice(['M', 'F']),
+                civil_status=rng.choice(['single', 'married', 'widowed', 'separated']),
+                citizenship='Filipino',
+                approval_status=approval_status,
+                approval_date=self.now if approval_status != 'pending' else None,
+            )
+            # bulk_create skips Resident.save(), which normally fills this
+            resident.search_text = resident.build_search_text(email)
+            residents.append(resident)
+        Resident.objects.bulk_create(residents, batch_size=self.batch_size)
+        self.stdout.write(f'Created {len(residents)} residents.')
+        # Only verified residents book appointments
+        approved = [resident.user_id for resident in residents if resident.approval_status == 'approved']
+        return approved or [user_id for user_id, _ in users]
+
+    def create_staff(self, rng, count, password, today):
+        users = self.create_users(rng, count, 'staff', password, today)
+        BarangayStaff.objects.bulk_create([
+            BarangayStaff(user_id=user_id, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+            for user_id, _ in users
+        ], batch_size=self.batch_size)
+        self.stdout.write(f'Created {len(users)} staff.')
+
+    def appointment_rows(self, rng, count, resident_ids, dates, today):
+        for _ in range(count):
+            preferred_date = rng.choice(dates)
+            status = weighted(rng, PAST_STATUS_WEIGHTS if preferred_date < today else UPCOMING_STATUS_WEIGHTS)
+            purpose = weighted(rng, PURPOSE_WEIGHTS)
+            yield (
+                rng.choice(resident_ids),
+                weighted(rng, CERTIFICATE_WEIGHTS),
+                preferred_date,
+                rng.choices(TIME_SLOTS, weights=TIME_WEIGHTS)[0],
+                purpose,
+                'Scholarship requirement' if purpose == 'others' else None,
+                status,
+                'Resident requested cancellation' if status == 'cancelled' else None,
+                self.now,
+            )
+
+    def create_appointments(self, rng, count, resident_ids, dates, today, use_copy):
+        rows = self.appointment_rows(rng, count, resident_ids, dates, today)
+        written = 0
+        while written < count:
+            batch = [row for _, row in zip(range(self.batch_size), rows)]
+            with transaction.atomic():
+                if use_copy:
+                    self.copy_appointments(batch)
+                else:
+                    Appointment.objects.bulk_create(
+                        [Appointment(**dict(zip(APPOINTMENT_COLUMNS, row))) for row in batch]
+                    )
+            written += len(batch)
+            self.stdout.write(f'  {written}/{count} appointments')
+
+    def copy_appointments(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        sql = f"COPY {Appointment._meta.db_table} ({', '.join(APPOINTMENT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        with connection.cursor() as cursor:
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy_expert'):
+                raw_cursor.copy_expert(sql, buffer)
+            else:
+                with raw_cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
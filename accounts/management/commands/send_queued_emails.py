@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from accounts.emails import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send pending notification emails from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails sent per SMTP connection')
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and poll the outbox every N seconds (default: drain once and exit)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+
+        while True:
+            close_old_connections()
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = send_queued_emails(batch_size)
+                total_sent += sent
+                total_failed += failed
+                # Stop once a batch comes back short; failed rows wait for their backoff.
+                if sent + failed < batch_size or sent == 0:
+                    break
+
+            if total_sent or total_failed or interval <= 0:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Sent {total_sent} email(s), {total_failed} failed.')
+                )
+
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -1,4 +1,5 @@
 import os
+from django.core.files import File
 from django.core.management.base import BaseCommand
 from accounts.utils import upload_document_to_supabase
 from django.conf import settings
@@ -23,21 +24,13 @@ class Command(BaseCommand):
             return
             
         try:
-            # Create a simple file-like object
-            class SimpleFile:
-                def __init__(self, path):
-                    self.name = os.path.basename(path)
-                    self.content_type = 'image/jpeg' if path.lower().endswith('.jpg') or path.lower().endswith('.jpeg') else 'application/pdf'
-                    with open(path, 'rb') as f:
-                        self.data = f.read()
-                
-                def read(self):
-                    return self.data
-                    
-            file_obj = SimpleFile(file_path)
+            # Wrap the file on disk so it is streamed rather than read into memory
+            file_obj = File(open(file_path, 'rb'), name=os.path.basename(file_path))
+            file_obj.content_type = 'image/jpeg' if file_path.lower().endswith('.jpg') or file_path.lower().endswith('.jpeg') else 'application/pdf'
             
             # Upload the document
-            url = upload_document_to_supabase(file_obj, resident_id)
+            with file_obj:
+                url = upload_document_to_supabase(file_obj, resident_id)
             
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully uploaded document! URL: {url}')
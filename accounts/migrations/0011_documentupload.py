@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('staged_name', models.CharField(max_length=255)),
+                ('original_name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(default='application/octet-stream', max_length=100)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('uploaded', 'Uploaded'), ('dead', 'Dead')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('uploaded_at', models.DateTimeField(blank=True, null=True)),
+                ('resident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to='accounts.resident')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='document_upload_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_documentupload'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resident',
+            index=models.Index(fields=['approval_status', 'user'], name='resident_approval_user_idx'),
+        ),
+    ]
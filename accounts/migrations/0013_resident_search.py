@@ -0,0 +1,55 @@
+from django.db import migrations, models
+
+
+def fill_search_text(apps, schema_editor):
+    Resident = apps.get_model('accounts', 'Resident')
+    residents = Resident.objects.select_related('user').only(
+        'first_name', 'middle_name', 'last_name', 'phone_number', 'user__email'
+    )
+    batch = []
+    for resident in residents.iterator(chunk_size=2000):
+        parts = [resident.first_name, resident.middle_name, resident.last_name, resident.user.email, resident.phone_number]
+        resident.search_text = ' '.join(part for part in parts if part).lower()
+        batch.append(resident)
+        if len(batch) >= 2000:
+            Resident.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    Resident.objects.bulk_update(batch, ['search_text'])
+
+
+def create_search_indexes(apps, schema_editor):
+    # Trigram GIN index for substring search and a pattern index for phone
+    # number prefixes; other databases fall back to scanning the single column
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS resident_search_trgm_idx ON accounts_resident USING gin (search_text gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS resident_phone_prefix_idx ON accounts_resident (phone_number varchar_pattern_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS resident_search_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS resident_phone_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_resident_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resident',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:45
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    Resident = apps.get_model('accounts', 'Resident')
+    DailyRegistrationRollup = apps.get_model('accounts', 'DailyRegistrationRollup')
+    Appointment = apps.get_model('appointments', 'Appointment')
+    DailyAppointmentRollup = apps.get_model('appointments', 'DailyAppointmentRollup')
+
+    registrations = Resident.objects.annotate(day=TruncDate('user__date_joined')).values(
+        'day', 'approval_status'
+    ).annotate(count=Count('id')).order_by()
+    DailyRegistrationRollup.objects.bulk_create([
+        DailyRegistrationRollup(date=row['day'], approval_status=row['approval_status'], total=row['count'])
+        for row in registrations
+    ])
+
+    appointments = Appointment.objects.annotate(
+        slot_session=Case(When(preferred_time__lt=datetime.time(12, 0), then=Value('am')), default=Value('pm'))
+    ).values('preferred_date', 'status', 'certificate_type', 'slot_session').annotate(count=Count('id')).order_by()
+    DailyAppointmentRollup.objects.bulk_create([
+        DailyAppointmentRollup(
+            date=row['preferred_date'], status=row['status'], certificate_type=row['certificate_type'],
+            session=row['slot_session'], total=row['count'],
+        )
+        for row in appointments
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_resident_search'),
+        ('appointments', '0010_daily_appointment_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRegistrationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('approval_status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'approval_status'), name='unique_registration_rollup_row')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
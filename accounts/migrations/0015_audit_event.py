@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def forbid_updates(apps, schema_editor):
+    # The model refuses to save an existing event; the trigger also stops raw
+    # SQL from rewriting history. Deletes stay allowed for the archive command.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        """
+        CREATE OR REPLACE FUNCTION accounts_auditevent_forbid_update() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'accounts_auditevent is append-only';
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER accounts_auditevent_no_update BEFORE UPDATE ON accounts_auditevent '
+        'FOR EACH ROW EXECUTE FUNCTION accounts_auditevent_forbid_update()'
+    )
+
+
+def allow_updates(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS accounts_auditevent_no_update ON accounts_auditevent')
+    schema_editor.execute('DROP FUNCTION IF EXISTS accounts_auditevent_forbid_update()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_daily_registration_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('action', models.PositiveSmallIntegerField(choices=[(1, 'Approved resident'), (2, 'Rejected resident'), (3, 'Created staff account'), (4, 'Activated staff account'), (5, 'Deactivated staff account'), (10, 'Booked appointment'), (11, 'Approved appointment'), (12, 'Cancelled appointment'), (13, 'Rescheduled appointment'), (14, 'Marked appointment claimed'), (15, 'Completed appointment'), (16, 'Marked appointment no-show')])),
+                ('actor_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('target_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'id'], name='audit_event_time_idx'), models.Index(fields=['actor_id', 'created_at', 'id'], name='audit_event_actor_idx')],
+            },
+        ),
+        migrations.RunPython(forbid_updates, allow_updates),
+    ]
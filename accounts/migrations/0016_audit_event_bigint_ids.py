@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_audit_event'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditevent',
+            name='actor_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='auditevent',
+            name='target_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import RegexValidator
+from django.utils import timezone
 
 
 class CustomUser(AbstractUser):
@@ -19,6 +20,12 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Resident queues are listed in sign-up order
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+
 
 class Resident(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
@@ -65,10 +72,51 @@ class Resident(models.Model):
     approval_status = models.CharField(max_length=20, choices=APPROVAL_STATUS_CHOICES, default='pending')
     approval_date = models.DateTimeField(null=True, blank=True)
 
+    # Lower-cased names, email and phone kept in one column for the verification
+    # search; on PostgreSQL it has a trigram GIN index (see migration 0013)
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    SEARCH_FIELDS = ('first_name', 'middle_name', 'last_name', 'phone_number')
+
+    class Meta:
+        indexes = [
+            # Verification queues filter on approval status
+            models.Index(fields=['approval_status', 'user'], name='resident_approval_user_idx'),
+        ]
+
     def __str__(self):
         return f"{self.last_name}, {self.first_name}"
+
+    def build_search_text(self, email=None):
+        if email is None:
+            email = self.user.email if self.user_id else ''
+        parts = [self.first_name, self.middle_name, self.last_name, email, self.phone_number]
+        return ' '.join(part for part in parts if part).lower()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & {*self.SEARCH_FIELDS, 'search_text'}:
+            self.search_text = self.build_search_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_text'}
+        super().save(*args, **kwargs)
     
     
+class DailyRegistrationRollup(models.Model):
+    """Resident registrations per day and approval status, for the admin reports."""
+    date = models.DateField()
+    approval_status = models.CharField(max_length=20, choices=Resident.APPROVAL_STATUS_CHOICES)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'approval_status'], name='unique_registration_rollup_row'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.approval_status}: {self.total}"
+
+
 class BarangayStaff(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
     first_name = models.CharField(max_length=50, default='Staff')
@@ -79,4 +127,130 @@ class BarangayStaff(models.Model):
         if self.middle_name:
             return f"{self.first_name} {self.middle_name} {self.last_name} ({self.user.email})"
         else:
-            return f"{self.first_name} {self.last_name} ({self.user.email})"
\ No newline at end of file
+            return f"{self.first_name} {self.last_name} ({self.user.email})"
+
+
+class OutboundEmail(models.Model):
+    """Notification email waiting in the outbox for the send_queued_emails worker."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=254)
+    to = models.EmailField()
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.get_status_display()})"
+
+
+
+class DocumentUpload(models.Model):
+    """Registration document staged on local disk until the upload worker sends it to Supabase."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('uploaded', 'Uploaded'),
+        ('dead', 'Dead'),
+    ]
+    resident = models.ForeignKey(Resident, on_delete=models.CASCADE, related_name='document_uploads')
+    staged_name = models.CharField(max_length=255)
+    original_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    size = models.PositiveIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    uploaded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='document_upload_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.original_name} for {self.resident} ({self.get_status_display()})"
+
+
+class AuditEvent(models.Model):
+    """
+    Append-only record of who changed what, written in the same transaction as the change.
+
+    Kept compact for a table that only grows: the action is a small integer,
+    the actor and target are plain ids (no foreign keys, so events outlive
+    deleted accounts) and ``data`` holds only the details that cannot be
+    looked up later, such as reasons and previous values.
+    """
+    RESIDENT_APPROVED = 1
+    RESIDENT_REJECTED = 2
+    STAFF_CREATED = 3
+    STAFF_ACTIVATED = 4
+    STAFF_DEACTIVATED = 5
+    APPOINTMENT_BOOKED = 10
+    APPOINTMENT_APPROVED = 11
+    APPOINTMENT_CANCELLED = 12
+    APPOINTMENT_RESCHEDULED = 13
+    APPOINTMENT_CLAIMED = 14
+    APPOINTMENT_COMPLETED = 15
+    APPOINTMENT_NO_SHOW = 16
+
+    ACTION_CHOICES = [
+        (RESIDENT_APPROVED, 'Approved resident'),
+        (RESIDENT_REJECTED, 'Rejected resident'),
+        (STAFF_CREATED, 'Created staff account'),
+        (STAFF_ACTIVATED, 'Activated staff account'),
+        (STAFF_DEACTIVATED, 'Deactivated staff account'),
+        (APPOINTMENT_BOOKED, 'Booked appointment'),
+        (APPOINTMENT_APPROVED, 'Approved appointment'),
+        (APPOINTMENT_CANCELLED, 'Cancelled appointment'),
+        (APPOINTMENT_RESCHEDULED, 'Rescheduled appointment'),
+        (APPOINTMENT_CLAIMED, 'Marked appointment claimed'),
+        (APPOINTMENT_COMPLETED, 'Completed appointment'),
+        (APPOINTMENT_NO_SHOW, 'Marked appointment no-show'),
+    ]
+
+    created_at = models.DateTimeField(default=timezone.now)
+    action = models.PositiveSmallIntegerField(choices=ACTION_CHOICES)
+    actor_id = models.PositiveBigIntegerField(null=True, blank=True)
+    target_id = models.PositiveBigIntegerField(null=True, blank=True)
+    data = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Time-range reads and the activity log's cursor pagination
+            models.Index(fields=['created_at', 'id'], name='audit_event_time_idx'),
+            # "What did this person do" queries
+            models.Index(fields=['actor_id', 'created_at', 'id'], name='audit_event_actor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M} #{self.actor_id} {self.get_action_display()} #{self.target_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Audit events are append-only and cannot be changed.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Audit events are append-only; use the archive_audit_events command to remove old ones.')
+
@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from appointments.models import Appointment, DailyAppointmentRollup, DirtyRollupDate, SlotUsage
+from .models import DailyRegistrationRollup, Resident
+
+
+def report_range(request):
+    """
+    Read the report's ``start``/``end`` dates from the query string.
+
+    Returns:
+        tuple: (start, end), both inclusive, defaulting to the current month
+    """
+    month_start = timezone.localdate().replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    try:
+        start = parse_date(request.GET.get('start') or '') or month_start
+        end = parse_date(request.GET.get('end') or '') or month_end
+    except ValueError:
+        return month_start, month_end
+    if end < start:
+        start, end = end, start
+    return start, end
+
+
+def rebuild_daily_rollups(dates=None):
+    """
+    Recount the report rollups from Resident and Appointment.
+
+    Args:
+        dates: Days to recount, or None to rebuild every day from scratch
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    registrations = Resident.objects.annotate(day=TruncDate('user__date_joined'))
+    appointments = SlotUsage.annotate_session(Appointment.objects.all())
+    registration_rows = DailyRegistrationRollup.objects.all()
+    appointment_rows = DailyAppointmentRollup.objects.all()
+    if dates is not None:
+        dates = list(dates)
+        registrations = registrations.filter(day__in=dates)
+        appointments = appointments.filter(preferred_date__in=dates)
+        registration_rows = registration_rows.filter(date__in=dates)
+        appointment_rows = appointment_rows.filter(date__in=dates)
+
+    registration_counts = registrations.values('day', 'approval_status').annotate(count=Count('id')).order_by()
+    appointment_counts = appointments.values(
+        'preferred_date', 'status', 'certificate_type', 'slot_session'
+    ).annotate(count=Count('id')).order_by()
+
+    with transaction.atomic():
+        if dates is None:
+            DirtyRollupDate.objects.all().delete()
+        registration_rows.delete()
+        appointment_rows.delete()
+        written = DailyRegistrationRollup.objects.bulk_create([
+            DailyRegistrationRollup(date=row['day'], approval_status=row['approval_status'], total=row['count'])
+            for row in registration_counts
+        ])
+        written += DailyAppointmentRollup.objects.bulk_create([
+            DailyAppointmentRollup(
+                date=row['preferred_date'], status=row['status'], certificate_type=row['certificate_type'],
+                session=row['slot_session'], total=row['count'],
+            )
+            for row in appointment_counts
+        ])
+    return len(written)
+
+
+def build_pending_rollups():
+    """
+    Recount only the days that changed since the last run.
+
+    The dirty markers are taken and deleted in the same transaction as the
+    recount. A change committed after they were read leaves a new marker, so
+    it is picked up by the next run rather than lost.
+
+    Returns:
+        int: Number of days recounted
+    """
+    with transaction.atomic():
+        dirty = DirtyRollupDate.objects.select_for_update(skip_locked=True)
+        dates = list(dirty.values_list('date', flat=True))
+        if not dates:
+            return 0
+        DirtyRollupDate.objects.filter(date__in=dates).delete()
+        rebuild_daily_rollups(dates)
+    return len(dates)
+
+
+def report_totals(start, end):
+    """
+    Return the report figures for a date range from the rollup tables.
+
+    Costs two grouped queries over at most one row per day and dimension, so
+    a multi-year range is as cheap as a single month.
+
+    Args:
+        start: First day of the range
+        end: Last day of the range (inclusive)
+
+    Returns:
+        dict: ``registrations`` and ``appointments`` totals, with
+        ``registrations_by_status``, ``appointments_by_status``,
+        ``appointments_by_certificate`` and ``appointments_by_session`` breakdowns
+    """
+    registrations = dict(
+        DailyRegistrationRollup.objects.filter(date__range=(start, end))
+        .values_list('approval_status').annotate(Sum('total')).order_by()
+    )
+    appointment_rows = (
+        DailyAppointmentRollup.objects.filter(date__range=(start, end))
+        .values_list('status', 'certificate_type', 'session').annotate(Sum('total')).order_by()
+    )
+
+    by_status = {status: 0 for status, _ in Appointment.STATUS_CHOICES}
+    by_certificate = {certificate: 0 for certificate, _ in Appointment.CERTIFICATE_TYPE_CHOICES}
+    by_session = {session: 0 for session, _ in SlotUsage.SESSION_CHOICES}
+    for status, certificate, session, total in appointment_rows:
+        by_status[status] = by_status.get(status, 0) + total
+        by_certificate[certificate] = by_certificate.get(certificate, 0) + total
+        by_session[session] = by_session.get(session, 0) + total
+
+    return {
+        'registrations': sum(registrations.values()),
+        'registrations_by_status': {
+            status: registrations.get(status, 0) for status, _ in Resident.APPROVAL_STATUS_CHOICES
+        },
+        'appointments': sum(by_status.values()),
+        'appointments_by_status': by_status,
+        'appointments_by_certificate': by_certificate,
+        'appointments_by_session': by_session,
+    }
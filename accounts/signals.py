@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from appointments.models import Appointment, DirtyRollupDate
+from .models import BarangayStaff, CustomUser, Resident
+from .stats import invalidate_admin_stats
+from .utils import invalidate_staff_names
+
+
+@receiver(post_save, sender=BarangayStaff)
+@receiver(post_delete, sender=BarangayStaff)
+def invalidate_cached_staff_name(sender, instance, **kwargs):
+    """Drop the cached display name once the profile change is committed."""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_staff_names(user_id))
+
+
+@receiver(post_save, sender=CustomUser)
+def refresh_resident_search_text(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the resident's search column in step with the account email."""
+    if created or instance.role != 'resident' or (update_fields is not None and 'email' not in update_fields):
+        return
+    for resident in Resident.objects.filter(user=instance):
+        search_text = resident.build_search_text(instance.email)
+        if resident.search_text != search_text:
+            Resident.objects.filter(pk=resident.pk).update(search_text=search_text)
+
+
+@receiver(post_save, sender=Resident)
+@receiver(post_delete, sender=Resident)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_admin_stats(sender, **kwargs):
+    """Drop the admin counters once a counted row is committed."""
+    transaction.on_commit(invalidate_admin_stats)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_cached_admin_stats_for_user(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no counter depends on
+    if update_fields is not None and not {'role', 'is_active'} & set(update_fields):
+        return
+    transaction.on_commit(invalidate_admin_stats)
+
+
+@receiver(post_save, sender=Resident)
+@receiver(post_delete, sender=Resident)
+def mark_registration_rollup_date(sender, instance, update_fields=None, **kwargs):
+    """Queue the resident's registration day for the next rollup run."""
+    if update_fields is not None and 'approval_status' not in update_fields:
+        return
+    if Resident.user.is_cached(instance):
+        joined = instance.user.date_joined
+    else:
+        joined = CustomUser.objects.filter(pk=instance.user_id).values_list('date_joined', flat=True).first()
+    if joined is not None:
+        DirtyRollupDate.mark(timezone.localdate(joined))
@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db.models import Count
+
+from appointments.models import Appointment
+from .models import CustomUser, Resident
+
+ADMIN_STATS_KEY = 'accounts:admin_stats'
+# Signals (and the expiry sweep, for its bulk UPDATE) drop the counters on every
+# change; the timeout is only a backstop that bounds how stale they can get
+ADMIN_STATS_TIMEOUT = 60
+
+
+def _grouped_counts(queryset, *fields):
+    rows = queryset.values(*fields).annotate(count=Count('id')).order_by()
+    if len(fields) == 1:
+        return {row[fields[0]]: row['count'] for row in rows}
+    return {tuple(row[field] for field in fields): row['count'] for row in rows}
+
+
+def get_admin_stats():
+    """
+    Return the resident, staff, user and appointment counters shown on the admin pages.
+
+    Each model is counted with one grouped aggregate, so a cache miss costs
+    three queries however many counters a page shows.
+
+    Returns:
+        dict: ``residents`` (per approval status and ``total``), ``staff``
+        (``active``, ``inactive``, ``total``), ``users`` (``total``) and
+        ``appointments`` (per status and ``total``)
+    """
+    stats = cache.get(ADMIN_STATS_KEY)
+    if stats is not None:
+        return stats
+
+    residents = _grouped_counts(Resident.objects.all(), 'approval_status')
+    users = _grouped_counts(CustomUser.objects.all(), 'role', 'is_active')
+    appointments = _grouped_counts(Appointment.objects.all(), 'status')
+
+    staff_active = users.get(('staff', True), 0)
+    staff_inactive = users.get(('staff', False), 0)
+    stats = {
+        'residents': {
+            **{status: residents.get(status, 0) for status, _ in Resident.APPROVAL_STATUS_CHOICES},
+            'total': sum(residents.values()),
+        },
+        'staff': {
+            'active': staff_active,
+            'inactive': staff_inactive,
+            'total': staff_active + staff_inactive,
+        },
+        'users': {
+            'total': sum(users.values()),
+        },
+        'appointments': {
+            **{status: appointments.get(status, 0) for status, _ in Appointment.STATUS_CHOICES},
+            'total': sum(appointments.values()),
+        },
+    }
+    cache.set(ADMIN_STATS_KEY, stats, ADMIN_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_admin_stats():
+    cache.delete(ADMIN_STATS_KEY)
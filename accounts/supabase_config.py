@@ -1,15 +1,66 @@
 import os
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING
+
 from django.conf import settings
 
-# Supabase configuration
-SUPABASE_URL = getattr(settings, 'SUPABASE_URL', '')
-SUPABASE_KEY = getattr(settings, 'SUPABASE_KEY', '')
+if TYPE_CHECKING:
+    from supabase import Client
+
 DOCUMENTS_BUCKET = "documents_images"
 
-def get_supabase_client() -> Client:
-    """Create and return a Supabase client instance."""
-    if not SUPABASE_URL or not SUPABASE_KEY:
+# One client per process. supabase and httpx are imported on first use so
+# Django startup does not pay for them.
+_client = None
+_client_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """Drop the client inherited from a preloading parent (e.g. gunicorn --preload).
+
+    The parent's pooled sockets must not be shared with the child, so the
+    child builds its own client on first use instead of closing them.
+    """
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _create_client() -> "Client":
+    supabase_url = getattr(settings, 'SUPABASE_URL', '')
+    supabase_key = getattr(settings, 'SUPABASE_KEY', '')
+    if not supabase_url or not supabase_key:
         raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in Django settings")
-    
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+
+    import httpx
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    # Shared keep-alive pool used by the storage, auth and PostgREST clients.
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(
+            getattr(settings, 'SUPABASE_TIMEOUT', 30),
+            connect=getattr(settings, 'SUPABASE_CONNECT_TIMEOUT', 5),
+        ),
+        limits=httpx.Limits(
+            max_connections=getattr(settings, 'SUPABASE_MAX_CONNECTIONS', 10),
+            max_keepalive_connections=getattr(settings, 'SUPABASE_MAX_CONNECTIONS', 10),
+            keepalive_expiry=getattr(settings, 'SUPABASE_KEEPALIVE_EXPIRY', 60),
+        ),
+        follow_redirects=True,
+    )
+    return create_client(supabase_url, supabase_key, options=SyncClientOptions(httpx_client=http_client))
+
+
+def get_supabase_client() -> "Client":
+    """Return the process-wide Supabase client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
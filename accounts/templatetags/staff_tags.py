@@ -1,22 +1,25 @@
 from django import template
-from ..models import BarangayStaff
+from ..models import BarangayStaff, CustomUser
+from ..utils import get_staff_names, staff_display_name
 register = template.Library()
 
 @register.filter
 def get_staff_name(user):
     """
     Get the staff name from the BarangayStaff related object
+
+    Uses the profile when the view already loaded it (select_related), then
+    the name remembered on the user for this request, then the shared cache.
     """
-    try:
-        # Try to get the related BarangayStaff object
-        staff = BarangayStaff.objects.get(user=user)
-        if staff.first_name and staff.last_name:
-            if staff.middle_name:
-                return f"{staff.first_name} {staff.middle_name} {staff.last_name}"
-            else:
-                return f"{staff.first_name} {staff.last_name}"
-    except BarangayStaff.DoesNotExist:
-        pass
-    except Exception:
-        pass
-    return "Barangay Staff"
\ No newline at end of file
+    if not getattr(user, 'pk', None):
+        return staff_display_name(None)
+
+    if CustomUser.barangaystaff.is_cached(user):
+        try:
+            return staff_display_name(user.barangaystaff)
+        except BarangayStaff.DoesNotExist:
+            return staff_display_name(None)
+
+    if not hasattr(user, '_staff_name'):
+        user._staff_name = get_staff_names([user.pk])[user.pk]
+    return user._staff_name
@@ -1,3 +1,884 @@
-from django.test import TestCase
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.http import StreamingHttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import supabase_config, utils
+from .audit import record_event
+from .emails import MAX_ATTEMPTS, RETRY_BASE_SECONDS, send_queued_emails
+from .uploadhandlers import StreamingDocumentUploadHandler
+from .reports import build_pending_rollups, report_totals
+from .stats import get_admin_stats
+from .utils import get_staff_names, search_residents
+from appointments.models import Appointment, DirtyRollupDate
+from appointments.utils import expire_past_appointments, get_day_summary
+from appointments.tests import QueryBudgetMixin
+from boacms_project.middleware import QueryTimingMiddleware
+from .models import AuditEvent, BarangayStaff, CustomUser, DocumentUpload, OutboundEmail, Resident
+
+
+def make_user(email, role='resident'):
+    user = CustomUser(email=email, role=role)
+    user.set_unusable_password()
+    user.save()
+    return user
+
+
+def make_resident(email='resident@example.com', approval_status='pending'):
+    return Resident.objects.create(
+        user=make_user(email),
+        first_name='Juan',
+        last_name='Dela Cruz',
+        date_of_birth=datetime.date(1990, 1, 1),
+        address='Labangon, Cebu City',
+        sex='M',
+        civil_status='single',
+        citizenship='Filipino',
+        approval_status=approval_status,
+    )
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Email backend whose SMTP server is down; records the leases it saw while sending."""
+    leased = []
+
+    def send_messages(self, email_messages):
+        FailingEmailBackend.leased.append(
+            OutboundEmail.objects.filter(next_attempt_at__gt=timezone.now()).count()
+        )
+        raise ConnectionRefusedError('SMTP down')
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', role='staff')
+        self.client.force_login(self.staff)
+
+    def test_approve_only_queues_email(self):
+        resident = make_resident()
+
+        self.client.get(reverse('approve_resident', args=[resident.id]))
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, 'resident@example.com')
+        self.assertEqual(queued.status, 'pending')
+        self.assertIn('Juan', queued.text_body)
+
+    def test_reject_queues_email_after_deleting_account(self):
+        resident = make_resident()
+
+        self.client.get(reverse('reject_resident', args=[resident.id]))
+
+        self.assertFalse(Resident.objects.exists())
+        self.assertEqual(OutboundEmail.objects.get().to, 'resident@example.com')
+
+    def test_worker_sends_batch_over_one_connection(self):
+        for i in range(3):
+            self.client.get(reverse('approve_resident', args=[make_resident(f'r{i}@example.com').id]))
+
+        with mock.patch('accounts.emails.get_connection', wraps=mail.get_connection) as get_connection:
+            call_command('send_queued_emails', stdout=StringIO())
+
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        email = OutboundEmail.objects.create(
+            subject='Hello', from_email='no-reply@example.com', to='r@example.com', text_body='Hi'
+        )
+
+        with mock.patch('accounts.emails.EmailMultiAlternatives.send', side_effect=OSError('SMTP down')):
+            self.assertEqual(send_queued_emails(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(send_queued_emails(), (0, 0))
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+                send_queued_emails()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+        self.assertEqual(email.last_error, 'SMTP down')
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.FailingEmailBackend')
+    def test_failing_backend_leases_then_backs_off(self):
+        FailingEmailBackend.leased = []
+        email = OutboundEmail.objects.create(
+            subject='Hello', from_email='no-reply@example.com', to='r@example.com', text_body='Hi'
+        )
+        started = timezone.now()
+
+        self.assertEqual(send_queued_emails(), (0, 1))
+
+        # The row was leased before the send, so other workers skip it while SMTP hangs
+        self.assertEqual(FailingEmailBackend.leased, [1])
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.last_error, 'SMTP down')
+        self.assertGreaterEqual(email.next_attempt_at, started + datetime.timedelta(seconds=RETRY_BASE_SECONDS))
+        self.assertLess(email.next_attempt_at, started + datetime.timedelta(seconds=2 * RETRY_BASE_SECONDS))
+
+
+@override_settings(SUPABASE_URL='https://example.supabase.co', SUPABASE_KEY='test-key')
+class SupabaseClientTests(TestCase):
+    def setUp(self):
+        supabase_config._reset_after_fork()
+        self.addCleanup(supabase_config._reset_after_fork)
+
+    def test_client_is_built_once_per_process(self):
+        client = supabase_config.get_supabase_client()
+
+        self.assertIs(supabase_config.get_supabase_client(), client)
+        self.assertIs(client.storage.session, client.options.httpx_client)
+
+    def test_forked_child_builds_its_own_client(self):
+        parent_client = supabase_config.get_supabase_client()
+
+        supabase_config._reset_after_fork()
+
+        self.assertIsNot(supabase_config.get_supabase_client(), parent_client)
+
+    @override_settings(SUPABASE_URL='')
+    def test_missing_settings_raise(self):
+        with self.assertRaises(ValueError):
+            supabase_config.get_supabase_client()
+
+
+class DocumentUploadTests(TestCase):
+    def post_file(self, content, field='address_document_file'):
+        request = RequestFactory().post('/register/', {
+            field: SimpleUploadedFile('proof.jpg', content, content_type='image/jpeg'),
+        })
+        return request.FILES.get(field)
+
+    def test_upload_is_spooled_and_hashed(self):
+        content = b'proof of address' * 1000
+
+        uploaded = self.post_file(content)
+
+        self.assertTrue(uploaded.temporary_file_path())
+        self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(uploaded.read(), content)
+
+    @override_settings(MAX_DOCUMENT_UPLOAD_SIZE=1024)
+    def test_oversized_document_stops_the_upload(self):
+        request = RequestFactory().post('/register/', {
+            'address_document_file': SimpleUploadedFile('proof.jpg', b'x' * 4096, content_type='image/jpeg'),
+        })
+
+        self.assertNotIn('address_document_file', request.FILES)
+        self.assertTrue(request.upload_too_large)
+
+    @override_settings(MAX_DOCUMENT_UPLOAD_SIZE=1024)
+    def test_oversized_document_drains_the_request(self):
+        handler = StreamingDocumentUploadHandler(RequestFactory().post('/register/'))
+        handler.new_file('address_document_file', 'proof.jpg', 'image/jpeg', 4096)
+        self.addCleanup(handler.file.close)
+
+        with self.assertRaises(StopUpload) as stopped:
+            handler.receive_data_chunk(b'x' * 4096, 0)
+
+        self.assertFalse(stopped.exception.connection_reset)
+
+    @override_settings(MAX_DOCUMENT_UPLOAD_SIZE=1024 * 1024)
+    def test_oversized_document_error_reaches_the_form(self):
+        response = self.client.post(reverse('register'), {
+            'email': 'juan@example.com',
+            'address_document_file': SimpleUploadedFile('proof.jpg', b'x' * (2 * 1024 * 1024), content_type='image/jpeg'),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Document must be 1 MB or smaller.')
+
+    @override_settings(MAX_DOCUMENT_UPLOAD_SIZE=1024)
+    def test_cap_only_applies_to_documents(self):
+        uploaded = self.post_file(b'x' * 4096, field='attachment')
+
+        self.assertEqual(uploaded.size, 4096)
+        self.assertEqual(uploaded.read(), b'x' * 4096)
+
+    @override_settings(SUPABASE_KEY='test-key')
+    @mock.patch('accounts.utils.RESUMABLE_CHUNK_SIZE', 4)
+    def test_resumable_upload_resumes_from_server_offset(self):
+        stored = bytearray()
+        failed_once = []
+
+        def storage(request):
+            if request.method == 'POST':
+                return httpx.Response(201, headers={'location': '/storage/v1/upload/resumable/abc'})
+            if request.method == 'HEAD':
+                return httpx.Response(200, headers={'upload-offset': str(len(stored))})
+            if len(stored) == 4 and not failed_once:
+                failed_once.append(True)
+                return httpx.Response(503)
+            self.assertEqual(int(request.headers['upload-offset']), len(stored))
+            stored.extend(request.content)
+            return httpx.Response(204, headers={'upload-offset': str(len(stored))})
+
+        supabase = SimpleNamespace(
+            options=SimpleNamespace(httpx_client=httpx.Client(transport=httpx.MockTransport(storage))),
+            storage_url='https://example.supabase.co/storage/v1/',
+        )
+
+        utils._upload_resumable(supabase, 'address_documents/a.pdf', BytesIO(b'0123456789'), 10, 'application/pdf')
+
+        self.assertEqual(bytes(stored), b'0123456789')
+        self.assertTrue(failed_once)
+
+
+class DeferredDocumentUploadTests(TestCase):
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.staging_root = staging.name
+        override = override_settings(DOCUMENT_STAGING_ROOT=self.staging_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def register(self, document=b'%PDF proof'):
+        return self.client.post(reverse('register'), {
+            'email': 'juan@example.com',
+            'password1': 'Sup3r-secret-pass',
+            'password2': 'Sup3r-secret-pass',
+            'first_name': 'Juan',
+            'last_name': 'Dela Cruz',
+            'date_of_birth': '1990-01-01',
+            'address': 'Labangon, Cebu City',
+            'sex': 'M',
+            'civil_status': 'single',
+            'citizenship': 'Filipino',
+            'address_document_file': SimpleUploadedFile('proof.pdf', document, content_type='application/pdf'),
+        })
+
+    @override_settings(MAX_DOCUMENT_UPLOAD_SIZE=1024 * 1024)
+    def test_oversized_document_rejects_registration(self):
+        response = self.register(b'x' * (2 * 1024 * 1024))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Document must be 1 MB or smaller.')
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(os.listdir(self.staging_root))
+
+    @mock.patch('accounts.utils.upload_document_to_supabase')
+    def test_register_stages_document_without_uploading(self, upload):
+        response = self.register()
+
+        self.assertRedirects(response, reverse('register') + '?success=true', fetch_redirect_response=False)
+        upload.assert_not_called()
+        queued = DocumentUpload.objects.get()
+        self.assertEqual(queued.sha256, hashlib.sha256(b'%PDF proof').hexdigest())
+        self.assertTrue(os.path.exists(os.path.join(self.staging_root, queued.staged_name)))
+
+    @mock.patch('accounts.utils.DocumentUpload.objects.create', side_effect=DatabaseError('insert failed'))
+    def test_rolled_back_registration_removes_staged_document(self, create):
+        with self.assertRaises(DatabaseError):
+            self.register()
+
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(os.listdir(self.staging_root))
+
+    @mock.patch('accounts.utils.upload_document_to_supabase', return_value='https://example.supabase.co/proof.pdf')
+    def test_worker_uploads_and_fills_resident(self, upload):
+        self.register()
+
+        call_command('process_document_uploads', stdout=StringIO())
+
+        queued = DocumentUpload.objects.select_related('resident').get()
+        self.assertEqual(queued.status, 'uploaded')
+        self.assertEqual(queued.resident.address_document, 'https://example.supabase.co/proof.pdf')
+        self.assertEqual(upload.call_args[0][0].sha256, queued.sha256)
+        self.assertFalse(os.listdir(self.staging_root))
+
+    @mock.patch('accounts.utils.upload_document_to_supabase', side_effect=Exception('Supabase unavailable'))
+    def test_failed_upload_backs_off_then_dead_letters(self, upload):
+        self.register()
+
+        self.assertEqual(utils.process_document_uploads(), (0, 1))
+        queued = DocumentUpload.objects.get()
+        self.assertEqual(queued.status, 'pending')
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        self.assertEqual(utils.process_document_uploads(), (0, 0))
+
+        for _ in range(utils.UPLOAD_MAX_ATTEMPTS - 1):
+            DocumentUpload.objects.update(next_attempt_at=timezone.now())
+            utils.process_document_uploads()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'dead')
+        self.assertEqual(queued.last_error, 'Supabase unavailable')
+        self.assertIsNone(queued.resident.address_document)
+        self.assertTrue(os.path.exists(os.path.join(self.staging_root, queued.staged_name)))
+
+
+class ResidentDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resident = make_resident(approval_status='approved')
+        self.client.force_login(self.resident.user)
+        self.today = datetime.date.today()
+
+    def book(self, days_ahead, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.objects.create(
+                resident=self.resident.user,
+                certificate_type='barangay_clearance',
+                preferred_date=self.today + datetime.timedelta(days=days_ahead),
+                preferred_time=datetime.time(9, 0),
+                purpose='employment',
+                status=status,
+            )
+
+    def test_counters_come_from_one_query_then_cache(self):
+        self.book(2, 'approved')
+        self.book(3, 'pending')
+        self.book(-5, 'completed')
+        self.book(-6, 'cancelled')
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_appointments'], 4)
+        self.assertEqual(response.context['approved_appointments'], 1)
+        self.assertEqual(response.context['pending_appointments'], 1)
+        self.assertEqual(response.context['completed_appointments'], 1)
+        self.assertEqual(response.context['upcoming_appointments'], 2)
+        self.assertEqual(response.context['next_appointment'].status, 'approved')
+        self.assertEqual(len(response.context['completed_list']), 1)
+
+        # Session, user and resident only; no appointment queries on a warm cache
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard'))
+
+    def test_appointment_change_invalidates_cache(self):
+        appointment = self.book(2, 'approved')
+        self.client.get(reverse('dashboard'))
+
+        appointment.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.save()
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['cancelled_appointments'], 1)
+        self.assertIsNone(response.context['next_appointment'])
+
+
+class StaffDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = make_user('staff@example.com', role='staff')
+        self.resident = make_resident(approval_status='approved')
+        self.client.force_login(self.staff)
+        self.day = datetime.date.today() + datetime.timedelta(days=2)
+
+    def book(self, preferred_time, status='approved'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.objects.create(
+                resident=self.resident.user,
+                certificate_type='barangay_clearance',
+                preferred_date=self.day,
+                preferred_time=preferred_time,
+                purpose='employment',
+                status=status,
+            )
+
+    def get_day(self, day):
+        return self.client.get(reverse('staff_dashboard'), {'date': day.isoformat()})
+
+    def test_day_is_built_in_one_query_and_cached(self):
+        self.book(datetime.time(9, 0))
+        self.book(datetime.time(14, 0), status='claimed')
+        self.book(datetime.time(15, 0), status='cancelled')
+
+        # Session, staff user, day appointments, residents count
+        with self.assertNumQueries(4):
+            response = self.get_day(self.day)
+        self.assertEqual(response.context['am_appointments_count'], 1)
+        self.assertEqual(response.context['pm_appointments_count'], 1)
+        self.assertEqual(response.context['total_appointments_today'], 2)
+
+        with self.assertNumQueries(3):
+            self.get_day(self.day)
+
+    def test_neighbouring_days_are_cached_with_the_requested_one(self):
+        self.book(datetime.time(9, 0))
+        self.get_day(self.day)
+
+        with self.assertNumQueries(0):
+            previous_day = get_day_summary(self.day - datetime.timedelta(days=1))
+            next_day = get_day_summary(self.day + datetime.timedelta(days=1))
+        self.assertEqual(previous_day['total_appointments_today'], 0)
+        self.assertEqual(next_day['total_appointments_today'], 0)
+
+    def test_reschedule_invalidates_both_days(self):
+        appointment = self.book(datetime.time(9, 0))
+        new_day = self.day + datetime.timedelta(days=1)
+        self.get_day(self.day)
+        self.get_day(new_day)
+
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.preferred_date = new_day
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.save()
+
+        self.assertEqual(self.get_day(self.day).context['total_appointments_today'], 0)
+        self.assertEqual(self.get_day(new_day).context['total_appointments_today'], 1)
+
+
+class SeedLoadDataTests(TestCase):
+    def seed(self, *extra):
+        call_command(
+            'seed_load_data', '--residents', '20', '--staff', '2', '--appointments', '300',
+            '--batch-size', '128', '--today', '2030-01-15', *extra, stdout=StringIO(),
+        )
+        return list(
+            Appointment.objects.order_by('id').values_list(
+                'resident__email', 'certificate_type', 'preferred_date', 'preferred_time', 'status'
+            )
+        )
+
+    def test_same_seed_gives_same_dataset(self):
+        first = self.seed()
+        self.assertEqual(len(first), 300)
+        self.assertEqual(CustomUser.objects.filter(role='staff').count(), 2)
+        self.assertTrue(all(row[2].weekday() < 5 for row in first))
+
+        self.assertEqual(self.seed('--flush'), first)
+        self.assertEqual(Resident.objects.count(), 20)
+        self.assertNotEqual(self.seed('--flush', '--seed', '7'), first)
+
+    def test_refuses_to_seed_twice_without_flush(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+
+class AccountsQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.day = datetime.date.today()
+        self.added = 0
+
+    def add_residents(self, count=5):
+        for _ in range(count):
+            self.added += 1
+            resident = make_resident(f'resident{self.added}@example.com', approval_status='approved')
+            for status in ('pending', 'approved', 'claimed', 'completed'):
+                Appointment.objects.create(
+                    resident=resident.user, certificate_type='barangay_clearance', preferred_date=self.day,
+                    preferred_time=datetime.time(9, 0), purpose='employment', status=status,
+                )
+            make_resident(f'pending{self.added}@example.com')
+            make_user(f'staff{self.added}@example.com', role='staff')
+
+    def test_staff_pages(self):
+        self.client.force_login(make_user('staff@example.com', role='staff'))
+        for name, budget in {'staff_dashboard': 4, 'resident_approvals': 2}.items():
+            with self.subTest(name):
+                self.assertQueryBudget(reverse(name), budget, self.add_residents)
+
+    def test_admin_pages(self):
+        self.client.force_login(make_user('admin@example.com', role='admin'))
+        budgets = {
+            'admin_dashboard': 7,
+            'resident_verification': 6,
+            'staff_accounts': 6,
+        }
+        for name, budget in budgets.items():
+            with self.subTest(name):
+                self.assertQueryBudget(reverse(name), budget, self.add_residents)
+
+    def test_resident_dashboard(self):
+        resident = make_resident(approval_status='approved')
+        self.client.force_login(resident.user)
+
+        def add_own_appointments():
+            for status in ('pending', 'approved', 'completed', 'cancelled'):
+                Appointment.objects.create(
+                    resident=resident.user, certificate_type='barangay_clearance', preferred_date=self.day,
+                    preferred_time=datetime.time(13, 0), purpose='employment', status=status,
+                )
+
+        self.assertQueryBudget(reverse('dashboard'), 6, add_own_appointments)
+
+
+class QueryTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client.force_login(make_user('staff@example.com', role='staff'))
+
+    @override_settings(QUERY_TIMING=True)
+    def test_server_timing_header_and_log(self):
+        with self.assertLogs('boacms_project.middleware', level='INFO') as logs:
+            response = self.client.get(reverse('resident_approvals'))
+
+        self.assertRegex(response['Server-Timing'], r'^db;desc="2 queries";dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn('GET /staff/resident-approvals/: 2 queries', logs.output[0])
+
+    def test_disabled_by_default_outside_debug(self):
+        response = self.client.get(reverse('resident_approvals'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(QUERY_TIMING=True)
+    async def test_async_requests_are_timed(self):
+        user = await CustomUser.objects.aget(email='staff@example.com')
+        await self.async_client.aforce_login(user)
+
+        response = await self.async_client.get(reverse('resident_approvals'))
+
+        self.assertRegex(response['Server-Timing'], r'^db;desc="2 queries";dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(QUERY_TIMING=True)
+    def test_streaming_responses_pass_through(self):
+        stream = StreamingHttpResponse(iter(['data: {}\n\n']), content_type='text/event-stream')
+        middleware = QueryTimingMiddleware(lambda request: stream)
+
+        response = middleware(RequestFactory().get('/api/events/'))
+
+        self.assertIs(response, stream)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class StaffNameTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff_users = [make_user(f'staff{index}@example.com', role='staff') for index in range(3)]
+        for index, user in enumerate(self.staff_users):
+            BarangayStaff.objects.create(user=user, first_name='Maria', last_name=f'Santos{index}')
+
+    def render(self, users):
+        return Template('{% load staff_tags %}{% for user in users %}{{ user|get_staff_name }};{% endfor %}').render(
+            Context({'users': users})
+        )
+
+    def test_names_are_cached_across_requests(self):
+        users = list(CustomUser.objects.filter(role='staff').order_by('id'))
+        with self.assertNumQueries(3):
+            self.assertEqual(self.render(users + users), 'Maria Santos0;Maria Santos1;Maria Santos2;' * 2)
+
+        fresh_users = list(CustomUser.objects.filter(role='staff').order_by('id'))
+        with self.assertNumQueries(0):
+            self.render(fresh_users)
+
+    def test_bulk_lookup_and_select_related(self):
+        resident = make_user('resident@example.com')
+        with self.assertNumQueries(1):
+            names = get_staff_names([user.id for user in self.staff_users] + [resident.id])
+        self.assertEqual(names[resident.id], 'Barangay Staff')
+
+        cache.clear()
+        users = CustomUser.objects.select_related('barangaystaff').order_by('id')
+        with self.assertNumQueries(1):
+            self.assertIn('Maria Santos2;Barangay Staff;', self.render(users))
+
+    def test_profile_change_invalidates_name(self):
+        self.render([CustomUser.objects.get(pk=self.staff_users[0].pk)])
+        staff = BarangayStaff.objects.get(user=self.staff_users[0])
+        staff.middle_name = 'Cruz'
+        with self.captureOnCommitCallbacks(execute=True):
+            staff.save()
+
+        user = CustomUser.objects.get(pk=self.staff_users[0].pk)
+        self.assertEqual(self.render([user]), 'Maria Cruz Santos0;')
+
+
+class ResidentVerificationPaginationTests(TestCase):
+    def test_pages_keep_filters(self):
+        self.client.force_login(make_user('admin@example.com', role='admin'))
+        for index in range(60):
+            make_resident(f'resident{index}@example.com', approval_status='approved')
+        make_resident('pending@example.com')
+
+        first = self.client.get(reverse('resident_verification'), {'status': 'approved'})
+        next_url = first.context['page'].next_url
+        self.assertIn('status=approved', next_url)
+
+        second = self.client.get(reverse('resident_verification') + next_url)
+        shown = [resident.id for resident in first.context['pending_residents']]
+        shown += [resident.id for resident in second.context['pending_residents']]
+        expected = Resident.objects.filter(approval_status='approved').order_by('-user__date_joined', '-id')
+        self.assertEqual(shown, list(expected.values_list('id', flat=True)))
+        self.assertFalse(second.context['page'].has_next)
+
+
+class ResidentSearchTests(TestCase):
+    def setUp(self):
+        self.juan = make_resident('juan@example.com')
+        self.maria = make_resident('maria.santos@example.com')
+        Resident.objects.filter(pk=self.maria.pk).update(first_name='Maria')
+        self.maria.refresh_from_db()
+        self.maria.last_name = 'Santos'
+        self.maria.phone_number = '09171234567'
+        self.maria.save()
+        self.pedro = make_resident('pedro@example.com')
+        self.pedro.first_name = 'Pedro'
+        self.pedro.last_name = 'Marquez'
+        self.pedro.phone_number = '09281234567'
+        self.pedro.save()
+
+    def search(self, query):
+        return list(search_residents(Resident.objects.all(), query).order_by('-search_rank', 'id'))
+
+    def test_search_text_is_maintained(self):
+        self.assertEqual(self.maria.search_text, 'maria santos maria.santos@example.com 09171234567')
+
+        self.maria.user.email = 'msantos@example.com'
+        self.maria.user.save()
+        self.maria.refresh_from_db()
+        self.assertIn('msantos@example.com', self.maria.search_text)
+
+    def test_words_phone_prefix_and_ranking(self):
+        self.assertEqual(self.search('juan dela'), [self.juan])
+        self.assertEqual(self.search('0917'), [self.maria])
+        self.assertEqual(self.search('1234567'), [])
+        # "mar" starts Maria's first name but is only inside Juan's last name
+        self.juan.last_name = 'Damaro'
+        self.juan.save()
+        self.assertEqual(self.search('mar'), [self.maria, self.pedro, self.juan])
+        # Whole-number ranks survive the keyset cursor's JSON round trip exactly
+        self.assertTrue(all(isinstance(resident.search_rank, int) for resident in self.search('mar')))
+
+    def test_verification_view_searches(self):
+        self.client.force_login(make_user('admin@example.com', role='admin'))
+        response = self.client.get(reverse('resident_verification'), {'status': 'all', 'search': 'SANTOS'})
+        self.assertEqual(list(response.context['pending_residents']), [self.maria])
+
+
+class AdminStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_resident('pending@example.com')
+        self.approved = make_resident('approved@example.com', approval_status='approved')
+        make_user('staff@example.com', role='staff')
+        inactive = make_user('inactive@example.com', role='staff')
+        inactive.is_active = False
+        inactive.save()
+        Appointment.objects.create(
+            resident=self.approved.user, certificate_type='barangay_clearance',
+            preferred_date=datetime.date.today(), preferred_time=datetime.time(9, 0), purpose='employment',
+        )
+
+    def test_counters_take_one_query_per_model(self):
+        with self.assertNumQueries(3):
+            stats = get_admin_stats()
+        self.assertEqual(stats['residents'], {'pending': 1, 'approved': 1, 'rejected': 0, 'total': 2})
+        self.assertEqual(stats['staff'], {'active': 1, 'inactive': 1, 'total': 2})
+        self.assertEqual(stats['users']['total'], 4)
+        self.assertEqual(stats['appointments']['pending'], 1)
+        self.assertEqual(stats['appointments']['total'], 1)
+
+        with self.assertNumQueries(0):
+            get_admin_stats()
+
+    def test_changes_invalidate_counters(self):
+        get_admin_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.approved.approval_status = 'rejected'
+            self.approved.save()
+        self.assertEqual(get_admin_stats()['residents']['rejected'], 1)
+
+        # A login only updates last_login and keeps the cached counters
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(self.approved.user)
+        with self.assertNumQueries(0):
+            get_admin_stats()
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.resident = make_resident('rollup@example.com', approval_status='approved')
+        self.appointment = Appointment.objects.create(
+            resident=self.resident.user, certificate_type='barangay_clearance',
+            preferred_date=self.today, preferred_time=datetime.time(9, 0), purpose='employment',
+        )
+
+    def test_only_changed_days_are_recounted(self):
+        self.assertEqual(build_pending_rollups(), 1)
+        self.assertEqual(build_pending_rollups(), 0)
+        totals = report_totals(self.today, self.today)
+        self.assertEqual(totals['registrations'], 1)
+        self.assertEqual(totals['appointments_by_status']['pending'], 1)
+        self.assertEqual(totals['appointments_by_session'], {'am': 1, 'pm': 0})
+
+        # Rescheduling queues both the old and the new day
+        next_week = self.today + datetime.timedelta(days=7)
+        self.appointment.preferred_date = next_week
+        self.appointment.preferred_time = datetime.time(14, 0)
+        self.appointment.save()
+        self.assertEqual(set(DirtyRollupDate.objects.values_list('date', flat=True)), {self.today, next_week})
+        self.assertEqual(build_pending_rollups(), 2)
+
+        totals = report_totals(self.today, next_week)
+        self.assertEqual(totals['appointments'], 1)
+        self.assertEqual(totals['appointments_by_session'], {'am': 0, 'pm': 1})
+        self.assertEqual(report_totals(self.today, self.today)['appointments'], 0)
+
+    def test_expiry_sweep_queues_its_days(self):
+        past = self.today - datetime.timedelta(days=3)
+        Appointment.objects.create(
+            resident=self.resident.user, certificate_type='barangay_clearance',
+            preferred_date=past, preferred_time=datetime.time(9, 0), purpose='employment',
+        )
+        call_command('build_daily_rollups', stdout=StringIO())
+        expire_past_appointments(today=self.today)
+        call_command('build_daily_rollups', stdout=StringIO())
+        self.assertEqual(report_totals(past, past)['appointments_by_status']['cancelled'], 1)
+
+    def test_reports_page_reads_rollups(self):
+        call_command('build_daily_rollups', '--full', stdout=StringIO())
+        self.client.force_login(make_user('admin@example.com', role='admin'))
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('admin_reports'), {'start': '2000-01-01', 'end': '2099-12-31'})
+        self.assertEqual(response.context['monthly_appointments'], 1)
+        self.assertEqual(response.context['monthly_registrations'], 1)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(make_user('admin@example.com', role='admin'))
+        self.today = timezone.localdate()
+        self.resident = make_resident('export@example.com', approval_status='approved')
+        self.resident.first_name = '=HYPERLINK("x")'
+        self.resident.save()
+        for status in ('pending', 'cancelled'):
+            Appointment.objects.create(
+                resident=self.resident.user, certificate_type='barangay_clearance', preferred_date=self.today,
+                preferred_time=datetime.time(9, 0), purpose='employment', status=status,
+            )
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(name), {'start': self.today, 'end': self.today, **params})
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_appointment_csv_is_filtered_and_escaped(self):
+        response, content = self.download('export_appointments', status='pending')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = content.decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Barangay Clearance', lines[1])
+        self.assertIn('Pending', lines[1])
+        self.assertIn("'=HYPERLINK", lines[1])
+
+    def test_resident_xlsx_is_a_valid_workbook(self):
+        _, content = self.download('export_residents', format='xlsx')
+        with zipfile.ZipFile(BytesIO(content)) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('export@example.com', sheet)
+
+    def test_rows_are_read_in_chunks(self):
+        with mock.patch('django.db.models.query.QuerySet.iterator', autospec=True, return_value=iter([])) as iterator:
+            self.download('export_appointments')
+        self.assertEqual(iterator.call_args.kwargs['chunk_size'], 2000)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('export_residents'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AuditEventTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', role='staff')
+        self.resident = make_resident('audit@example.com', approval_status='approved')
+        self.appointment = Appointment.objects.create(
+            resident=self.resident.user, certificate_type='barangay_clearance', status='pending',
+            preferred_date=datetime.date.today() + datetime.timedelta(days=3),
+            preferred_time=datetime.time(9, 0), purpose='employment',
+        )
+
+    def test_state_changes_are_recorded(self):
+        self.client.force_login(self.staff)
+        self.client.post(reverse('pending_appointments'), {
+            'appointment_id': self.appointment.id, 'action': 'cancel', 'reason': 'Incomplete requirements',
+        })
+        event = AuditEvent.objects.get()
+        self.assertEqual(
+            (event.action, event.actor_id, event.target_id, event.data),
+            (AuditEvent.APPOINTMENT_CANCELLED, self.staff.id, self.appointment.id, {'reason': 'Incomplete requirements'}),
+        )
+
+        pending = make_resident('pending@example.com')
+        self.client.post(reverse('reject_resident', args=[pending.id]))
+        event = AuditEvent.objects.get(action=AuditEvent.RESIDENT_REJECTED)
+        self.assertEqual(event.target_id, pending.id)
+        self.assertEqual(event.data['email'], 'pending@example.com')
+
+    def test_event_and_change_commit_together(self):
+        self.client.force_login(self.staff)
+        with mock.patch('appointments.views.record_event', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('pending_appointments'), {
+                    'appointment_id': self.appointment.id, 'action': 'approve',
+                })
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'pending')
+
+    def test_events_are_append_only(self):
+        event = record_event(self.staff, AuditEvent.APPOINTMENT_APPROVED, self.appointment.id)
+        self.assertIsNone(event.data)
+        with self.assertRaises(ValueError):
+            event.save()
+        with self.assertRaises(ValueError):
+            event.delete()
+
+    def test_activity_log_filters_and_pages(self):
+        admin = make_user('admin@example.com', role='admin')
+        for _ in range(3):
+            record_event(self.staff, AuditEvent.APPOINTMENT_APPROVED, self.appointment.id)
+        record_event(admin, AuditEvent.STAFF_CREATED, self.staff.id)
+
+        self.client.force_login(admin)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('activity_log'), {'actor': self.staff.id})
+        events = list(response.context['events'])
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0].actor_email, 'staff@example.com')
+        self.assertEqual(events, sorted(events, key=lambda event: (event.created_at, event.id), reverse=True))
+
+        response = self.client.get(reverse('activity_log'), {'action': AuditEvent.STAFF_CREATED})
+        self.assertContains(response, 'Created staff account')
+
+    def test_archive_moves_old_events_to_files(self):
+        old = timezone.now() - datetime.timedelta(days=400)
+        for index in range(3):
+            AuditEvent.objects.create(action=AuditEvent.APPOINTMENT_BOOKED, actor_id=index, created_at=old)
+        recent = record_event(self.staff, AuditEvent.APPOINTMENT_APPROVED, self.appointment.id)
+
+        with tempfile.TemporaryDirectory() as archive_root, override_settings(AUDIT_ARCHIVE_ROOT=archive_root):
+            call_command('archive_audit_events', '--days', '180', '--batch-size', '2', stdout=StringIO())
+            files = sorted(os.listdir(archive_root))
+            lines = []
+            for name in files:
+                with gzip.open(os.path.join(archive_root, name), 'rt') as archive:
+                    lines += [json.loads(line) for line in archive]
+
+        self.assertEqual(len(files), 2)
+        self.assertEqual([line['actor_id'] for line in lines], [0, 1, 2])
+        self.assertEqual(list(AuditEvent.objects.all()), [recent])
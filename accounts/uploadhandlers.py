@@ -0,0 +1,39 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+# Upload fields holding resident documents; only these are capped at MAX_DOCUMENT_UPLOAD_SIZE
+DOCUMENT_FIELDS = ('address_document_file',)
+
+
+class StreamingDocumentUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spool uploaded files to disk chunk by chunk instead of holding them in memory.
+
+    The SHA-256 of each file is computed as the chunks arrive and attached as
+    ``uploaded_file.sha256``. Once a document passes MAX_DOCUMENT_UPLOAD_SIZE
+    the upload is stopped, the rest of the request body is read and discarded
+    so the client gets a response rather than a reset connection, and
+    ``request.upload_too_large`` is set so the view can tell the user why.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.received = 0
+        self.capped = field_name in DOCUMENT_FIELDS
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.capped and self.received > settings.MAX_DOCUMENT_UPLOAD_SIZE:
+            self.request.upload_too_large = True
+            raise StopUpload(connection_reset=False)
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.hasher.hexdigest()
+        return uploaded_file
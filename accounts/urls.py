@@ -27,6 +27,8 @@ urlpatterns = [
     path('administrator/settings/', views.admin_settings, name='admin_settings'),
     path('administrator/activity-log/', views.activity_log, name='activity_log'),
     path('administrator/generate-report/', views.generate_report, name='generate_report'),
+    path('administrator/reports/export/appointments/', views.export_appointments, name='export_appointments'),
+    path('administrator/reports/export/residents/', views.export_residents, name='export_residents'),
     path('administrator/announcements/', views.announcements, name='announcements'),
     path('administrator/profile/', views.admin_profile, name='admin_profile'),
     
@@ -1,14 +1,115 @@
+import base64
 import os
 import uuid
+from contextlib import contextmanager
+from io import BufferedReader, FileIO
+from typing import TYPE_CHECKING
+
+from datetime import timedelta
+
 from django.conf import settings
-from supabase import Client
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+from .models import BarangayStaff, DocumentUpload
 from .supabase_config import get_supabase_client, DOCUMENTS_BUCKET
 
+if TYPE_CHECKING:
+    from supabase import Client
+
+
+# Deferred document uploads: retry with exponential backoff, then dead-letter
+UPLOAD_MAX_ATTEMPTS = 6
+UPLOAD_RETRY_BASE_SECONDS = 30
+UPLOAD_RETRY_MAX_SECONDS = 60 * 60
+# A claimed upload becomes due again after this long if its worker dies mid-transfer
+UPLOAD_LEASE_SECONDS = 10 * 60
+
+# Supabase's resumable (TUS) endpoint requires 6 MB chunks; larger files use it
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024
+RESUMABLE_CHUNK_RETRIES = 3
+
+
+@contextmanager
+def _open_stream(document_file):
+    """Yield a binary stream over the upload without reading it into memory."""
+    if hasattr(document_file, 'temporary_file_path'):
+        with open(document_file.temporary_file_path(), 'rb') as stream:
+            yield stream
+    else:
+        document_file.seek(0)
+        yield getattr(document_file, 'file', document_file)
+
+
+def _upload_resumable(supabase: "Client", file_path: str, stream, size: int, content_type: str) -> None:
+    """
+    Upload a large file to Supabase storage in fixed-size chunks over the TUS protocol.
+
+    Only one chunk is held in memory at a time. A failed chunk is retried from
+    the offset the server reports, so a dropped connection does not restart
+    the whole upload.
+    """
+    import httpx
+
+    http_client = supabase.options.httpx_client
+    endpoint = f"{supabase.storage_url}upload/resumable"
+    headers = {
+        'apikey': settings.SUPABASE_KEY,
+        'authorization': f'Bearer {settings.SUPABASE_KEY}',
+        'tus-resumable': '1.0.0',
+    }
+    metadata = {
+        'bucketName': DOCUMENTS_BUCKET,
+        'objectName': file_path,
+        'contentType': content_type,
+    }
+
+    response = http_client.post(endpoint, headers={
+        **headers,
+        'x-upsert': 'true',
+        'upload-length': str(size),
+        'upload-metadata': ','.join(
+            f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in metadata.items()
+        ),
+    })
+    response.raise_for_status()
+    upload_url = str(httpx.URL(endpoint).join(response.headers['location']))
+
+    offset = 0
+    failures = 0
+    while offset < size:
+        stream.seek(offset)
+        chunk = stream.read(RESUMABLE_CHUNK_SIZE)
+        try:
+            response = http_client.patch(upload_url, content=chunk, headers={
+                **headers,
+                'upload-offset': str(offset),
+                'content-type': 'application/offset+octet-stream',
+            })
+            response.raise_for_status()
+            offset = int(response.headers['upload-offset'])
+            failures = 0
+        except httpx.HTTPError:
+            failures += 1
+            if failures > RESUMABLE_CHUNK_RETRIES:
+                raise
+            # Ask the server how much it actually stored and resume from there
+            response = http_client.head(upload_url, headers=headers)
+            response.raise_for_status()
+            offset = int(response.headers['upload-offset'])
+
 
 def upload_document_to_supabase(document_file, resident_id: int) -> str:
     """
     Upload a document file to Supabase storage and return the public URL.
     
+    The file is streamed from disk rather than read into memory; files larger
+    than RESUMABLE_CHUNK_SIZE are sent with a resumable chunked upload.
+    
     Args:
         document_file: The file object to upload
         resident_id: The ID of the resident (used for organizing files)
@@ -21,21 +122,31 @@ def upload_document_to_supabase(document_file, resident_id: int) -> str:
     """
     try:
         # Get Supabase client
-        supabase: Client = get_supabase_client()
+        supabase: "Client" = get_supabase_client()
         
-        # Generate a unique filename to prevent conflicts
+        # Name the file after its content hash when the upload handler computed one,
+        # so retrying the same upload overwrites instead of duplicating it
         file_extension = os.path.splitext(document_file.name)[1]
-        unique_filename = f"{resident_id}_{uuid.uuid4().hex}{file_extension}"
+        content_id = getattr(document_file, 'sha256', None) or uuid.uuid4().hex
+        unique_filename = f"{resident_id}_{content_id[:32]}{file_extension}"
         
         # Define the path in the bucket
         file_path = f"address_documents/{unique_filename}"
+        content_type = getattr(document_file, 'content_type', None) or 'application/octet-stream'
         
         # Upload the file
-        response = supabase.storage.from_(DOCUMENTS_BUCKET).upload(
-            path=file_path,
-            file=document_file.read(),
-            file_options={"content-type": document_file.content_type}
-        )
+        with _open_stream(document_file) as stream:
+            if document_file.size > RESUMABLE_CHUNK_SIZE:
+                _upload_resumable(supabase, file_path, stream, document_file.size, content_type)
+            else:
+                # storage3 streams real file objects; anything else is a small in-memory upload
+                if not isinstance(stream, (BufferedReader, FileIO)):
+                    stream = stream.read()
+                supabase.storage.from_(DOCUMENTS_BUCKET).upload(
+                    path=file_path,
+                    file=stream,
+                    file_options={"content-type": content_type, "upsert": "true"}
+                )
         
         # Get the public URL
         public_url = supabase.storage.from_(DOCUMENTS_BUCKET).get_public_url(file_path)
@@ -58,7 +169,7 @@ def delete_document_from_supabase(file_url: str) -> bool:
     """
     try:
         # Get Supabase client
-        supabase: Client = get_supabase_client()
+        supabase: "Client" = get_supabase_client()
         
         # Extract the file path from the URL
         # Assuming the URL format: https://<project>.supabase.co/storage/v1/object/public/<bucket>/<path>
@@ -75,4 +186,211 @@ def delete_document_from_supabase(file_url: str) -> bool:
         
     except Exception as e:
         print(f"Failed to delete document from Supabase: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+def _staging_storage():
+    return FileSystemStorage(location=settings.DOCUMENT_STAGING_ROOT)
+
+
+def stage_document_upload(document_file, resident) -> DocumentUpload:
+    """
+    Keep an uploaded document on local disk and queue it for the upload worker.
+
+    Spooled uploads are moved into the staging directory rather than copied.
+
+    Args:
+        document_file: The uploaded file from request.FILES
+        resident: The Resident the document belongs to
+
+    Returns:
+        DocumentUpload: The queued upload
+    """
+    file_extension = os.path.splitext(document_file.name)[1]
+    storage = _staging_storage()
+    staged_name = storage.save(f"{resident.id}_{uuid.uuid4().hex}{file_extension}", document_file)
+
+    try:
+        return DocumentUpload.objects.create(
+            resident=resident,
+            staged_name=staged_name,
+            original_name=document_file.name,
+            content_type=getattr(document_file, 'content_type', None) or 'application/octet-stream',
+            size=document_file.size,
+            sha256=getattr(document_file, 'sha256', ''),
+        )
+    except Exception:
+        storage.delete(staged_name)
+        raise
+
+
+def discard_staged_document(upload: DocumentUpload) -> None:
+    """
+    Delete the staged file of an upload whose registration was rolled back.
+
+    Args:
+        upload: The DocumentUpload returned by stage_document_upload
+    """
+    _staging_storage().delete(upload.staged_name)
+
+
+def _claim_document_upload():
+    """Lease the next due upload so no other worker picks it up while it is being sent."""
+    now = timezone.now()
+    with transaction.atomic():
+        upload = (
+            DocumentUpload.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .select_related('resident')
+            .order_by('next_attempt_at')
+            .first()
+        )
+        if upload is not None:
+            upload.next_attempt_at = now + timedelta(seconds=UPLOAD_LEASE_SECONDS)
+            upload.save(update_fields=['next_attempt_at'])
+    return upload
+
+
+def _send_document_upload(upload: DocumentUpload) -> None:
+    storage = _staging_storage()
+    try:
+        with storage.open(upload.staged_name, 'rb') as staged:
+            document_file = File(staged, name=upload.original_name)
+            document_file.content_type = upload.content_type
+            document_file.sha256 = upload.sha256
+            document_url = upload_document_to_supabase(document_file, upload.resident_id)
+    except Exception as e:
+        upload.attempts += 1
+        upload.last_error = str(e)
+        if upload.attempts >= UPLOAD_MAX_ATTEMPTS:
+            # Dead-lettered; the staged file is kept so it can be inspected or requeued
+            upload.status = 'dead'
+        else:
+            delay = min(UPLOAD_RETRY_BASE_SECONDS * 2 ** (upload.attempts - 1), UPLOAD_RETRY_MAX_SECONDS)
+            upload.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        upload.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+        return
+
+    with transaction.atomic():
+        upload.resident.address_document = document_url
+        upload.resident.save(update_fields=['address_document'])
+        upload.status = 'uploaded'
+        upload.attempts += 1
+        upload.uploaded_at = timezone.now()
+        upload.save(update_fields=['status', 'attempts', 'uploaded_at'])
+    storage.delete(upload.staged_name)
+
+
+def process_document_uploads(limit=20):
+    """
+    Send due staged documents to Supabase and fill in Resident.address_document.
+
+    Args:
+        limit: Maximum number of uploads to process in this run
+
+    Returns:
+        tuple[int, int]: Number of uploads completed and number that failed this round
+    """
+    uploaded = failed = 0
+    for _ in range(limit):
+        upload = _claim_document_upload()
+        if upload is None:
+            break
+        _send_document_upload(upload)
+        if upload.status == 'uploaded':
+            uploaded += 1
+        else:
+            failed += 1
+    return uploaded, failed
+
+
+DEFAULT_STAFF_NAME = "Barangay Staff"
+STAFF_NAME_TIMEOUT = 24 * 60 * 60
+
+
+def _staff_name_key(user_id):
+    return f"accounts:staff_name:{user_id}"
+
+
+def staff_display_name(staff):
+    """Format a BarangayStaff profile the way it is shown in page headers and lists."""
+    if staff is None or not (staff.first_name and staff.last_name):
+        return DEFAULT_STAFF_NAME
+    if staff.middle_name:
+        return f"{staff.first_name} {staff.middle_name} {staff.last_name}"
+    return f"{staff.first_name} {staff.last_name}"
+
+
+def get_staff_names(user_ids):
+    """
+    Resolve the display names of several staff users at once.
+
+    Names come from the process-wide cache; the misses are loaded in one
+    query and cached. Entries are dropped when a BarangayStaff row is saved
+    or deleted.
+
+    Args:
+        user_ids: CustomUser ids to resolve
+
+    Returns:
+        dict: User id mapped to display name ("Barangay Staff" when the user has no profile)
+    """
+    user_ids = set(user_ids)
+    cached = cache.get_many([_staff_name_key(user_id) for user_id in user_ids])
+    names = {user_id: cached[_staff_name_key(user_id)] for user_id in user_ids if _staff_name_key(user_id) in cached}
+
+    missing = user_ids - names.keys()
+    if missing:
+        profiles = {staff.user_id: staff for staff in BarangayStaff.objects.filter(user_id__in=missing)}
+        loaded = {user_id: staff_display_name(profiles.get(user_id)) for user_id in missing}
+        cache.set_many({_staff_name_key(user_id): name for user_id, name in loaded.items()}, STAFF_NAME_TIMEOUT)
+        names.update(loaded)
+    return names
+
+
+def invalidate_staff_names(*user_ids):
+    cache.delete_many([_staff_name_key(user_id) for user_id in user_ids])
+
+
+# Search ranks are whole numbers (similarity x SEARCH_RANK_SCALE), so the rank carried
+# in a keyset cursor compares exactly with the rank recomputed on the next request
+SEARCH_RANK_SCALE = 10000
+
+
+def search_residents(residents, query):
+    """
+    Filter residents by a free-text query and rank the matches.
+
+    Every word must match: digits match the start of the phone number, other
+    words match anywhere in the resident's names and email (the indexed
+    ``search_text`` column). On PostgreSQL results are ranked by trigram word
+    similarity; elsewhere residents whose first or last name starts with the
+    first word come first.
+
+    Args:
+        residents: Resident queryset to search within
+        query: Search text as typed by the user
+
+    Returns:
+        QuerySet: Matching residents annotated with an integer ``search_rank`` (higher is better)
+    """
+    words = query.lower().split()
+    for word in words:
+        if word.isdigit():
+            residents = residents.filter(phone_number__startswith=word)
+        else:
+            residents = residents.filter(search_text__contains=word)
+
+    if not words:
+        rank = Value(0)
+    elif connections[residents.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        similarity = TrigramWordSimilarity(' '.join(words), 'search_text')
+        rank = Cast(Round(similarity * SEARCH_RANK_SCALE), IntegerField())
+    else:
+        rank = Case(
+            When(Q(first_name__istartswith=words[0]) | Q(last_name__istartswith=words[0]), then=Value(1)),
+            default=Value(0),
+        )
+    return residents.annotate(search_rank=rank)
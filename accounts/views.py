@@ -6,17 +6,23 @@ from django.contrib.auth import logout
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.db import transaction
 from .forms import CustomUserCreationForm, CustomUserUpdateForm, ResidentForm, StaffCreationForm
 from appointments.models import Appointment
+from appointments.utils import get_day_summary, get_resident_summary
 from django.contrib.auth import get_user_model
 import datetime
-from .utils import upload_document_to_supabase
+from .audit import record_event
+from .reports import report_range, report_totals
+from .stats import get_admin_stats
+from .utils import discard_staged_document, search_residents, stage_document_upload
+from .emails import queue_email
 from .models import Resident
 from django.contrib.auth.decorators import user_passes_test
-from .models import CustomUser, Resident, BarangayStaff
-from django.db.models import Count, Q
+from .models import AuditEvent, CustomUser, Resident, BarangayStaff
+from boacms_project.exports import export_response
+from boacms_project.pagination import is_fragment_request, paginate_keyset, render_fragment
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
 from django.http import JsonResponse
@@ -97,34 +103,38 @@ def register(request):
     if request.method == 'POST':
         user_form = CustomUserCreationForm(request.POST)
         resident_form = ResidentForm(request.POST, request.FILES)
+        # The upload handler stops reading an oversized document, so the rest of the form is missing too
+        upload_too_large = getattr(request, 'upload_too_large', False)
+        if upload_too_large:
+            resident_form.reject_oversized_document()
         
-        if user_form.is_valid() and resident_form.is_valid():
-            # Create user account
-            user = user_form.save(commit=False)
-            user.role = 'resident'
-            user.is_active = True  # Allow login but pending approval
-            user.save()
-            
-            # Create resident profile
-            resident = resident_form.save(commit=False)
-            resident.user = user
-            resident.approval_status = 'pending'
-            resident.barangay = 'Labangon'
-            resident.city = 'Cebu City'
-            resident.save()
-
-            # Handle document upload to Supabase
-            if 'address_document_file' in request.FILES:
-                try:
-                    document_file = request.FILES['address_document_file']
-                    # Upload to Supabase and get the URL
-                    document_url = upload_document_to_supabase(document_file, resident.id)
-                    # Save the URL to the resident model
-                    resident.address_document = document_url
+        if not upload_too_large and user_form.is_valid() and resident_form.is_valid():
+            upload = None
+            try:
+                with transaction.atomic():
+                    # Create user account
+                    user = user_form.save(commit=False)
+                    user.role = 'resident'
+                    user.is_active = True  # Allow login but pending approval
+                    user.save()
+                
+                    # Create resident profile
+                    resident = resident_form.save(commit=False)
+                    resident.user = user
+                    resident.approval_status = 'pending'
+                    resident.barangay = 'Labangon'
+                    resident.city = 'Cebu City'
                     resident.save()
-                except Exception as e:
-                    # Log the error but don't prevent registration
-                    print(f"Document upload failed: {str(e)}")
+
+                    # Stage the document; the process_document_uploads worker sends it to
+                    # Supabase and fills in resident.address_document
+                    if 'address_document_file' in request.FILES:
+                        upload = stage_document_upload(request.FILES['address_document_file'], resident)
+            except Exception:
+                # The staged file is not part of the transaction, so remove it by hand
+                if upload is not None:
+                    discard_staged_document(upload)
+                raise
             
             # Redirect to register page with success parameter
             return redirect(reverse('register') + '?success=true')
@@ -157,49 +167,12 @@ def dashboard(request):
             messages.error(request, 'Your account is pending approval. Please wait for approval.')
             return redirect('login')
         
-        # Get appointment statistics
-        all_appointments = Appointment.objects.filter(resident=request.user)
-        
-        # Count appointments by status
-        pending_appointments = all_appointments.filter(status='pending').count()
-        approved_appointments = all_appointments.filter(status='approved').count()
-        cancelled_appointments = all_appointments.filter(status='cancelled').count()
-        completed_appointments = all_appointments.filter(status='completed').count()
-        claimed_appointments = all_appointments.filter(status='claimed').count()
-        
-        # Total appointments
-        total_appointments = all_appointments.count()
-        
-        # Upcoming appointments (next 7 days)
-        today = datetime.date.today()
-        week_from_now = today + datetime.timedelta(days=7)
-        upcoming_appointments = all_appointments.filter(
-            preferred_date__gte=today,
-            preferred_date__lte=week_from_now
-        ).count()
-        
-        # Next appointment
-        next_appointment = all_appointments.filter(
-            preferred_date__gte=today,
-            status__in=['pending', 'approved']
-        ).order_by('preferred_date', 'preferred_time').first()
-        
-        # Completed appointments list (last 3)
-        completed_list = all_appointments.filter(
-            status='completed'
-        ).order_by('-preferred_date')[:3]
+        # Get appointment statistics (one aggregate query, cached until an appointment changes)
+        summary = get_resident_summary(user.id)
 
         context = {
             'user': user,
-            'total_appointments': total_appointments,
-            'upcoming_appointments': upcoming_appointments,
-            'pending_appointments': pending_appointments,
-            'approved_appointments': approved_appointments,
-            'cancelled_appointments': cancelled_appointments,
-            'completed_appointments': completed_appointments,
-            'claimed_appointments': claimed_appointments,
-            'next_appointment': next_appointment,
-            'completed_list': completed_list,
+            **summary,
         }
 
         return render(request, 'accounts/dashboard.html', context)
@@ -234,38 +207,12 @@ def staff_dashboard(request):
     today = datetime.date.today()
     is_past_date = selected_date < today
     
-    # Get appointments based on whether it's a past date or not
-    if is_past_date:
-        # For past dates, show completed appointments
-        appointments_today = Appointment.objects.filter(
-            preferred_date=selected_date,
-            status='completed'
-        ).select_related('resident__resident').order_by('preferred_time')
-    else:
-        # For today and future dates, show approved and claimed appointments
-        appointments_today = Appointment.objects.filter(
-            preferred_date=selected_date,
-            status__in=['approved', 'claimed']
-        ).select_related('resident__resident').order_by('preferred_time')
-    
-    # Split appointments into AM (before 12:00 PM) and PM (12:00 PM and after)
-    am_appointments = appointments_today.filter(preferred_time__lt=datetime.time(12, 0))
-    pm_appointments = appointments_today.filter(preferred_time__gte=datetime.time(12, 0))
-    
-    # Counts
-    am_appointments_count = am_appointments.count()
-    pm_appointments_count = pm_appointments.count()
-    total_appointments_today = appointments_today.count()
-    completed_count = Appointment.objects.filter(preferred_date=selected_date, status='completed').count()
+    # AM/PM appointments and counts for the day, built in one pass and cached per date
+    day_summary = get_day_summary(selected_date)
     residents_count = get_user_model().objects.filter(role='resident').count()
 
     context = {
-        "am_appointments": am_appointments,
-        "pm_appointments": pm_appointments,
-        "am_appointments_count": am_appointments_count,
-        "pm_appointments_count": pm_appointments_count,
-        "total_appointments_today": total_appointments_today,
-        "completed_count": completed_count,
+        **day_summary,
         "residents_count": residents_count,
         "selected_date": selected_date,
         "previous_date": previous_date,
@@ -340,34 +287,21 @@ def approve_resident(request, resident_id):
     
     try:
         resident = Resident.objects.get(id=resident_id)
-        resident.approval_status = 'approved'
-        resident.approval_date = datetime.datetime.now()
-        resident.save()
-        
-        # Send approval email
-        email_sent = False
-        try:
-            subject = 'Account Approved - Barangay Office Management System'
-            from_email = 'no-reply@barangay-office.com'  # Change this to your actual email
-            recipient_list = [resident.user.email]
-            
-            # Render email templates
-            text_content = render_to_string('emails/resident_approval.txt', {'resident': resident})
-            html_content = render_to_string('emails/resident_approval.html', {'resident': resident})
+        with transaction.atomic():
+            resident.approval_status = 'approved'
+            resident.approval_date = datetime.datetime.now()
+            resident.save()
+            record_event(request.user, AuditEvent.RESIDENT_APPROVED, resident.id)
             
-            # Create and send email
-            msg = EmailMultiAlternatives(subject, text_content, from_email, recipient_list)
-            msg.attach_alternative(html_content, "text/html")
-            msg.send()
-            email_sent = True
-        except Exception as e:
-            # If email fails, we still approve the account but log the error
-            pass  # In production, you might want to log this error
+            # Queue approval email; the send_queued_emails worker delivers it
+            queue_email(
+                'Account Approved - Barangay Office Management System',
+                'emails/resident_approval',
+                {'resident': resident},
+                resident.user.email,
+            )
         
-        if email_sent:
-            messages.success(request, f'Resident account for {resident.first_name} {resident.last_name} has been approved and notification email sent.')
-        else:
-            messages.success(request, f'Resident account for {resident.first_name} {resident.last_name} has been approved. (Notification email could not be sent)')
+        messages.success(request, f'Resident account for {resident.first_name} {resident.last_name} has been approved. A notification email has been queued.')
     except Resident.DoesNotExist:
         messages.error(request, 'Resident not found.')
     
@@ -400,35 +334,22 @@ def reject_resident(request, resident_id):
         user_email = resident.user.email  # Save email before deleting
         resident_name = f'{resident.first_name} {resident.last_name}'  # Save name before deleting
         
-        # Delete the user account
-        user = resident.user
-        resident.delete()
-        user.delete()
-        
-        # Send rejection email
-        email_sent = False
-        try:
-            subject = 'Account Rejected - Barangay Office Management System'
-            from_email = 'no-reply@barangay-office.com'  # Change this to your actual email
-            recipient_list = [user_email]
-            
-            # Render email templates
-            text_content = render_to_string('emails/resident_rejection.txt', {'resident': {'first_name': resident_name.split()[0], 'last_name': resident_name.split()[-1]}})
-            html_content = render_to_string('emails/resident_rejection.html', {'resident': {'first_name': resident_name.split()[0], 'last_name': resident_name.split()[-1]}})
+        with transaction.atomic():
+            # Delete the user account
+            user = resident.user
+            resident.delete()
+            user.delete()
+            record_event(request.user, AuditEvent.RESIDENT_REJECTED, resident_id, name=resident_name, email=user_email)
             
-            # Create and send email
-            msg = EmailMultiAlternatives(subject, text_content, from_email, recipient_list)
-            msg.attach_alternative(html_content, "text/html")
-            msg.send()
-            email_sent = True
-        except Exception as e:
-            # If email fails, we still reject the account but log the error
-            pass  # In production, you might want to log this error
+            # Queue rejection email; the send_queued_emails worker delivers it
+            queue_email(
+                'Account Rejected - Barangay Office Management System',
+                'emails/resident_rejection',
+                {'resident': {'first_name': resident_name.split()[0], 'last_name': resident_name.split()[-1]}},
+                user_email,
+            )
         
-        if email_sent:
-            messages.success(request, f'Resident account for {resident_name} has been rejected and removed. Notification email sent.')
-        else:
-            messages.success(request, f'Resident account for {resident_name} has been rejected and removed. (Notification email could not be sent)')
+        messages.success(request, f'Resident account for {resident_name} has been rejected and removed. A notification email has been queued.')
     except Resident.DoesNotExist:
         messages.error(request, 'Resident not found.')
     
@@ -445,12 +366,13 @@ def admin_dashboard(request):
     today = timezone.now().date()
     
     # Core statistics
-    pending_verifications = Resident.objects.filter(approval_status='pending').count()
-    approved_residents = Resident.objects.filter(approval_status='approved').count()
-    active_staff = CustomUser.objects.filter(role='staff', is_active=True).count()
+    stats = get_admin_stats()
+    pending_verifications = stats['residents']['pending']
+    approved_residents = stats['residents']['approved']
+    active_staff = stats['staff']['active']
     
     # Total users (all roles)
-    total_users = CustomUser.objects.all().count()
+    total_users = stats['users']['total']
     
     # Recent registrations (last 5)
     recent_registrations = Resident.objects.select_related('user').order_by('-user__date_joined')[:5]
@@ -492,26 +414,25 @@ def resident_verification(request):
         residents = residents.filter(approval_status='rejected')
     # 'all' status shows all residents (no filter applied)
     
-    # Apply search filter
+    # Newest registrations first, one page at a time; searches put the best matches first
+    ordering = ['-user__date_joined', '-id']
     if search_query:
-        residents = residents.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(user__email__icontains=search_query) |
-            Q(phone_number__icontains=search_query)
-        )
-    
-    # Order by date joined (newest first)
-    residents = residents.order_by('-user__date_joined')
+        residents = search_residents(residents, search_query)
+        ordering = ['-search_rank', *ordering]
+    page = paginate_keyset(request, residents, ordering)
+    if is_fragment_request(request):
+        return render_fragment(request, 'accounts/partials/resident_verification_rows.html', {'pending_residents': page}, page)
     
     # Get counts for each status
-    pending_count = Resident.objects.filter(approval_status='pending').count()
-    approved_count = Resident.objects.filter(approval_status='approved').count()
-    rejected_count = Resident.objects.filter(approval_status='rejected').count()
-    total_count = Resident.objects.all().count()
+    resident_counts = get_admin_stats()['residents']
+    pending_count = resident_counts['pending']
+    approved_count = resident_counts['approved']
+    rejected_count = resident_counts['rejected']
+    total_count = resident_counts['total']
     
     context = {
-        'pending_residents': residents,
+        'pending_residents': page,
+        'page': page,
         'status_filter': status_filter,
         'search_query': search_query,
         'pending_count': pending_count,
@@ -541,27 +462,22 @@ def resident_detail(request, resident_id):
         
         if action == 'approve':
             # Approve the resident
-            resident.approval_status = 'approved'
-            resident.approval_date = timezone.now()
-            resident.approval_notes = notes if notes else 'Approved by admin'
-            resident.save()
-            
-            # Send approval email
-            try:
-                subject = 'Account Approved - Barangay Office Management System'
-                from_email = 'no-reply@barangay-office.com'
-                recipient_list = [resident.user.email]
-                
-                text_content = render_to_string('emails/resident_approval.txt', {'resident': resident})
-                html_content = render_to_string('emails/resident_approval.html', {'resident': resident})
+            with transaction.atomic():
+                resident.approval_status = 'approved'
+                resident.approval_date = timezone.now()
+                resident.approval_notes = notes if notes else 'Approved by admin'
+                resident.save()
+                record_event(request.user, AuditEvent.RESIDENT_APPROVED, resident.id, notes=notes)
                 
-                msg = EmailMultiAlternatives(subject, text_content, from_email, recipient_list)
-                msg.attach_alternative(html_content, "text/html")
-                msg.send()
-                messages.success(request, f'Resident {resident.first_name} {resident.last_name} approved. Email sent.')
-            except Exception as e:
-                messages.success(request, f'Resident {resident.first_name} {resident.last_name} approved. (Email failed to send)')
+                # Queue approval email
+                queue_email(
+                    'Account Approved - Barangay Office Management System',
+                    'emails/resident_approval',
+                    {'resident': resident},
+                    resident.user.email,
+                )
             
+            messages.success(request, f'Resident {resident.first_name} {resident.last_name} approved. Email queued.')
             return redirect('resident_verification')
             
         elif action == 'reject':
@@ -573,32 +489,30 @@ def resident_detail(request, resident_id):
             # Store notes before deletion
             rejection_reason = notes if notes else 'Account did not meet requirements'
             
-            # Send rejection email
-            try:
-                subject = 'Account Rejected - Barangay Office Management System'
-                from_email = 'no-reply@barangay-office.com'
-                recipient_list = [user_email]
-                
-                context = {
-                    'resident': {
-                        'first_name': resident.first_name,
-                        'last_name': resident.last_name,
-                        'rejection_reason': rejection_reason
-                    }
+            context = {
+                'resident': {
+                    'first_name': resident.first_name,
+                    'last_name': resident.last_name,
+                    'rejection_reason': rejection_reason
                 }
-                
-                text_content = render_to_string('emails/resident_rejection.txt', context)
-                html_content = render_to_string('emails/resident_rejection.html', context)
-                
-                msg = EmailMultiAlternatives(subject, text_content, from_email, recipient_list)
-                msg.attach_alternative(html_content, "text/html")
-                msg.send()
-            except Exception as e:
-                pass
+            }
             
-            # Delete the accounts
-            resident.delete()
-            user.delete()
+            with transaction.atomic():
+                # Queue rejection email
+                queue_email(
+                    'Account Rejected - Barangay Office Management System',
+                    'emails/resident_rejection',
+                    context,
+                    user_email,
+                )
+                
+                # Delete the accounts
+                resident.delete()
+                user.delete()
+                record_event(
+                    request.user, AuditEvent.RESIDENT_REJECTED, resident_id,
+                    name=resident_name, email=user_email, reason=rejection_reason,
+                )
             
             messages.success(request, f'Resident {resident_name} rejected and removed.')
             return redirect('resident_verification')
@@ -624,9 +538,6 @@ def staff_accounts(request):
     
     # Base queryset
     staff_members = CustomUser.objects.filter(role='staff').select_related('barangaystaff')
-
-    active_count = staff_members.filter(is_active=True).count()
-    inactive_count = staff_members.filter(is_active=False).count()
     
     # Apply search filter
     if search_query:
@@ -643,12 +554,18 @@ def staff_accounts(request):
         staff_members = staff_members.filter(is_active=False)
     
     # Get counts
-    active_count = CustomUser.objects.filter(role='staff', is_active=True).count()
-    inactive_count = CustomUser.objects.filter(role='staff', is_active=False).count()
-    total_count = active_count + inactive_count
+    staff_counts = get_admin_stats()['staff']
+    active_count = staff_counts['active']
+    inactive_count = staff_counts['inactive']
+    total_count = staff_counts['total']
     
+    page = paginate_keyset(request, staff_members, ['date_joined', 'id'])
+    if is_fragment_request(request):
+        return render_fragment(request, 'accounts/partials/staff_account_rows.html', {'staff_members': page}, page)
+
     context = {
-        'staff_members': staff_members,
+        'staff_members': page,
+        'page': page,
         'active_count': active_count,
         'inactive_count': inactive_count,
         'total_count': total_count,
@@ -665,17 +582,19 @@ def create_staff_account(request):
     if request.method == 'POST':
         form = StaffCreationForm(request.POST)
         if form.is_valid():
-            user = form.save(commit=False)
-            user.role = 'staff'  # Ensure role is set to staff
-            user.save()
-            
-            # Create associated BarangayStaff record
-            BarangayStaff.objects.create(
-                user=user,
-                first_name=form.cleaned_data.get('first_name'),
-                middle_name=form.cleaned_data.get('middle_name'),
-                last_name=form.cleaned_data.get('last_name')
-            )
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.role = 'staff'  # Ensure role is set to staff
+                user.save()
+                
+                # Create associated BarangayStaff record
+                BarangayStaff.objects.create(
+                    user=user,
+                    first_name=form.cleaned_data.get('first_name'),
+                    middle_name=form.cleaned_data.get('middle_name'),
+                    last_name=form.cleaned_data.get('last_name')
+                )
+                record_event(request.user, AuditEvent.STAFF_CREATED, user.id)
             
             messages.success(request, f'Staff account created successfully!')
             return redirect('staff_accounts')
@@ -700,7 +619,13 @@ def toggle_staff_status(request, staff_id):
         else:
             staff_user.is_active = True
             action = 'activated'
-        staff_user.save()
+        with transaction.atomic():
+            staff_user.save()
+            record_event(
+                request.user,
+                AuditEvent.STAFF_ACTIVATED if staff_user.is_active else AuditEvent.STAFF_DEACTIVATED,
+                staff_user.id,
+            )
         messages.success(request, f'Staff account {action} successfully.')
     except CustomUser.DoesNotExist:
         messages.error(request, 'Staff account not found.')
@@ -718,32 +643,46 @@ def admin_reports(request):
     """Admin reports page"""
     # Get report statistics
     today = timezone.now().date()
-    month_start = today.replace(day=1)
     
-    # Monthly statistics
-    monthly_registrations = Resident.objects.filter(
-        created_at__date__gte=month_start
-    ).count()
+    # Report range, the current month unless the admin picks another one
+    start_date, end_date = report_range(request)
     
-    monthly_appointments = Appointment.objects.filter(
-        preferred_date__gte=month_start
-    ).count()
+    # Range statistics come from the daily rollups, so long ranges cost the same as a month
+    totals = report_totals(start_date, end_date)
     
     # Status breakdowns
-    appointment_statuses = Appointment.objects.values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    resident_statuses = Resident.objects.values('approval_status').annotate(
-        count=Count('id')
+    stats = get_admin_stats()
+    appointment_statuses = sorted(
+        ({'status': status, 'count': stats['appointments'][status]} for status, _ in Appointment.STATUS_CHOICES),
+        key=lambda row: -row['count'],
     )
     
+    resident_statuses = [
+        {'approval_status': status, 'count': stats['residents'][status]}
+        for status, _ in Resident.APPROVAL_STATUS_CHOICES
+    ]
+    
     # Staff activity
-    active_staff_count = CustomUser.objects.filter(role='staff', is_active=True).count()
+    active_staff_count = stats['staff']['active']
     
     context = {
-        'monthly_registrations': monthly_registrations,
-        'monthly_appointments': monthly_appointments,
+        'monthly_registrations': totals['registrations'],
+        'monthly_appointments': totals['appointments'],
+        'registration_breakdown': [
+            (label, totals['registrations_by_status'][value]) for value, label in Resident.APPROVAL_STATUS_CHOICES
+        ],
+        'status_breakdown': [
+            (label, totals['appointments_by_status'][value]) for value, label in Appointment.STATUS_CHOICES
+        ],
+        'certificate_breakdown': [
+            (label, totals['appointments_by_certificate'][value]) for value, label in Appointment.CERTIFICATE_TYPE_CHOICES
+        ],
+        'session_breakdown': [
+            ('Morning (AM)', totals['appointments_by_session']['am']),
+            ('Afternoon (PM)', totals['appointments_by_session']['pm']),
+        ],
+        'start_date': start_date,
+        'end_date': end_date,
         'appointment_statuses': appointment_statuses,
         'resident_statuses': resident_statuses,
         'active_staff_count': active_staff_count,
@@ -762,26 +701,41 @@ def admin_settings(request):
 @login_required
 @user_passes_test(is_admin)
 def activity_log(request):
-    """Activity log page"""
-    # Get recent activities from various models
-    today = timezone.now().date()
+    """Activity log page, read from the audit event store"""
+    events = AuditEvent.objects.all()
+    
+    # Filters
+    actor = request.GET.get('actor', '')
+    if actor.isdigit():
+        events = events.filter(actor_id=int(actor))
+    action = request.GET.get('action', '')
+    if action.isdigit():
+        events = events.filter(action=int(action))
+    if request.GET.get('start') or request.GET.get('end'):
+        start_date, end_date = report_range(request)
+        # Plain datetime bounds so the created_at index is used
+        events = events.filter(
+            created_at__gte=timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min)),
+            created_at__lt=timezone.make_aware(datetime.datetime.combine(end_date + timedelta(days=1), datetime.time.min)),
+        )
     
-    # Recent resident registrations
-    recent_registrations = Resident.objects.select_related('user').order_by('-created_at')[:10]
+    page = paginate_keyset(request, events, ['-created_at', '-id'])
     
-    # Recent appointments
-    recent_appointments = Appointment.objects.select_related('resident__user').order_by('-created_at')[:10]
+    # Resolve the actors of this page in one query
+    actor_ids = {event.actor_id for event in page if event.actor_id}
+    actors = dict(CustomUser.objects.filter(id__in=actor_ids).values_list('id', 'email'))
+    for event in page:
+        event.actor_email = actors.get(event.actor_id, 'System' if event.actor_id is None else f'Deleted user #{event.actor_id}')
     
-    # Recent staff actions
-    recent_staff_actions = CustomUser.objects.filter(
-        role='staff'
-    ).order_by('-date_joined')[:5]
+    if is_fragment_request(request):
+        return render_fragment(request, 'accounts/partials/activity_rows.html', {'events': page}, page)
     
     context = {
-        'recent_registrations': recent_registrations,
-        'recent_appointments': recent_appointments,
-        'recent_staff_actions': recent_staff_actions,
-        'today': today,
+        'events': page,
+        'page': page,
+        'action_choices': AuditEvent.ACTION_CHOICES,
+        'selected_action': action,
+        'selected_actor': actor,
     }
     return render(request, 'accounts/activity_log.html', context)
 
@@ -789,39 +743,86 @@ def activity_log(request):
 @login_required
 @user_passes_test(is_admin)
 def generate_report(request):
-    """Generate report view"""
+    """Download the appointments of today (daily) or this month (monthly) as CSV or XLSX"""
     report_type = request.GET.get('type', 'daily')
+    today = timezone.now().date()
     
-    if report_type == 'daily':
-        # Generate daily report
-        today = timezone.now().date()
-        new_registrations = Resident.objects.filter(
-            created_at__date=today
-        ).count()
-        
-        appointments_today = Appointment.objects.filter(
-            preferred_date=today
-        ).count()
-        
-        # You would typically generate a PDF or Excel file here
-        messages.success(request, f'Daily report generated: {new_registrations} new registrations, {appointments_today} appointments today.')
-        
-    elif report_type == 'monthly':
-        # Generate monthly report
-        today = timezone.now().date()
-        month_start = today.replace(day=1)
-        
-        monthly_registrations = Resident.objects.filter(
-            created_at__date__gte=month_start
-        ).count()
-        
-        monthly_appointments = Appointment.objects.filter(
-            preferred_date__gte=month_start
-        ).count()
-        
-        messages.success(request, f'Monthly report generated: {monthly_registrations} registrations, {monthly_appointments} appointments this month.')
+    if report_type == 'monthly':
+        start_date = today.replace(day=1)
+        end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        start_date = end_date = today
+    
+    return _appointment_export(request, start_date, end_date, f'{report_type}-report-{today:%Y-%m-%d}')
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _appointment_export(request, start_date, end_date, filename):
+    appointments = Appointment.objects.filter(preferred_date__range=(start_date, end_date))
+    
+    status = request.GET.get('status')
+    if status in dict(Appointment.STATUS_CHOICES):
+        appointments = appointments.filter(status=status)
+    certificate_type = request.GET.get('certificate_type')
+    if certificate_type in dict(Appointment.CERTIFICATE_TYPE_CHOICES):
+        appointments = appointments.filter(certificate_type=certificate_type)
     
-    return redirect('admin_reports')
+    # values_list + iterator() reads the rows through a server-side cursor in
+    # chunks while the file streams, so memory stays flat for any range
+    rows = appointments.order_by('preferred_date', 'preferred_time', 'id').values_list(
+        'id', 'resident__resident__first_name', 'resident__resident__last_name', 'resident__email',
+        'certificate_type', 'purpose', 'specify_purpose', 'preferred_date', 'preferred_time', 'status', 'created_at',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    
+    certificates = dict(Appointment.CERTIFICATE_TYPE_CHOICES)
+    purposes = dict(Appointment.PURPOSE_CHOICES)
+    statuses = dict(Appointment.STATUS_CHOICES)
+    header = ['ID', 'First Name', 'Last Name', 'Email', 'Certificate', 'Purpose', 'Purpose Details',
+              'Date', 'Time', 'Status', 'Booked At']
+    labelled = (
+        (pk, first, last, email, certificates.get(certificate, certificate), purposes.get(purpose, purpose),
+         details, day, at, statuses.get(state, state), created)
+        for pk, first, last, email, certificate, purpose, details, day, at, state, created in rows
+    )
+    return export_response(header, labelled, filename, request.GET.get('format', 'csv'))
+
+
+@login_required
+@user_passes_test(is_admin)
+def export_appointments(request):
+    """Download the appointments in a date range as CSV or XLSX"""
+    start_date, end_date = report_range(request)
+    return _appointment_export(request, start_date, end_date, f'appointments-{start_date:%Y%m%d}-{end_date:%Y%m%d}')
+
+
+@login_required
+@user_passes_test(is_admin)
+def export_residents(request):
+    """Download the residents registered in a date range as CSV or XLSX"""
+    start_date, end_date = report_range(request)
+    residents = Resident.objects.filter(user__date_joined__date__range=(start_date, end_date))
+    
+    approval_status = request.GET.get('status')
+    if approval_status in dict(Resident.APPROVAL_STATUS_CHOICES):
+        residents = residents.filter(approval_status=approval_status)
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        residents = search_residents(residents, search_query)
+    
+    rows = residents.order_by('user__date_joined', 'id').values_list(
+        'id', 'first_name', 'middle_name', 'last_name', 'user__email', 'phone_number',
+        'approval_status', 'user__date_joined', 'approval_date',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    
+    statuses = dict(Resident.APPROVAL_STATUS_CHOICES)
+    header = ['ID', 'First Name', 'Middle Name', 'Last Name', 'Email', 'Phone Number',
+              'Status', 'Registered At', 'Approved At']
+    labelled = (row[:6] + (statuses.get(row[6], row[6]),) + row[7:] for row in rows)
+    return export_response(
+        header, labelled, f'residents-{start_date:%Y%m%d}-{end_date:%Y%m%d}', request.GET.get('format', 'csv')
+    )
 
 
 @login_required
@@ -905,16 +906,20 @@ def update_appointment_status(request):
         appointment = get_object_or_404(Appointment, id=appointment_id)
         
         if action == 'claimed':
-            appointment.status = 'claimed'
-            appointment.save()
+            with transaction.atomic():
+                appointment.status = 'claimed'
+                appointment.save()
+                record_event(request.user, AuditEvent.APPOINTMENT_CLAIMED, appointment.id)
             return JsonResponse({
                 'success': True,
                 'message': 'Appointment marked as claimed',
                 'status': 'claimed'
             })
         elif action == 'no_show':
-            appointment.status = 'no_show'
-            appointment.save()
+            with transaction.atomic():
+                appointment.status = 'no_show'
+                appointment.save()
+                record_event(request.user, AuditEvent.APPOINTMENT_NO_SHOW, appointment.id)
             return JsonResponse({
                 'success': True,
                 'message': 'Appointment marked as no-show',
@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import CapacityRule
+
+
+class CapacityRuleAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'date', 'weekday', 'session', 'certificate_type', 'capacity', 'note')
+    list_filter = ('weekday', 'session', 'certificate_type')
+    ordering = ('-date', 'weekday')
+
+admin.site.register(CapacityRule, CapacityRuleAdmin)
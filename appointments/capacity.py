@@ -0,0 +1,125 @@
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Appointment, CapacityRule, SlotUsage
+
+# Office hours: bookable times run from OPEN_TIME to LAST_SLOT_TIME in SLOT_MINUTES steps
+OPEN_TIME = time(8, 0)
+LAST_SLOT_TIME = time(16, 30)
+SLOT_MINUTES = 30
+
+
+def _slot_times():
+    slots = []
+    current = datetime.combine(datetime.min, OPEN_TIME)
+    while current.time() <= LAST_SLOT_TIME:
+        slots.append(current.time())
+        current += timedelta(minutes=SLOT_MINUTES)
+    return slots
+
+
+SLOT_TIMES = _slot_times()
+# Format time as 9:00 AM instead of 09:00 AM
+TIME_CHOICES = [(slot.strftime('%H:%M'), slot.strftime('%I:%M %p').lstrip('0')) for slot in SLOT_TIMES]
+OFFICE_HOURS = f"{TIME_CHOICES[0][1]} and {TIME_CHOICES[-1][1]}"
+
+
+def within_office_hours(preferred_time):
+    return OPEN_TIME <= preferred_time <= LAST_SLOT_TIME
+
+
+CAPACITY_VERSION_KEY = 'appointments:capacity_version'
+CAPACITY_TIMEOUT = 60 * 60
+# A rule change bumps the version in this process's cache only when the cache
+# is per process (LocMemCache), so the version also expires and other workers
+# pick the change up within this many seconds
+CAPACITY_VERSION_TIMEOUT = 5 * 60
+
+# Rule lookups for every weekday, session and certificate type ('' = any type)
+_SESSIONS = [session for session, _ in SlotUsage.SESSION_CHOICES]
+_CERTIFICATE_TYPES = [''] + [value for value, _ in Appointment.CERTIFICATE_TYPE_CHOICES]
+
+
+class CapacityTable:
+    """Capacity rules resolved ahead of time into plain dict lookups."""
+
+    def __init__(self, rules, default):
+        self.default = default
+        self.weekly = {}
+        self.dated = {}
+        weekly_rules = [rule for rule in rules if rule.date is None]
+        week = [date(2024, 1, 1) + timedelta(days=offset) for offset in range(7)]  # Monday to Sunday
+        for day in week:
+            self._resolve(self.weekly, day, day.weekday(), weekly_rules)
+        for day in {rule.date for rule in rules if rule.date is not None}:
+            self._resolve(self.dated, day, day, rules)
+
+    def _resolve(self, table, day, key, rules):
+        for session in _SESSIONS:
+            for certificate_type in _CERTIFICATE_TYPES:
+                matching = [rule for rule in rules if rule.matches(day, session, certificate_type)]
+                best = max(matching, key=CapacityRule.precedence, default=None)
+                table[key, session, certificate_type] = best.capacity if best else self.default
+
+    def capacity(self, day, session, certificate_type=''):
+        key = (session, certificate_type or '')
+        capacity = self.dated.get((day, *key))
+        if capacity is None:
+            capacity = self.weekly[(day.weekday(), *key)]
+        return capacity
+
+
+# The table compiled by this process, as (version, table)
+_compiled = (None, None)
+
+
+def _capacity_version():
+    version = cache.get(CAPACITY_VERSION_KEY)
+    if version is None:
+        # Seed from the clock rather than 1, so a table this process compiled
+        # before the cache was flushed is never mistaken for the current one
+        cache.add(CAPACITY_VERSION_KEY, clock.time_ns(), CAPACITY_VERSION_TIMEOUT)
+        version = cache.get(CAPACITY_VERSION_KEY)
+    return version
+
+
+def get_capacity_table():
+    """
+    Return the compiled capacity rules.
+
+    The rules are read in one query and compiled into a table that is shared
+    through the cache and kept in memory by each process, so resolving a
+    capacity is a dict lookup. Changing a rule bumps a version number, which
+    makes every process compile the table again on its next call.
+
+    Returns:
+        CapacityTable: The rules in force
+    """
+    global _compiled
+    version = _capacity_version()
+    if _compiled[0] == version:
+        return _compiled[1]
+
+    key = f"appointments:capacity:{version}"
+    table = cache.get(key)
+    if table is None:
+        table = CapacityTable(list(CapacityRule.objects.all()), settings.APPOINTMENT_SESSION_CAPACITY)
+        cache.set(key, table, CAPACITY_TIMEOUT)
+    _compiled = (version, table)
+    return table
+
+
+def capacity_for(day, session, certificate_type=''):
+    """Bookings the session on ``day`` takes for ``certificate_type`` (0 when closed)."""
+    return get_capacity_table().capacity(day, session, certificate_type)
+
+
+def invalidate_capacity():
+    try:
+        cache.incr(CAPACITY_VERSION_KEY)
+    except ValueError:
+        # No version stored yet, so nothing is cached under the old one
+        pass
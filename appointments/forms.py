@@ -1,32 +1,13 @@
 from django import forms
+from .capacity import OFFICE_HOURS, TIME_CHOICES, within_office_hours
 from .models import Appointment
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-import datetime
 from datetime import time
 
 class AppointmentForm(forms.ModelForm):
-    # Generate time choices in 30-minute intervals from 8:00 AM to 4:30 PM
-    TIME_CHOICES = []
-    start_time = time(8, 0)   # 8:00 AM
-    end_time = time(16, 30)   # 4:30 PM (changed from 5:00 PM)
-    
-    current_time = start_time
-    while current_time <= end_time:
-        time_str = current_time.strftime('%H:%M')
-        # Format time as 9:00 AM instead of 09:00 AM
-        time_display = current_time.strftime('%I:%M %p').lstrip('0')
-        TIME_CHOICES.append((time_str, time_display))
-        
-        # Add 30 minutes to current time
-        hour = current_time.hour
-        minute = current_time.minute + 30
-        
-        if minute >= 60:
-            hour += 1
-            minute -= 60
-            
-        current_time = time(hour, minute)
+    # Office hours are defined once in capacity.py for every form and check
+    TIME_CHOICES = TIME_CHOICES
     
     preferred_time = forms.ChoiceField(
         choices=TIME_CHOICES,
@@ -76,11 +57,8 @@ class AppointmentForm(forms.ModelForm):
         else:
             preferred_time_obj = preferred_time
 
-        open_time = time(8, 0)
-        close_time = time(16, 30)  # Changed to 4:30 PM
-
-        if preferred_time_obj and not (open_time <= preferred_time_obj <= close_time):
-            raise ValidationError("Appointments are only available between 8:00 AM and 4:30 PM")
+        if preferred_time_obj and not within_office_hours(preferred_time_obj):
+            raise ValidationError(f"Appointments are only available between {OFFICE_HOURS}")
         
         return preferred_time
     
@@ -134,27 +112,7 @@ class RescheduleForm(forms.Form):
         help_text='Select a new date for the appointment.'
     )
     
-    # Generate time choices in 30-minute intervals from 9:00 AM to 4:30 PM
-    TIME_CHOICES = []
-    start_time = datetime.time(9, 0)   # 9:00 AM
-    end_time = datetime.time(16, 30)   # 4:30 PM
-    
-    current_time = start_time
-    while current_time <= end_time:
-        time_str = current_time.strftime('%H:%M')
-        # Format time as 9:00 AM instead of 09:00 AM
-        time_display = current_time.strftime('%I:%M %p').lstrip('0')
-        TIME_CHOICES.append((time_str, time_display))
-        
-        # Add 30 minutes to current time
-        hour = current_time.hour
-        minute = current_time.minute + 30
-        
-        if minute >= 60:
-            hour += 1
-            minute -= 60
-            
-        current_time = datetime.time(hour, minute)
+    TIME_CHOICES = TIME_CHOICES
     
     new_time = forms.ChoiceField(
         choices=TIME_CHOICES,
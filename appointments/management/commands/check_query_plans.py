@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from appointments.query_plans import find_sequential_scans
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot appointment and resident queries and fail if any falls back to a sequential scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='Refresh table statistics before explaining')
+
+    def handle(self, *args, **options):
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        regressions = find_sequential_scans()
+
+        for name, (tables, plan) in regressions.items():
+            self.stdout.write(self.style.ERROR(f'{name}: sequential scan on {", ".join(tables)}'))
+            self.stdout.write(plan)
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} hot queries no longer use an index.')
+
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from appointments.utils import expire_past_appointments
+
+
+class Command(BaseCommand):
+    help = 'Cancel pending and approved appointments whose date has already passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and sweep every N seconds (default: sweep once and exit)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            close_old_connections()
+            expired = expire_past_appointments()
+
+            if expired is None:
+                self.stdout.write(
+                    self.style.WARNING('Another worker is already sweeping; skipped.')
+                )
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Expired {expired} past appointment(s).')
+                )
+
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from appointments.models import SlotUsage
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-session booked slot table from existing appointments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, help='Last date to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('Dates must use the YYYY-MM-DD format.')
+
+        rows = SlotUsage.rebuild(start=start, end=end)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt slot usage: {rows} date/session rows written.')
+        )
@@ -0,0 +1,308 @@
+import http.client
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from accounts.models import CustomUser
+
+# Scenario name (the URL name it drives) -> (role that runs it, HTTP method)
+SCENARIOS = {
+    'certification': ('resident', 'POST'),
+    'api_month_availability': ('resident', 'GET'),
+    'api_date_availability': ('resident', 'GET'),
+    'api_availability': ('resident', 'GET'),
+    'staff_dashboard': ('staff', 'GET'),
+    'approved_appointments': ('staff', 'GET'),
+    'api_appointments_list': ('staff', 'GET'),
+}
+
+BOOKING_TIMES = ['08:00', '09:00', '10:30', '11:30', '13:00', '14:00', '15:30', '16:30']
+
+SAVEPOINT_SQL = re.compile(r'^(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+
+
+class RollBack(Exception):
+    """Raised to undo a request measured by measure_queries."""
+
+
+def build_request(name, rng, today):
+    """Return the path and POST data (None for GET) for one request of a scenario."""
+    day = today + timedelta(days=rng.randint(1, 60))
+    path = reverse(name)
+    if name == 'certification':
+        return path, {
+            'certificate_type': 'barangay_clearance',
+            'preferred_date': day.isoformat(),
+            'preferred_time': rng.choice(BOOKING_TIMES),
+            'purpose': 'employment',
+        }
+    if name in ('api_date_availability', 'staff_dashboard'):
+        return f"{path}?{urlencode({'date': day.isoformat()})}", None
+    if name in ('api_appointments_list', 'api_availability'):
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+        return f"{path}?{urlencode({'start': start.isoformat(), 'end': end.isoformat()})}", None
+    return path, None
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarise(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round((len(latencies) + errors) / elapsed, 2) if elapsed else 0,
+        'mean_ms': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': to_ms(percentile(latencies, 50)),
+        'p95_ms': to_ms(percentile(latencies, 95)),
+        'p99_ms': to_ms(percentile(latencies, 99)),
+    }
+
+
+def find_regressions(baseline, current, threshold):
+    """
+    Compare two benchmark results scenario by scenario.
+
+    Args:
+        baseline: Result dict from an earlier run
+        current: Result dict from this run
+        threshold: Allowed relative p95 slowdown (0.2 means 20%)
+
+    Returns:
+        list: Human-readable description of each regression
+    """
+    regressions = []
+    for name, stats in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        if before.get('p95_ms') and stats.get('p95_ms') and stats['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if (before.get('queries_per_request') is not None and stats.get('queries_per_request') is not None
+                and stats['queries_per_request'] > before['queries_per_request']):
+            regressions.append(
+                f"{name}: queries per request {before['queries_per_request']} -> {stats['queries_per_request']}"
+            )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Drive the booking, availability and dashboard URLs with concurrent users and record latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', type=str, default='http://127.0.0.1:8000', help='Server to benchmark')
+        parser.add_argument('--users', type=int, default=10, help='Concurrent simulated users')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--scenarios', type=str, default=','.join(SCENARIOS), help='Comma-separated scenarios to run')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for request parameters')
+        parser.add_argument('--output', type=str, help='Where to write the JSON results (default: benchmark_results/)')
+        parser.add_argument('--compare', type=str, help='Earlier JSON result to check this run against')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative p95 slowdown when comparing')
+        parser.add_argument(
+            '--spawn-gunicorn',
+            type=int,
+            default=0,
+            metavar='WORKERS',
+            help='Start a local gunicorn with this many workers on --base-url for the run',
+        )
+
+    def handle(self, *args, **options):
+        self.scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(self.scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        base_url = urlsplit(options['base_url'])
+        self.host, self.port = base_url.hostname, base_url.port or 80
+        self.seed = options['seed']
+        self.today = timezone.localdate()
+        self.users = self.pick_users(options['users'])
+        self.cookies = {role: [self.session_cookie(user) for user in users] for role, users in self.users.items()}
+        self.csrf_token = get_random_string(32)
+
+        queries = self.measure_queries()
+
+        server = self.spawn_gunicorn(options['spawn_gunicorn']) if options['spawn_gunicorn'] else None
+        try:
+            started_at = timezone.now()
+            elapsed, samples = self.run(options['users'], options['duration'])
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+        result = self.build_result(started_at, elapsed, samples, queries, options)
+        self.report(result)
+
+        output = options['output'] or os.path.join(
+            'benchmark_results', f"{started_at:%Y%m%d-%H%M%S}-{result['git_commit'] or 'unknown'}.json"
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as handle:
+            json.dump(result, handle, indent=2)
+        self.stdout.write(f'Results written to {output}')
+
+        if options['compare']:
+            with open(options['compare']) as handle:
+                regressions = find_regressions(json.load(handle), result, options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'{len(regressions)} regressions against {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["compare"]}.'))
+
+    def pick_users(self, count):
+        users = {}
+        for role in {SCENARIOS[name][0] for name in self.scenarios}:
+            users[role] = list(CustomUser.objects.filter(role=role, is_active=True).order_by('id')[:count])
+            if not users[role]:
+                raise CommandError(f'No active {role} accounts to log in as. Run seed_load_data first.')
+        return users
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def measure_queries(self):
+        """
+        Count the queries behind one request of each scenario by running it in-process.
+
+        Each request runs in a transaction that is rolled back, so measuring the
+        booking scenario does not leave a real appointment behind.
+        """
+        rng = random.Random(self.seed)
+        counts = {}
+        for name in self.scenarios:
+            role, _ = SCENARIOS[name]
+            client = Client(raise_request_exception=False, HTTP_HOST=self.host)
+            client.force_login(self.users[role][0])
+            path, data = build_request(name, rng, self.today)
+            try:
+                with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                    client.get(path) if data is None else client.post(path, data)
+                    raise RollBack
+            except RollBack:
+                pass
+            # Session and auth lookups are part of every real request, so they are counted;
+            # the savepoints the view's own atomic blocks turn into here are not
+            counts[name] = sum(1 for query in captured if not SAVEPOINT_SQL.match(query['sql']))
+        return counts
+
+    def spawn_gunicorn(self, workers):
+        server = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn', 'boacms_project.wsgi',
+            '--bind', f'{self.host}:{self.port}', '--workers', str(workers),
+        ])
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((self.host, self.port), timeout=1).close()
+                return server
+            except OSError:
+                if server.poll() is not None:
+                    raise CommandError('gunicorn exited before accepting connections.')
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError('gunicorn did not start accepting connections within 30 seconds.')
+
+    def run(self, users, duration):
+        deadline = time.monotonic() + duration
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            batches = list(executor.map(lambda index: self.simulate_user(index, deadline), range(users)))
+        return time.monotonic() - started, [sample for batch in batches for sample in batch]
+
+    def simulate_user(self, index, deadline):
+        rng = random.Random(self.seed + index)
+        cookies = {role: cookies[index % len(cookies)] for role, cookies in self.cookies.items()}
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        samples = []
+        while time.monotonic() < deadline:
+            name = rng.choice(self.scenarios)
+            role, method = SCENARIOS[name]
+            path, data = build_request(name, rng, self.today)
+            headers = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={cookies[role]}; '
+                                 f'{settings.CSRF_COOKIE_NAME}={self.csrf_token}'}
+            body = None
+            if data is not None:
+                body = urlencode(data)
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+                headers['X-CSRFToken'] = self.csrf_token
+
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                # Reconnect on the next request
+                conn.close()
+                ok = False
+            samples.append((name, time.perf_counter() - started, ok))
+        conn.close()
+        return samples
+
+    def build_result(self, started_at, elapsed, samples, queries, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        scenarios = {}
+        for name in self.scenarios:
+            latencies = [latency for scenario, latency, ok in samples if scenario == name and ok]
+            errors = sum(1 for scenario, _, ok in samples if scenario == name and not ok)
+            scenarios[name] = summarise(latencies, errors, elapsed)
+            scenarios[name]['queries_per_request'] = queries.get(name)
+
+        return {
+            'started_at': started_at.isoformat(),
+            'git_commit': commit,
+            'database': connection.vendor,
+            'base_url': options['base_url'],
+            'users': options['users'],
+            'duration_s': round(elapsed, 2),
+            'total': summarise([latency for _, latency, ok in samples if ok], sum(1 for *_, ok in samples if not ok), elapsed),
+            'scenarios': scenarios,
+        }
+
+    def report(self, result):
+        self.stdout.write(f"{'scenario':<24}{'reqs':>8}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+        rows = list(result['scenarios'].items()) + [('total', result['total'])]
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<24}{stats['requests']:>8}{stats['errors']:>8}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms'] if stats['p50_ms'] is not None else '-':>9}"
+                f"{stats['p95_ms'] if stats['p95_ms'] is not None else '-':>9}"
+                f"{stats['p99_ms'] if stats['p99_ms'] is not None else '-':>9}"
+                f"{stats.get('queries_per_request', '-'):>9}"
+            )
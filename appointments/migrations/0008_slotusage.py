@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:15
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+
+
+def fill_slot_usage(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    SlotUsage = apps.get_model('appointments', 'SlotUsage')
+
+    # Same grouping as SlotUsage.rebuild(): every appointment that is not cancelled holds a slot
+    counts = Appointment.objects.exclude(status='cancelled').annotate(
+        slot_session=Case(When(preferred_time__lt=datetime.time(12, 0), then=Value('am')), default=Value('pm'))
+    ).values('preferred_date', 'slot_session').annotate(total=Count('id')).order_by()
+    SlotUsage.objects.bulk_create([
+        SlotUsage(date=row['preferred_date'], session=row['slot_session'], booked=row['total'])
+        for row in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_remove_appointment_custom_purpose_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('completed', 'Completed'), ('claimed', 'Claimed'), ('cancelled', 'Cancelled'), ('no_show', 'No Show')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='SlotUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('session', models.CharField(choices=[('am', 'AM'), ('pm', 'PM')], max_length=2)),
+                ('booked', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'session'), name='unique_slot_usage_per_session')],
+            },
+        ),
+        migrations.RunPython(fill_slot_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0008_slotusage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['preferred_date', 'status'], name='appointment_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['resident', 'status'], name='appointment_resident_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'preferred_date', 'preferred_time'], name='appointment_status_sched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'approved'])), fields=['preferred_date'], name='appointment_open_date_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_appointment_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyRollupDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyAppointmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('completed', 'Completed'), ('claimed', 'Claimed'), ('cancelled', 'Cancelled'), ('no_show', 'No Show')], max_length=20)),
+                ('certificate_type', models.CharField(choices=[('barangay_clearance', 'Barangay Clearance'), ('certificate_of_indigency', 'Certificate of Indigency'), ('community_tax_certificate', 'Community Tax Certificate'), ('solo_parent_certificate', 'Solo Parent Certificate')], max_length=50)),
+                ('session', models.CharField(choices=[('am', 'AM'), ('pm', 'PM')], max_length=2)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'status', 'certificate_type', 'session'), name='unique_appointment_rollup_row')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_daily_appointment_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapacityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(blank=True, help_text='Only on this day, e.g. a holiday', null=True)),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], null=True)),
+                ('session', models.CharField(blank=True, choices=[('am', 'AM'), ('pm', 'PM')], default='', max_length=2)),
+                ('certificate_type', models.CharField(blank=True, choices=[('barangay_clearance', 'Barangay Clearance'), ('certificate_of_indigency', 'Certificate of Indigency'), ('community_tax_certificate', 'Community Tax Certificate'), ('solo_parent_certificate', 'Solo Parent Certificate')], default='', help_text='Bookings of this type are accepted while the session has fewer than this many bookings', max_length=50)),
+                ('capacity', models.PositiveIntegerField(help_text='Bookings per session; 0 means closed')),
+                ('note', models.CharField(blank=True, default='', max_length=200)),
+            ],
+        ),
+    ]
@@ -1,8 +1,141 @@
 import datetime
-from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Greatest
 from django.conf import settings
-    
+
+# Marker for appointments loaded with their slot fields deferred.
+UNTRACKED = object()
+
+
+class SlotUsage(models.Model):
+    """Booked appointment count per date and session, kept in sync by Appointment.save()."""
+    SESSION_CHOICES = [
+        ('am', 'AM'),
+        ('pm', 'PM'),
+    ]
+    date = models.DateField()
+    session = models.CharField(max_length=2, choices=SESSION_CHOICES)
+    booked = models.PositiveIntegerField(default=0)
+
+    # Statuses that give the slot back to the session.
+    RELEASED_STATUSES = ('cancelled',)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'session'], name='unique_slot_usage_per_session'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.get_session_display()}: {self.booked} booked"
+
+    @staticmethod
+    def session_for(preferred_time):
+        if isinstance(preferred_time, str):
+            hour = int(preferred_time.split(':')[0])
+        else:
+            hour = preferred_time.hour
+        return 'am' if hour < 12 else 'pm'
+
+    @classmethod
+    def key_for(cls, preferred_date, preferred_time, status):
+        """Return the (date, session) an appointment occupies, or None if it holds no slot."""
+        if preferred_date is None or preferred_time is None or status in cls.RELEASED_STATUSES:
+            return None
+        if isinstance(preferred_date, str):
+            preferred_date = datetime.date.fromisoformat(preferred_date)
+        return (preferred_date, cls.session_for(preferred_time))
+
+    @classmethod
+    def adjust(cls, key, delta):
+        slot_date, session = key
+        counters = cls.objects.filter(date=slot_date, session=session)
+        if delta < 0:
+            counters.filter(booked__gte=-delta).update(booked=F('booked') + delta)
+            return
+        if not counters.update(booked=F('booked') + delta):
+            _, created = cls.objects.get_or_create(date=slot_date, session=session, defaults={'booked': delta})
+            if not created:
+                counters.update(booked=F('booked') + delta)
+
+    @classmethod
+    def reserve(cls, key, capacity):
+        """Atomically take one slot in the session, returning False when it is already full.
+
+        The conditional UPDATE locks only this date/session row, so concurrent
+        bookings for other sessions are never serialised behind it.
+        """
+        if capacity <= 0:
+            return False
+        slot_date, session = key
+        counters = cls.objects.filter(date=slot_date, session=session, booked__lt=capacity)
+        if counters.update(booked=F('booked') + 1):
+            return True
+        _, created = cls.objects.get_or_create(date=slot_date, session=session, defaults={'booked': 1})
+        return created or bool(counters.update(booked=F('booked') + 1))
+
+    @classmethod
+    def move(cls, previous, current):
+        """Move one booking from the previous slot key to the current one."""
+        if previous == current:
+            return
+        if previous is not None:
+            cls.adjust(previous, -1)
+        if current is not None:
+            cls.adjust(current, 1)
+
+    @staticmethod
+    def annotate_session(appointments):
+        """Annotate an Appointment queryset with the 'am'/'pm' session as ``slot_session``."""
+        return appointments.annotate(
+            slot_session=Case(
+                When(preferred_time__lt=datetime.time(12, 0), then=Value('am')),
+                default=Value('pm'),
+            )
+        )
+
+    @classmethod
+    def release_many(cls, appointments):
+        """Give back the slots held by an Appointment queryset that is about to be bulk-released.
+
+        Returns a dict mapping each released (date, session) to the number of slots given back.
+        """
+        released = cls.annotate_session(
+            appointments.exclude(status__in=cls.RELEASED_STATUSES)
+        ).values('preferred_date', 'slot_session').annotate(total=Count('id')).order_by()
+        totals = {}
+        for row in released:
+            cls.objects.filter(date=row['preferred_date'], session=row['slot_session']).update(
+                booked=Greatest(F('booked') - row['total'], 0)
+            )
+            totals[(row['preferred_date'], row['slot_session'])] = row['total']
+        return totals
+
+    @classmethod
+    def rebuild(cls, start=None, end=None):
+        """Recount SlotUsage from Appointment for an optional date range and return the rows written."""
+        appointments = Appointment.objects.exclude(status__in=cls.RELEASED_STATUSES)
+        usage = cls.objects.all()
+        if start:
+            appointments = appointments.filter(preferred_date__gte=start)
+            usage = usage.filter(date__gte=start)
+        if end:
+            appointments = appointments.filter(preferred_date__lte=end)
+            usage = usage.filter(date__lte=end)
+
+        counts = cls.annotate_session(appointments).values(
+            'preferred_date', 'slot_session'
+        ).annotate(total=Count('id')).order_by()
+
+        with transaction.atomic():
+            usage.delete()
+            rows = cls.objects.bulk_create([
+                cls(date=row['preferred_date'], session=row['slot_session'], booked=row['total'])
+                for row in counts
+            ])
+        return len(rows)
+
+
 class Appointment(models.Model):
     resident = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
@@ -39,6 +172,9 @@ class Appointment(models.Model):
         ('no_show', 'No Show'),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    # Statuses that are cancelled automatically once the preferred date has passed.
+    EXPIRABLE_STATUSES = ('pending', 'approved')
     
     # Add cancellation reason field
     cancellation_reason = models.TextField(blank=True, null=True, help_text="Reason for cancellation provided by staff")
@@ -51,10 +187,166 @@ class Appointment(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
-    def refresh_if_expired(self):    
-        if self.preferred_date < timezone.localdate() and self.status not in ['completed', 'cancelled', 'claimed']:
-            self.status = 'cancelled'
-            self.save(update_fields=['status'])
+    class Meta:
+        indexes = [
+            # Day schedules and the calendar window
+            models.Index(fields=['preferred_date', 'status'], name='appointment_date_status_idx'),
+            # Resident dashboards and history
+            models.Index(fields=['resident', 'status'], name='appointment_resident_idx'),
+            # Staff lists filtered by status and ordered by schedule
+            models.Index(fields=['status', 'preferred_date', 'preferred_time'], name='appointment_status_sched_idx'),
+            # Expiry sweep only ever looks at open appointments
+            models.Index(
+                fields=['preferred_date'],
+                condition=Q(status__in=['pending', 'approved']),
+                name='appointment_open_date_idx',
+            ),
+        ]
+
+    # Slot this appointment occupied when it was loaded, used to move the
+    # SlotUsage counters when the date, time or status changes.
+    _booked_slot = None
+    _previous_slot = None
+    # Slot already claimed by reserve() for the next save, see reschedule()
+    _reserved_slot = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'preferred_date', 'preferred_time', 'status'} & instance.get_deferred_fields():
+            instance._booked_slot = UNTRACKED
+        else:
+            instance._booked_slot = instance.slot_key()
+        return instance
+
+    def slot_key(self):
+        return SlotUsage.key_for(self.preferred_date, self.preferred_time, self.status)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._booked_slot
+            if previous is UNTRACKED:
+                stored = Appointment.objects.filter(pk=self.pk).values_list(
+                    'preferred_date', 'preferred_time', 'status'
+                ).first()
+                previous = SlotUsage.key_for(*stored) if stored else None
+            # Exposed to post_save receivers so caches for the old date can be dropped too
+            self._previous_slot = previous
+            super().save(*args, **kwargs)
+            current = self.slot_key()
+            reserved, self._reserved_slot = self._reserved_slot, None
+            if reserved is not None and reserved == current:
+                # The new slot is already counted, so only the old one is given back
+                SlotUsage.move(previous, None)
+            else:
+                SlotUsage.move(previous, current)
+            self._booked_slot = current
+
+    def book(self, capacity):
+        """Save a new appointment only if its session still has fewer than ``capacity`` bookings."""
+        with transaction.atomic():
+            key = self.slot_key()
+            if key is not None and not SlotUsage.reserve(key, capacity):
+                return False
+            # The slot is already counted by reserve(), so save() must not move it again.
+            self._booked_slot = key
+            self.save()
+        return True
+
+    def reschedule(self, preferred_date, preferred_time, capacity):
+        """Move the appointment to a new date and time only if that session has fewer than ``capacity`` bookings."""
+        with transaction.atomic():
+            target = SlotUsage.key_for(preferred_date, preferred_time, self.status)
+            if target is not None and target != self.slot_key():
+                if not SlotUsage.reserve(target, capacity):
+                    return False
+                self._reserved_slot = target
+            self.preferred_date = preferred_date
+            self.preferred_time = preferred_time
+            self.save()
+        return True
 
     def __str__(self):
-        return f"{self.resident.get_full_name()}'s appointment for {self.get_certificate_type_display()} on {self.preferred_date}"
\ No newline at end of file
+        return f"{self.resident.get_full_name()}'s appointment for {self.get_certificate_type_display()} on {self.preferred_date}"
+
+class DailyAppointmentRollup(models.Model):
+    """Appointment count per day, status, certificate type and session, for the admin reports."""
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    certificate_type = models.CharField(max_length=50, choices=Appointment.CERTIFICATE_TYPE_CHOICES)
+    session = models.CharField(max_length=2, choices=SlotUsage.SESSION_CHOICES)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'status', 'certificate_type', 'session'], name='unique_appointment_rollup_row'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status} {self.certificate_type} {self.session}: {self.total}"
+
+
+class DirtyRollupDate(models.Model):
+    """Day whose report rollups are out of date, waiting for the build_daily_rollups command."""
+    date = models.DateField(unique=True)
+
+    def __str__(self):
+        return str(self.date)
+
+    @classmethod
+    def mark(cls, *dates):
+        """Flag days for the next rollup run; call inside the transaction that changed them."""
+        dates = {day for day in dates if day is not None}
+        if dates:
+            cls.objects.bulk_create([cls(date=day) for day in dates], ignore_conflicts=True)
+
+
+class CapacityRule(models.Model):
+    """
+    How many bookings a session takes, for the days, sessions and certificate types it matches.
+
+    Blank fields match everything. When several rules match, the one for a
+    specific date wins, then the one with the most fields set, then the newest.
+    A capacity of 0 closes the office, e.g. a holiday rule with only ``date`` set.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    date = models.DateField(blank=True, null=True, help_text="Only on this day, e.g. a holiday")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, blank=True, null=True)
+    session = models.CharField(max_length=2, choices=SlotUsage.SESSION_CHOICES, blank=True, default='')
+    certificate_type = models.CharField(
+        max_length=50, choices=Appointment.CERTIFICATE_TYPE_CHOICES, blank=True, default='',
+        help_text="Bookings of this type are accepted while the session has fewer than this many bookings",
+    )
+    capacity = models.PositiveIntegerField(help_text="Bookings per session; 0 means closed")
+    note = models.CharField(max_length=200, blank=True, default='')
+
+    def __str__(self):
+        scope = [
+            str(self.date) if self.date else '',
+            self.get_weekday_display() if self.weekday is not None else '',
+            self.get_session_display() if self.session else '',
+            self.get_certificate_type_display() if self.certificate_type else '',
+        ]
+        return f"{' '.join(part for part in scope if part) or 'Every day'}: {self.capacity}"
+
+    def matches(self, day, session, certificate_type):
+        return (
+            (self.date is None or self.date == day)
+            and (self.weekday is None or self.weekday == day.weekday())
+            and (not self.session or self.session == session)
+            and (not self.certificate_type or self.certificate_type == certificate_type)
+        )
+
+    def precedence(self):
+        specific = (self.weekday is not None) + bool(self.session) + bool(self.certificate_type)
+        return (self.date is not None, specific, self.id)
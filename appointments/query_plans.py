@@ -0,0 +1,89 @@
+import re
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import Resident
+from .models import Appointment
+
+# Plan lines that read a whole table instead of going through an index
+SEQUENTIAL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)'),
+}
+
+
+def hot_queries(today=None):
+    """
+    Build the querysets behind the busiest pages, keyed by a short name.
+
+    Args:
+        today: Reference date for the date-bound queries (defaults to today)
+
+    Returns:
+        dict: Query name mapped to an unevaluated QuerySet
+    """
+    today = today or timezone.localdate()
+    return {
+        'day_schedule': Appointment.objects.filter(
+            preferred_date=today,
+            status__in=['approved', 'claimed', 'completed'],
+        ).order_by('preferred_time'),
+        'calendar_window': Appointment.objects.filter(
+            preferred_date__gte=today,
+            preferred_date__lt=today + timedelta(days=31),
+        ).order_by('preferred_date', 'preferred_time'),
+        'resident_history': Appointment.objects.filter(
+            resident_id=0,
+            status='completed',
+        ).order_by('-preferred_date'),
+        'status_list': Appointment.objects.filter(
+            status='cancelled',
+        ).order_by('-preferred_date', '-preferred_time'),
+        'expiry_sweep': Appointment.objects.filter(
+            preferred_date__lt=today,
+            status__in=Appointment.EXPIRABLE_STATUSES,
+        ),
+        'verification_queue': Resident.objects.filter(
+            approval_status='pending',
+        ).select_related('user').order_by('user__date_joined'),
+    }
+
+
+def explain(queryset):
+    """Return the database's plan for a queryset as text.
+
+    On PostgreSQL sequential scans are disabled for the statement, so a
+    ``Seq Scan`` in the plan means no usable index exists at all rather than
+    the planner preferring a scan on a small table.
+    """
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+    return queryset.explain()
+
+
+def find_sequential_scans(today=None):
+    """
+    Run EXPLAIN on every hot query and report the ones that scan a table.
+
+    Args:
+        today: Reference date passed to hot_queries()
+
+    Returns:
+        dict: Query name mapped to (scanned tables, plan text) for each regression
+    """
+    pattern = SEQUENTIAL_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return {}
+
+    regressions = {}
+    for name, queryset in hot_queries(today).items():
+        plan = explain(queryset)
+        tables = sorted(set(pattern.findall(plan)))
+        if tables:
+            regressions[name] = (tables, plan)
+    return regressions
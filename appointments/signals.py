@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from boacms_project.events import publish
+
+from .capacity import invalidate_capacity
+from .models import Appointment, CapacityRule, DirtyRollupDate, SlotUsage, UNTRACKED
+from .utils import invalidate_availability, invalidate_day_summary, invalidate_resident_summary
+
+
+@receiver(post_delete, sender=Appointment)
+def release_deleted_appointment_slot(sender, instance, **kwargs):
+    """Give the slot back when an appointment row is deleted (including cascades)."""
+    booked_slot = instance._booked_slot
+    if booked_slot is UNTRACKED:
+        booked_slot = instance.slot_key()
+    SlotUsage.move(booked_slot, None)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_cached_resident_summary(sender, instance, **kwargs):
+    """Drop the resident's cached dashboard summary once the change is committed."""
+    resident_id = instance.resident_id
+    transaction.on_commit(lambda: invalidate_resident_summary(resident_id))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_cached_day_summary(sender, instance, **kwargs):
+    """Drop the cached staff dashboard day for the appointment's date, and its old date if rescheduled."""
+    dates = {instance.preferred_date}
+    if instance._previous_slot is not None:
+        dates.add(instance._previous_slot[0])
+    transaction.on_commit(lambda: invalidate_day_summary(*dates))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def mark_rollup_dates(sender, instance, **kwargs):
+    """Queue the appointment's date, and its old date if rescheduled, for the next rollup run."""
+    previous_date = instance._previous_slot[0] if instance._previous_slot is not None else None
+    DirtyRollupDate.mark(instance.preferred_date, previous_date)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_cached_availability(sender, **kwargs):
+    """Make cached availability ranges stale once a booking change is committed."""
+    transaction.on_commit(invalidate_availability)
+
+
+@receiver(post_save, sender=CapacityRule)
+@receiver(post_delete, sender=CapacityRule)
+def invalidate_compiled_capacity(sender, **kwargs):
+    """Make every process compile the capacity rules again once the change is committed."""
+    transaction.on_commit(invalidate_capacity)
+
+
+def _publish_slot_delta(key, delta):
+    if key is not None:
+        slot_date, session = key
+        publish('availability', 'slots', {'date': slot_date, 'session': session, 'delta': delta})
+
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment_change(sender, instance, created, **kwargs):
+    """Push the slot count change and the new status to open availability and staff streams."""
+    current = instance.slot_key()
+    # book() counts the slot before saving, so a new row always takes its slot here
+    previous = None if created else instance._previous_slot
+    if previous != current:
+        _publish_slot_delta(previous, -1)
+        _publish_slot_delta(current, 1)
+    publish('staff', 'appointment', {
+        'id': instance.id,
+        'date': instance.preferred_date,
+        'previous_date': previous[0] if previous else None,
+        'status': instance.status,
+    })
+
+
+@receiver(post_delete, sender=Appointment)
+def publish_appointment_removal(sender, instance, **kwargs):
+    booked_slot = instance._booked_slot
+    if booked_slot is UNTRACKED:
+        booked_slot = instance.slot_key()
+    _publish_slot_delta(booked_slot, -1)
+    publish('staff', 'appointment', {
+        'id': instance.id,
+        'date': instance.preferred_date,
+        'previous_date': None,
+        'status': 'deleted',
+    })
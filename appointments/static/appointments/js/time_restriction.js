@@ -1,6 +1,6 @@
 (function() {
-    const MIN = "09:00";
-    const MAX = "17:00";
+    const MIN = "08:00";
+    const MAX = "16:30";
 
     function setConstraints() {
       // Updated selector to target select elements for time instead of input[type="time"]
@@ -1,3 +1,686 @@
-from django.test import TestCase
+import datetime
+import random
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import AuditEvent, Resident
+from accounts.stats import get_admin_stats
+from boacms_project.events import broker, event_stream
+
+from .capacity import CAPACITY_VERSION_TIMEOUT, capacity_for, get_capacity_table
+from .management.commands.run_load_benchmark import Command as BenchmarkCommand, find_regressions, summarise
+from .models import Appointment, CapacityRule, SlotUsage
+from .query_plans import find_sequential_scans
+from .utils import EXPIRED_REASON, expire_past_appointments, get_booked_counts
+from .views import find_nearest_available_slot
+
+
+def make_user(email='resident@example.com', role='resident'):
+    user = get_user_model()(email=email, role=role)
+    user.set_unusable_password()
+    user.save()
+    return user
+
+
+def make_appointment(resident, preferred_date, preferred_time=datetime.time(9, 0), status='approved'):
+    return Appointment.objects.create(
+        resident=resident,
+        certificate_type='barangay_clearance',
+        preferred_date=preferred_date,
+        preferred_time=preferred_time,
+        purpose='employment',
+        status=status,
+    )
+
+
+def booked(slot_date, session):
+    usage = SlotUsage.objects.filter(date=slot_date, session=session).first()
+    return usage.booked if usage else 0
+
+
+class SlotUsageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resident = make_user()
+        self.day = datetime.date.today() + datetime.timedelta(days=3)
+
+    def test_create_counts_session(self):
+        make_appointment(self.resident, self.day, datetime.time(9, 0))
+        make_appointment(self.resident, self.day, datetime.time(13, 30))
+        make_appointment(self.resident, self.day, datetime.time(10, 0), status='cancelled')
+
+        self.assertEqual(booked(self.day, 'am'), 1)
+        self.assertEqual(booked(self.day, 'pm'), 1)
+
+    def test_cancel_and_reschedule_move_counts(self):
+        appointment = make_appointment(self.resident, self.day)
+        appointment = Appointment.objects.get(pk=appointment.pk)
+
+        new_day = self.day + datetime.timedelta(days=1)
+        appointment.preferred_date = new_day
+        appointment.preferred_time = datetime.time(14, 0)
+        appointment.save()
+        self.assertEqual(booked(self.day, 'am'), 0)
+        self.assertEqual(booked(new_day, 'pm'), 1)
+
+        appointment.status = 'cancelled'
+        appointment.save()
+        self.assertEqual(booked(new_day, 'pm'), 0)
+
+    def test_staff_reschedule_respects_capacity(self):
+        CapacityRule.objects.create(capacity=1)
+        new_day = self.day + datetime.timedelta(days=1)
+        make_appointment(make_user('other@example.com'), new_day, datetime.time(14, 0))
+        appointment = make_appointment(self.resident, self.day)
+        self.client.force_login(make_user('staff@example.com', role='staff'))
+
+        def reschedule(new_time):
+            return self.client.post(reverse('approved_appointments'), {
+                'appointment_id': appointment.pk, 'action': 'reschedule',
+                'new_date': new_day.isoformat(), 'new_time': new_time, 'reason': 'Staff unavailable',
+            }, follow=True)
+
+        self.assertContains(reschedule('14:00'), 'fully booked')
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.preferred_date, self.day)
+        self.assertEqual(booked(new_day, 'pm'), 1)
+
+        self.assertContains(reschedule('09:00'), 'rescheduled successfully')
+        self.assertEqual(booked(self.day, 'am'), 0)
+        self.assertEqual(booked(new_day, 'am'), 1)
+
+    def test_deferred_load_and_delete(self):
+        appointment = make_appointment(self.resident, self.day)
+        deferred = Appointment.objects.only('id', 'status').get(pk=appointment.pk)
+        deferred.status = 'completed'
+        deferred.save(update_fields=['status'])
+        self.assertEqual(booked(self.day, 'am'), 1)
+
+        self.resident.delete()
+        self.assertEqual(booked(self.day, 'am'), 0)
+
+    def test_rebuild_reconciles_bulk_changes(self):
+        make_appointment(self.resident, self.day)
+        make_appointment(self.resident, self.day, datetime.time(15, 0))
+        Appointment.objects.filter(preferred_time__gte=datetime.time(12, 0)).update(status='cancelled')
+        SlotUsage.objects.filter(date=self.day, session='am').update(booked=7)
+
+        call_command('rebuild_slot_usage', stdout=StringIO())
+
+        self.assertEqual(booked(self.day, 'am'), 1)
+        self.assertEqual(booked(self.day, 'pm'), 0)
+
+    def test_month_availability_reads_counters(self):
+        today = datetime.date.today()
+        make_appointment(self.resident, today, datetime.time(8, 0))
+        self.client.force_login(self.resident)
+
+        # Session, user, capacity rules (cold cache) and the counters
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('api_month_availability'))
+
+        days = {row['date']: row for row in response.json()}
+        self.assertEqual(days[str(today)]['am'], 19)
+        self.assertEqual(days[str(today)]['pm'], 20)
+
+
+class ExpirySweepTests(TestCase):
+    def setUp(self):
+        self.resident = make_user()
+        self.today = datetime.date.today()
+
+    def test_sweep_cancels_only_open_past_appointments(self):
+        yesterday = self.today - datetime.timedelta(days=1)
+        pending = make_appointment(self.resident, yesterday, status='pending')
+        approved = make_appointment(self.resident, yesterday, datetime.time(13, 0))
+        claimed = make_appointment(self.resident, yesterday, status='claimed')
+        upcoming = make_appointment(self.resident, self.today)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(expire_past_appointments(self.today), 2)
+
+        appointment_writes = [q for q in queries if q['sql'].startswith('UPDATE "appointments_appointment"')]
+        self.assertEqual(len(appointment_writes), 1)
+
+        statuses = dict(Appointment.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[pending.id], 'cancelled')
+        self.assertEqual(statuses[approved.id], 'cancelled')
+        self.assertEqual(statuses[claimed.id], 'claimed')
+        self.assertEqual(statuses[upcoming.id], 'approved')
+        self.assertEqual(booked(yesterday, 'am'), 1)
+        self.assertEqual(booked(yesterday, 'pm'), 0)
+
+        events = AuditEvent.objects.filter(action=AuditEvent.APPOINTMENT_CANCELLED)
+        self.assertEqual({event.target_id for event in events}, {pending.id, approved.id})
+        self.assertTrue(all(event.actor_id is None and event.data == {'reason': EXPIRED_REASON} for event in events))
+
+    def test_sweep_cancels_one_day_at_a_time(self):
+        last_week = self.today - datetime.timedelta(days=7)
+        yesterday = self.today - datetime.timedelta(days=1)
+        make_appointment(self.resident, last_week)
+        make_appointment(self.resident, last_week, datetime.time(14, 0), status='pending')
+        make_appointment(self.resident, yesterday)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(expire_past_appointments(self.today), 3)
+
+        appointment_writes = [q for q in queries if q['sql'].startswith('UPDATE "appointments_appointment"')]
+        self.assertEqual(len(appointment_writes), 2)
+        self.assertEqual((booked(last_week, 'am'), booked(last_week, 'pm'), booked(yesterday, 'am')), (0, 0, 0))
+
+    def test_sweep_refreshes_caches_and_streams(self):
+        cache.clear()
+        yesterday = self.today - datetime.timedelta(days=1)
+        make_appointment(self.resident, yesterday)
+        make_appointment(self.resident, yesterday, datetime.time(10, 0), status='pending')
+        self.assertEqual(get_booked_counts(yesterday, self.today), [(yesterday, 2, 0)])
+        self.assertEqual(get_admin_stats()['appointments']['cancelled'], 0)
+
+        with mock.patch.object(broker, 'dispatch') as dispatch, self.captureOnCommitCallbacks(execute=True):
+            expire_past_appointments(self.today)
+
+        self.assertEqual(get_booked_counts(yesterday, self.today), [(yesterday, 0, 0)])
+        self.assertEqual(get_admin_stats()['appointments']['cancelled'], 2)
+        events = [(call.args[0]['event'], call.args[0]['data']) for call in dispatch.call_args_list]
+        self.assertIn(('slots', {'date': yesterday, 'session': 'am', 'delta': -2}), events)
+
+    def test_staff_list_does_not_write(self):
+        staff = make_user('staff@example.com', role='staff')
+        make_appointment(self.resident, self.today - datetime.timedelta(days=2), status='pending')
+        self.client.force_login(staff)
+
+        self.client.get(reverse('pending_appointments'))
+
+        self.assertFalse(Appointment.objects.filter(status='cancelled').exists())
+
+
+class AppointmentsListApiTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', role='staff')
+        self.client.force_login(self.staff)
+        self.start = datetime.date(2030, 3, 1)
+        self.params = {'start': '2030-03-01', 'end': '2030-04-01'}
+
+    def make_resident_appointment(self, index, preferred_date):
+        user = make_user(f'resident{index}@example.com')
+        Resident.objects.create(
+            user=user, first_name='Juan', last_name=f'Cruz{index}', date_of_birth=datetime.date(1990, 1, 1),
+            address='Labangon, Cebu City', sex='M', civil_status='single', citizenship='Filipino',
+        )
+        return make_appointment(user, preferred_date)
+
+    def test_window_and_query_count(self):
+        for index in range(5):
+            self.make_resident_appointment(index, self.start + datetime.timedelta(days=index))
+        self.make_resident_appointment(9, datetime.date(2030, 4, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api_appointments_list'), self.params)
+        appointment_queries = [q for q in queries if 'appointments_appointment' in q['sql']]
+
+        self.assertEqual(len(appointment_queries), 1)
+        data = response.json()
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['resident_name'], 'Juan Cruz0')
+        self.assertEqual(data[0]['certificate'], 'Barangay Clearance')
+        self.assertEqual(data[0]['start'], '2030-03-01T09:00:00')
+
+    def test_unchanged_window_returns_not_modified(self):
+        self.make_resident_appointment(1, self.start)
+        url = reverse('api_appointments_list')
+        etag = self.client.get(url, self.params)['ETag']
+
+        response = self.client.get(url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.make_resident_appointment(2, self.start)
+        response = self.client.get(url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_range(self):
+        response = self.client.get(reverse('api_appointments_list'), {'start': 'soon', 'end': 'later'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilityApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resident = make_user()
+        self.client.force_login(self.resident)
+        self.params = {'start': '2030-03-01', 'end': '2030-04-01'}
+
+    def test_month_in_one_query_and_cached(self):
+        make_appointment(self.resident, datetime.date(2030, 3, 4), datetime.time(8, 0))
+        make_appointment(self.resident, datetime.date(2030, 3, 4), datetime.time(13, 0))
+        make_appointment(self.resident, datetime.date(2030, 4, 1), datetime.time(13, 0))
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('api_availability'), self.params).json()
+        self.assertEqual(len([q for q in queries if 'appointments_slotusage' in q['sql']]), 1)
+        self.assertEqual(len(data), 31)
+        self.assertEqual(data[3], {'date': '2030-03-04', 'am': 19, 'pm': 19})
+        self.assertEqual(data[-1]['pm'], 20)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api_availability'), self.params)
+        self.assertFalse([q for q in queries if 'appointments_slotusage' in q['sql']])
+
+    def test_booking_invalidates_cached_ranges(self):
+        self.client.get(reverse('api_availability'), self.params)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_appointment(self.resident, datetime.date(2030, 3, 4), datetime.time(8, 0))
+        data = self.client.get(reverse('api_availability'), self.params).json()
+        self.assertEqual(data[3]['am'], 19)
+
+    def test_invalid_ranges(self):
+        for params in ({'start': 'soon', 'end': 'later'}, {'start': '2030-03-01', 'end': '2030-03-01'},
+                       {'start': '2030-01-01', 'end': '2031-01-01'}):
+            with self.subTest(params):
+                self.assertEqual(self.client.get(reverse('api_availability'), params).status_code, 400)
+
+
+class NearestSlotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resident = make_user()
+        self.client.force_login(self.resident)
+        self.day = datetime.date(2030, 3, 4)
+        SlotUsage.objects.create(date=self.day, session='am', booked=20)
+
+    def test_full_session_is_skipped(self):
+        slot = find_nearest_available_slot(self.day, '09:00')
+        self.assertEqual((slot['date'], slot['time'], slot['session']), (self.day, datetime.time(12, 0), 'pm'))
+
+        SlotUsage.objects.create(date=self.day, session='pm', booked=20)
+        cache.clear()
+        slot = find_nearest_available_slot(self.day, '09:00')
+        self.assertEqual((slot['date'], slot['time']), (self.day + datetime.timedelta(days=1), datetime.time(8, 0)))
+
+    def test_alternatives_from_one_range_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('api_nearest_slots'), {'date': '2030-03-04', 'time': '10:00', 'limit': 3}).json()
+        self.assertEqual(len([q for q in queries if 'appointments_slotusage' in q['sql']]), 1)
+        self.assertEqual(data['slots'], [
+            {'date': '2030-03-04', 'time': '12:00', 'session': 'pm', 'available': 20},
+            {'date': '2030-03-05', 'time': '08:00', 'session': 'am', 'available': 20},
+            {'date': '2030-03-05', 'time': '12:00', 'session': 'pm', 'available': 20},
+        ])
+
+    def test_invalid_parameters(self):
+        for params in ({}, {'date': 'soon'}, {'date': '2030-03-04', 'time': 'noon'}, {'date': '2030-03-04', 'limit': 'x'}):
+            with self.subTest(params):
+                self.assertEqual(self.client.get(reverse('api_nearest_slots'), params).status_code, 400)
+
+
+class CapacityRuleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monday = datetime.date(2030, 3, 4)
+
+    def tearDown(self):
+        # The rules roll back with the test, the compiled table does not
+        cache.clear()
+
+    def test_most_specific_rule_wins(self):
+        CapacityRule.objects.create(capacity=15)
+        CapacityRule.objects.create(weekday=0, session='pm', capacity=10)
+        CapacityRule.objects.create(weekday=0, session='pm', certificate_type='barangay_clearance', capacity=4)
+        CapacityRule.objects.create(date=self.monday + datetime.timedelta(days=7), capacity=0, note='Holiday')
+
+        self.assertEqual(capacity_for(self.monday, 'am'), 15)
+        self.assertEqual(capacity_for(self.monday, 'pm'), 10)
+        self.assertEqual(capacity_for(self.monday, 'pm', 'barangay_clearance'), 4)
+        self.assertEqual(capacity_for(self.monday + datetime.timedelta(days=1), 'pm'), 15)
+        self.assertEqual(capacity_for(self.monday + datetime.timedelta(days=7), 'am'), 0)
+        self.assertEqual(capacity_for(self.monday + datetime.timedelta(days=7), 'pm', 'barangay_clearance'), 0)
+
+    def test_compiled_once_and_recompiled_on_change(self):
+        with self.assertNumQueries(1):
+            get_capacity_table()
+            self.assertEqual(capacity_for(self.monday, 'am'), 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            CapacityRule.objects.create(date=self.monday, capacity=0)
+        self.assertEqual(capacity_for(self.monday, 'am'), 0)
+
+    def test_other_processes_recompile_after_the_version_expires(self):
+        get_capacity_table()
+        # A change saved by another worker, whose version bump this process's cache never sees
+        CapacityRule.objects.create(capacity=7)
+        self.assertEqual(capacity_for(self.monday, 'am'), 20)
+
+        later = time.time() + CAPACITY_VERSION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(capacity_for(self.monday, 'am'), 7)
+
+    def test_closed_day_in_availability_and_booking(self):
+        resident = make_user()
+        self.client.force_login(resident)
+        CapacityRule.objects.create(date=self.monday, session='am', capacity=0)
+
+        data = self.client.get(reverse('api_availability'), {'start': '2030-03-04', 'end': '2030-03-05'}).json()
+        self.assertEqual(data, [{'date': '2030-03-04', 'am': 0, 'pm': 20}])
+
+        response = self.client.post(reverse('certification'), {
+            'certificate_type': 'barangay_clearance',
+            'preferred_date': '2030-03-04',
+            'preferred_time': '08:00',
+            'purpose': 'employment',
+        })
+        self.assertContains(response, 'is closed')
+        self.assertFalse(Appointment.objects.exists())
+
+
+class LiveEventTests(TestCase):
+    def setUp(self):
+        self.resident = make_user()
+        self.day = datetime.date(2030, 3, 4)
+
+    def published(self, action):
+        with mock.patch.object(broker, 'dispatch') as dispatch, self.captureOnCommitCallbacks(execute=True):
+            action()
+        return [(call.args[0]['event'], call.args[0]['data']) for call in dispatch.call_args_list]
+
+    def test_booking_and_reschedule_publish_slot_deltas(self):
+        appointment = Appointment(
+            resident=self.resident, certificate_type='barangay_clearance', purpose='employment',
+            preferred_date=self.day, preferred_time=datetime.time(9, 0), status='pending',
+        )
+        events = self.published(lambda: appointment.book(20))
+        self.assertIn(('slots', {'date': self.day, 'session': 'am', 'delta': 1}), events)
+        self.assertIn(('appointment', {'id': appointment.id, 'date': self.day, 'previous_date': None, 'status': 'pending'}), events)
+
+        appointment.preferred_time = datetime.time(13, 0)
+        events = self.published(appointment.save)
+        self.assertIn(('slots', {'date': self.day, 'session': 'am', 'delta': -1}), events)
+        self.assertIn(('slots', {'date': self.day, 'session': 'pm', 'delta': 1}), events)
+
+        appointment.status = 'approved'
+        events = self.published(appointment.save)
+        self.assertEqual([event for event, _ in events], ['appointment'])
+
+    async def test_stream_only_carries_subscribed_channels(self):
+        stream = event_stream(['availability'], heartbeat=0.05)
+        self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+        self.assertEqual(await anext(stream), ': ping\n\n')
+
+        broker.dispatch({'channel': 'staff', 'event': 'appointment', 'data': {'id': 1}})
+        broker.dispatch({'channel': 'availability', 'event': 'slots', 'data': {'date': '2030-03-04', 'session': 'am', 'delta': 1}})
+        self.assertEqual(
+            await anext(stream),
+            'event: slots\ndata: {"date":"2030-03-04","session":"am","delta":1}\n\n',
+        )
+        await stream.aclose()
+        self.assertFalse(broker.subscriptions)
+
+    def test_stream_needs_asgi(self):
+        self.client.force_login(self.resident)
+        self.assertEqual(self.client.get(reverse('api_events')).status_code, 204)
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        today = datetime.date.today()
+        for index in range(20):
+            resident = make_user(f'resident{index}@example.com')
+            make_appointment(resident, today + datetime.timedelta(days=index % 7), status=['pending', 'approved', 'completed', 'cancelled'][index % 4])
+
+    def test_hot_queries_use_indexes(self):
+        self.assertEqual(find_sequential_scans(), {})
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_sequential_scan_is_reported(self):
+        unindexed = {'by_purpose': Appointment.objects.filter(purpose='travel')}
+        with mock.patch('appointments.query_plans.hot_queries', return_value=unindexed):
+            regressions = find_sequential_scans()
+            self.assertEqual(regressions['by_purpose'][0], ['appointments_appointment'])
+            with self.assertRaises(CommandError):
+                call_command('check_query_plans', stdout=StringIO())
+
+
+class LoadBenchmarkTests(TestCase):
+    def test_summary_percentiles(self):
+        stats = summarise([index / 1000 for index in range(1, 101)], errors=2, elapsed=2)
+        self.assertEqual(stats['requests'], 102)
+        self.assertEqual(stats['throughput_rps'], 51)
+        self.assertEqual((stats['p50_ms'], stats['p95_ms'], stats['p99_ms']), (50, 95, 99))
+
+    def test_regressions_are_flagged(self):
+        baseline = {'scenarios': {'staff_dashboard': {'p95_ms': 100, 'queries_per_request': 4}}}
+        faster = {'scenarios': {'staff_dashboard': {'p95_ms': 110, 'queries_per_request': 4}}}
+        slower = {'scenarios': {'staff_dashboard': {'p95_ms': 150, 'queries_per_request': 9}}}
+
+        self.assertEqual(find_regressions(baseline, faster, threshold=0.2), [])
+        self.assertEqual(len(find_regressions(baseline, slower, threshold=0.2)), 2)
+
+    def test_measuring_the_booking_scenario_leaves_no_booking(self):
+        day = datetime.date.today() + datetime.timedelta(days=7)
+        while day.weekday() >= 5:
+            day += datetime.timedelta(days=1)
+        command = BenchmarkCommand()
+        command.scenarios, command.seed, command.today, command.host = ['certification'], 1, day, 'testserver'
+        command.users = {'resident': [make_user()]}
+        booking = (reverse('certification'), {
+            'certificate_type': 'barangay_clearance',
+            'preferred_date': day.isoformat(),
+            'preferred_time': '09:00',
+            'purpose': 'employment',
+        })
+
+        with mock.patch('appointments.management.commands.run_load_benchmark.build_request', return_value=booking):
+            counts = command.measure_queries()
+
+        self.assertGreater(counts['certification'], 0)
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(SlotUsage.objects.filter(booked__gt=0).exists())
+
+
+class QueryBudgetMixin:
+    """Pin the number of queries a page issues, whatever the amount of data behind it."""
+
+    def assertQueryBudget(self, url, budget, add_rows, rounds=2):
+        counts = []
+        for _ in range(rounds):
+            add_rows()
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f'{url} issues more queries as data grows: {counts}')
+        self.assertLessEqual(counts[0], budget, f'{url} issues {counts[0]} queries, budget is {budget}')
+
+
+class AppointmentQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.day = datetime.date.today() + datetime.timedelta(days=3)
+        self.staff = make_user('staff@example.com', role='staff')
+        self.added = 0
+
+    def add_appointments(self, count=5):
+        for _ in range(count):
+            self.added += 1
+            resident = make_user(f'resident{self.added}@example.com')
+            Resident.objects.create(
+                user=resident, first_name='Juan', last_name='Cruz', date_of_birth=datetime.date(1990, 1, 1),
+                address='Labangon, Cebu City', sex='M', civil_status='single', citizenship='Filipino',
+            )
+            for status in ('pending', 'approved', 'claimed', 'completed', 'cancelled'):
+                make_appointment(resident, self.day, status=status)
+
+    def test_staff_pages(self):
+        self.client.force_login(self.staff)
+        budgets = {
+            'approved_appointments': 5,
+            'pending_appointments': 4,
+            'cancelled_appointments': 3,
+            'completed_appointments': 3,
+            'appointments_calendar': 2,
+            'api_appointments_list': 3,
+        }
+        for name, budget in budgets.items():
+            with self.subTest(name):
+                self.assertQueryBudget(reverse(name), budget, self.add_appointments)
+
+    def test_resident_pages(self):
+        resident = make_user()
+        self.client.force_login(resident)
+
+        def add_own_appointments():
+            for status in ('pending', 'approved', 'claimed', 'completed', 'cancelled'):
+                make_appointment(resident, self.day, status=status)
+
+        budgets = {
+            reverse('appointments'): 5,
+            reverse('claimed_appointments'): 4,
+            reverse('api_month_availability'): 4,
+            reverse('api_availability'): 4,
+            f"{reverse('api_date_availability')}?date={self.day.isoformat()}": 4,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url):
+                self.assertQueryBudget(url, budget, add_own_appointments)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client.force_login(make_user('staff@example.com', role='staff'))
+        resident = make_user()
+        start = datetime.date(2024, 1, 1)
+        # Several rows share a date and time so the id tie-breaker matters
+        Appointment.objects.bulk_create([
+            Appointment(
+                resident=resident, certificate_type='barangay_clearance', purpose='employment', status='cancelled',
+                preferred_date=start + datetime.timedelta(days=index // 4), preferred_time=datetime.time(9 + index % 2, 0),
+            )
+            for index in range(120)
+        ])
+        self.expected = list(
+            Appointment.objects.order_by('-preferred_date', '-preferred_time', '-id').values_list('id', flat=True)
+        )
+
+    def test_pages_cover_every_row_once(self):
+        url = reverse('cancelled_appointments')
+        seen = []
+        query_counts = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            query_counts.append(len(queries))
+            seen.extend(appointment.id for appointment in response.context['appointments'])
+            page = response.context['page']
+            url = reverse('cancelled_appointments') + page.next_url if page.has_next else None
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(query_counts), 3)
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_fragment_response(self):
+        first = self.client.get(reverse('cancelled_appointments'))
+        next_url = reverse('cancelled_appointments') + first.context['page'].next_url
+
+        response = self.client.get(next_url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertNotContains(response, '<html')
+        self.assertEqual(response.content.decode().count('<tr>'), 50)
+        self.assertTrue(response['X-Next-Page'].startswith('?cursor='))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('cancelled_appointments'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Parallel booking requests against one session must never exceed its capacity."""
+    capacity = 5
+    workers = 100
+    attempts = 50
+
+    def setUp(self):
+        self.day = timezone.localdate() + datetime.timedelta(days=5)
+        self.residents = [make_user(f'resident{i}@example.com') for i in range(3)]
+
+    def post_booking(self, client, barrier, results):
+        try:
+            barrier.wait(timeout=30)
+            for _ in range(self.attempts):
+                try:
+                    response = client.post(reverse('certification'), {
+                        'certificate_type': 'barangay_clearance',
+                        'preferred_date': self.day.isoformat(),
+                        'preferred_time': '09:00',
+                        'purpose': 'employment',
+                    })
+                except OperationalError:
+                    # A lock or serialization failure is not an overbooking, so try again;
+                    # any other database error fails the test
+                    connection.close()
+                    time.sleep(random.uniform(0.01, 0.05))
+                    continue
+                results.append(response.status_code)
+                return
+            results.append('refused')
+        finally:
+            connection.close()
+
+    @skipUnless(connection.vendor == 'postgresql', 'SQLite serialises every writer, so it cannot race bookings')
+    def test_parallel_bookings_never_overbook(self):
+        clients = []
+        for i in range(self.workers):
+            client = Client()
+            client.force_login(make_user(f'crowd{i}@example.com'))
+            clients.append(client)
+
+        CapacityRule.objects.create(session='am', capacity=self.capacity)
+        barrier = threading.Barrier(self.workers)
+        results = []
+        threads = [
+            threading.Thread(target=self.post_booking, args=(client, barrier, results))
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.workers)
+        self.assertNotIn('refused', results)
+        self.assertEqual(Appointment.objects.filter(preferred_date=self.day).exclude(status='cancelled').count(), self.capacity)
+        self.assertEqual(booked(self.day, 'am'), self.capacity)
+
+    def test_reserve_refuses_past_capacity(self):
+        key = (self.day, 'am')
+
+        self.assertEqual([SlotUsage.reserve(key, 2) for _ in range(4)], [True, True, False, False])
+        self.assertEqual(booked(self.day, 'am'), 2)
+        self.assertFalse(SlotUsage.reserve((self.day, 'pm'), 0))
+        self.assertEqual(booked(self.day, 'pm'), 0)
+
+    def test_full_session_rejects_booking(self):
+        for resident in self.residents[:2]:
+            make_appointment(resident, self.day)
+        self.client.force_login(self.residents[2])
+
+        CapacityRule.objects.create(session='am', capacity=2)
+        response = self.client.post(reverse('certification'), {
+            'certificate_type': 'barangay_clearance',
+            'preferred_date': self.day.isoformat(),
+            'preferred_time': '10:30',
+            'purpose': 'employment',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'fully booked')
+        self.assertEqual(Appointment.objects.filter(preferred_date=self.day).count(), 2)
+        self.assertEqual(booked(self.day, 'am'), 2)
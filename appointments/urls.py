@@ -21,6 +21,9 @@ urlpatterns = [
     views.api_month_availability,
     name="api_month_availability"
 ),
+    path("api/availability/", views.api_availability, name="api_availability"),
+    path("api/nearest-slots/", views.api_nearest_slots, name="api_nearest_slots"),
+    path("api/events/", views.api_events, name="api_events"),
     path(
     "api/date-availability/",
     views.api_date_availability,
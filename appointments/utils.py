@@ -0,0 +1,372 @@
+import datetime
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from accounts.audit import record_events
+from accounts.models import AuditEvent
+from accounts.stats import invalidate_admin_stats
+from boacms_project.events import publish
+
+from .models import Appointment, DirtyRollupDate, SlotUsage
+
+
+@contextmanager
+def advisory_lock(name):
+    """
+    Hold a cluster-wide lock for the duration of a transaction.
+
+    On PostgreSQL this is a transaction-scoped advisory lock, so every
+    worker and node sharing the database agrees on a single holder and the
+    lock is released automatically on commit, rollback or a dropped
+    connection. Other backends (SQLite in development) only run a single
+    node, so the lock is always granted.
+
+    Yields:
+        bool: True if this caller holds the lock, False if another one does
+    """
+    with transaction.atomic():
+        if connection.vendor != 'postgresql':
+            yield True
+            return
+
+        key = zlib.crc32(name.encode())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [key])
+            acquired = cursor.fetchone()[0]
+        yield acquired
+
+
+# Reason stored on the audit events of appointments the sweep cancels
+EXPIRED_REASON = 'Appointment date has passed'
+
+
+def expire_past_appointments(today=None):
+    """
+    Cancel every pending or approved appointment whose date has passed.
+
+    The sweep works one expired date at a time, so memory use is bounded by
+    a single day's bookings however large the backlog is. Each day's expired
+    rows are locked, so a cancellation running at the same time cannot
+    release a slot the sweep releases too, their SlotUsage counters are
+    released with one grouped aggregate per day and the rows are cancelled
+    with one set-based UPDATE, all in the same transaction as a system
+    audit event for each cancelled appointment. The UPDATEs send
+    no signals, so the caches, report rollups and live streams that the
+    Appointment signals keep current are updated here.
+
+    Args:
+        today: The first date that is not yet expired (defaults to the local date)
+
+    Returns:
+        int | None: Number of appointments cancelled, or None if another
+        worker is already sweeping
+    """
+    today = today or timezone.localdate()
+
+    with advisory_lock('appointments.expire_past_appointments') as acquired:
+        if not acquired:
+            return None
+
+        expired = Appointment.objects.filter(
+            preferred_date__lt=today,
+            status__in=Appointment.EXPIRABLE_STATUSES,
+        )
+        dates = list(expired.order_by('preferred_date').values_list('preferred_date', flat=True).distinct())
+        count = 0
+        released = {}
+        resident_ids = set()
+        for slot_date in dates:
+            day = expired.filter(preferred_date=slot_date)
+            locked = list(day.select_for_update().values_list('id', 'resident_id'))
+            resident_ids.update(resident_id for _, resident_id in locked)
+            released.update(SlotUsage.release_many(day))
+            count += day.update(status='cancelled')
+            record_events(
+                None, AuditEvent.APPOINTMENT_CANCELLED, [appointment_id for appointment_id, _ in locked],
+                reason=EXPIRED_REASON,
+            )
+
+        DirtyRollupDate.mark(*dates)
+        for (slot_date, session), total in released.items():
+            publish('availability', 'slots', {'date': slot_date, 'session': session, 'delta': -total})
+        for slot_date in dates:
+            publish('staff', 'appointment', {'id': None, 'date': slot_date, 'previous_date': None, 'status': 'cancelled'})
+
+        def invalidate():
+            invalidate_resident_summary(*resident_ids)
+            invalidate_day_summary(*dates)
+            invalidate_availability()
+            invalidate_admin_stats()
+
+        if dates:
+            transaction.on_commit(invalidate)
+        return count
+
+
+RESIDENT_SUMMARY_TIMEOUT = 5 * 60
+
+
+def _resident_summary_key(resident_id, today):
+    return f"appointments:resident_summary:{resident_id}:{today.isoformat()}"
+
+
+def get_resident_summary(resident_id):
+    """
+    Return the appointment statistics shown on a resident's dashboard.
+
+    All counters come from one conditional-aggregation query. The summary is
+    cached per resident and day, and dropped by the Appointment signals
+    whenever one of the resident's appointments changes.
+
+    Args:
+        resident_id: The CustomUser id of the resident
+
+    Returns:
+        dict: Status counters, ``upcoming_appointments`` (next 7 days),
+        ``next_appointment`` and ``completed_list`` (last 3 completed)
+    """
+    today = timezone.localdate()
+    key = _resident_summary_key(resident_id, today)
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    appointments = Appointment.objects.filter(resident_id=resident_id)
+    week_from_now = today + timedelta(days=7)
+    summary = appointments.aggregate(
+        total_appointments=Count('id'),
+        pending_appointments=Count('id', filter=Q(status='pending')),
+        approved_appointments=Count('id', filter=Q(status='approved')),
+        cancelled_appointments=Count('id', filter=Q(status='cancelled')),
+        completed_appointments=Count('id', filter=Q(status='completed')),
+        claimed_appointments=Count('id', filter=Q(status='claimed')),
+        upcoming_appointments=Count('id', filter=Q(preferred_date__gte=today, preferred_date__lte=week_from_now)),
+    )
+    summary['next_appointment'] = appointments.filter(
+        preferred_date__gte=today,
+        status__in=['pending', 'approved']
+    ).order_by('preferred_date', 'preferred_time').first()
+    summary['completed_list'] = list(
+        appointments.filter(status='completed').order_by('-preferred_date')[:3]
+    )
+
+    cache.set(key, summary, RESIDENT_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_resident_summary(*resident_ids):
+    today = timezone.localdate()
+    cache.delete_many([_resident_summary_key(resident_id, today) for resident_id in resident_ids])
+
+
+DAY_SUMMARY_TIMEOUT = 10 * 60
+
+
+def _day_summary_key(selected_date, is_past_date):
+    view = 'past' if is_past_date else 'open'
+    return f"appointments:day_summary:{selected_date.isoformat()}:{view}"
+
+
+def _build_day_summaries(first_date, last_date, today):
+    """Build the day summaries of every date in an inclusive range from a single query."""
+    appointments = Appointment.objects.filter(
+        preferred_date__range=(first_date, last_date),
+        status__in=['approved', 'claimed', 'completed'],
+    ).select_related('resident__resident').order_by('preferred_time')
+
+    days = {}
+    for offset in range((last_date - first_date).days + 1):
+        day = first_date + timedelta(days=offset)
+        days[day] = {'am_appointments': [], 'pm_appointments': [], 'completed_count': 0}
+    for appointment in appointments:
+        day = days[appointment.preferred_date]
+        if appointment.status == 'completed':
+            day['completed_count'] += 1
+        # Past dates show completed appointments; today and future dates show approved and claimed ones
+        shown_statuses = ['completed'] if appointment.preferred_date < today else ['approved', 'claimed']
+        if appointment.status not in shown_statuses:
+            continue
+        if appointment.preferred_time < datetime.time(12, 0):
+            day['am_appointments'].append(appointment)
+        else:
+            day['pm_appointments'].append(appointment)
+
+    for day in days.values():
+        day['am_appointments_count'] = len(day['am_appointments'])
+        day['pm_appointments_count'] = len(day['pm_appointments'])
+        day['total_appointments_today'] = day['am_appointments_count'] + day['pm_appointments_count']
+    return days
+
+
+def get_day_summary(selected_date):
+    """
+    Return the staff dashboard view of one day's appointments.
+
+    The AM/PM lists, their counts and the completed count are cached per
+    date until an appointment on that date changes. On a miss the previous
+    and next days are read in the same query and cached too, so stepping to
+    a neighbouring day is served from the cache of the worker that just
+    answered.
+
+    Args:
+        selected_date: The date shown on the staff dashboard
+
+    Returns:
+        dict: ``am_appointments``, ``pm_appointments``, their counts,
+        ``total_appointments_today`` and ``completed_count``
+    """
+    today = timezone.localdate()
+    key = _day_summary_key(selected_date, selected_date < today)
+    summary = cache.get(key)
+    if summary is None:
+        days = _build_day_summaries(selected_date - timedelta(days=1), selected_date + timedelta(days=1), today)
+        summary = days.pop(selected_date)
+        cache.set(key, summary, DAY_SUMMARY_TIMEOUT)
+        # add() keeps a neighbour that is already cached, which may be fresher than this read
+        for day, neighbour in days.items():
+            cache.add(_day_summary_key(day, day < today), neighbour, DAY_SUMMARY_TIMEOUT)
+
+    return summary
+
+
+def invalidate_day_summary(*dates):
+    keys = []
+    for selected_date in dates:
+        keys.append(_day_summary_key(selected_date, True))
+        keys.append(_day_summary_key(selected_date, False))
+    cache.delete_many(keys)
+
+
+AVAILABILITY_TIMEOUT = 30
+AVAILABILITY_VERSION_KEY = 'appointments:availability_version'
+
+
+def _availability_version():
+    version = cache.get(AVAILABILITY_VERSION_KEY)
+    if version is None:
+        cache.add(AVAILABILITY_VERSION_KEY, 1, None)
+        version = cache.get(AVAILABILITY_VERSION_KEY, 1)
+    return version
+
+
+def get_booked_counts(start, end):
+    """
+    Return the booked AM/PM counts for every day in a range.
+
+    The counts come from one read of the SlotUsage rows in the range and are
+    cached per range for a short time. Any booking change bumps a version
+    number that is part of the key, so every cached range goes stale at once
+    without having to know which ranges were cached.
+
+    Args:
+        start: First day of the range
+        end: Day after the last day (exclusive)
+
+    Returns:
+        list: ``(date, am_booked, pm_booked)`` for each day, in date order
+    """
+    key = f"appointments:availability:{_availability_version()}:{start.isoformat()}:{end.isoformat()}"
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    booked = {}
+    usage = SlotUsage.objects.filter(date__gte=start, date__lt=end).values_list('date', 'session', 'booked')
+    for slot_date, session, count in usage:
+        booked.setdefault(slot_date, {'am': 0, 'pm': 0})[session] = count
+
+    counts = []
+    day = start
+    while day < end:
+        day_counts = booked.get(day, {'am': 0, 'pm': 0})
+        counts.append((day, day_counts['am'], day_counts['pm']))
+        day += timedelta(days=1)
+
+    cache.set(key, counts, AVAILABILITY_TIMEOUT)
+    return counts
+
+
+def invalidate_availability():
+    try:
+        cache.incr(AVAILABILITY_VERSION_KEY)
+    except ValueError:
+        # No version stored yet, so nothing is cached under the old one
+        pass
+
+
+def _slot_masks(slot_times):
+    """Bit masks of the AM and PM steps in ``slot_times`` (bit i is slot_times[i])."""
+    am_mask = pm_mask = 0
+    for index, slot_time in enumerate(slot_times):
+        if SlotUsage.session_for(slot_time) == 'am':
+            am_mask |= 1 << index
+        else:
+            pm_mask |= 1 << index
+    return {'am': am_mask, 'pm': pm_mask}
+
+
+def find_free_slots(preferred_date, preferred_time, slot_times, capacity, limit=1, max_days=14, buffer_minutes=30):
+    """
+    Find the nearest bookable slots at or after a preferred date and time.
+
+    Availability for the whole window comes from one range read (see
+    get_booked_counts) and is turned into a bitmap of free steps per day, so
+    the search costs O(days) however many steps a day has. Each result is the
+    earliest free step of a different session, which makes the results real
+    alternatives rather than neighbouring times in the same session.
+
+    Args:
+        preferred_date: Day to start searching from
+        preferred_time: Earliest time wanted on ``preferred_date``
+        slot_times: The bookable times of a day, in order
+        capacity: Callable taking a date and session ('am'/'pm') and returning
+            the number of bookings that session takes
+        limit: Number of slots to return
+        max_days: How many days after ``preferred_date`` to search
+        buffer_minutes: Minimum lead time before a slot today
+
+    Returns:
+        list: ``{'date', 'time', 'session', 'available'}`` dicts, nearest first
+    """
+    masks = _slot_masks(slot_times)
+
+    earliest = timezone.localtime() + timedelta(minutes=buffer_minutes)
+    start = max(preferred_date, timezone.localdate())
+
+    slots = []
+    for day, am_booked, pm_booked in get_booked_counts(start, start + timedelta(days=max_days + 1)):
+        remaining = {'am': capacity(day, 'am') - am_booked, 'pm': capacity(day, 'pm') - pm_booked}
+        free = 0
+        for session, mask in masks.items():
+            if remaining[session] > 0:
+                free |= mask
+
+        # Drop the steps before the preferred time, and those too soon to reach today
+        floor = preferred_time if day == preferred_date else datetime.time.min
+        if day < earliest.date():
+            free = 0
+        elif day == earliest.date():
+            floor = max(floor, earliest.time())
+        if free and floor > datetime.time.min:
+            free &= ~sum(1 << index for index, slot_time in enumerate(slot_times) if slot_time < floor)
+
+        for session in ('am', 'pm'):
+            session_free = free & masks[session]
+            if not session_free:
+                continue
+            index = (session_free & -session_free).bit_length() - 1
+            slots.append({
+                'date': day,
+                'time': slot_times[index],
+                'session': session,
+                'available': remaining[session],
+            })
+            if len(slots) >= limit:
+                return slots
+    return slots
@@ -2,49 +2,39 @@ from datetime import datetime, date, time as datetime_time, timedelta
 from django.utils import timezone
 import datetime as dt
 
-from django.http import JsonResponse
+import hashlib
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.urls import reverse
 from django.views.generic import TemplateView
+from .capacity import OFFICE_HOURS, SLOT_TIMES, TIME_CHOICES, capacity_for, get_capacity_table, within_office_hours
 from .forms import AppointmentForm, CancellationReasonForm, RescheduleForm
-from .models import Appointment
+from .models import Appointment, SlotUsage
+from .utils import find_free_slots, get_booked_counts
+from accounts.audit import record_event
+from accounts.models import AuditEvent
+from boacms_project.events import event_stream
+from boacms_project.pagination import is_fragment_request, paginate_keyset, render_fragment
+from django.conf import settings
 from django.contrib import messages
-from django.db import IntegrityError
-
-from collections import defaultdict
-
-TOTAL_AM_SLOTS = 20
-TOTAL_PM_SLOTS = 20
-
+from django.db import IntegrityError, transaction
 
 
-def find_nearest_available_slot(preferred_date, preferred_time, buffer_minutes=30, max_days=14):
-    """Return the nearest future slot (date, time) that is free."""
-    open_time = datetime_time(8, 0)
-    close_time = datetime_time(16, 30)  # Changed to 4:30 PM
-    step = timedelta(minutes=30)  # Changed from 15 to 30 minutes
-    
-    # Convert string time to time object if needed
+def find_nearest_available_slot(preferred_date, preferred_time, certificate_type='', buffer_minutes=30, max_days=14):
+    """Return the nearest future slot ({'date', 'time', 'session', 'available'}) whose session still has room, or None."""
     if isinstance(preferred_time, str):
-        hour, minute = map(int, preferred_time.split(':'))
-        preferred_time = datetime_time(hour, minute)
-
-    for day_offset in range(max_days + 1):
-        current_date = preferred_date + timedelta(days=day_offset)
-        if day_offset == 0:
-            candidate_dt = datetime.combine(current_date, preferred_time) + step
-        else:
-            candidate_dt = datetime.combine(current_date, open_time)
-
-        while candidate_dt.time() <= close_time:
-            # Return the slot without checking for conflicts
-            return {
-                'date': current_date,
-                'time': candidate_dt.time(),
-            }
-
-    return None
+        preferred_time = datetime_time.fromisoformat(preferred_time)
+    table = get_capacity_table()
+    slots = find_free_slots(
+        preferred_date, preferred_time, SLOT_TIMES,
+        lambda day, session: table.capacity(day, session, certificate_type),
+        max_days=max_days, buffer_minutes=buffer_minutes,
+    )
+    return slots[0] if slots else None
 
 
 @login_required
@@ -61,9 +51,28 @@ def create_appointment(request):
                 hour, minute = map(int, form.cleaned_data['preferred_time'].split(':'))
                 appointment.preferred_time = datetime_time(hour, minute)
             
-            appointment.save()
-            # Redirect to confirmation page instead of appointments list
-            return redirect('confirmation', appointment_id=appointment.id)
+            session = SlotUsage.session_for(appointment.preferred_time)
+            capacity = capacity_for(appointment.preferred_date, session, appointment.certificate_type)
+            with transaction.atomic():
+                booked = appointment.book(capacity)
+                if booked:
+                    record_event(request.user, AuditEvent.APPOINTMENT_BOOKED, appointment.id)
+            if booked:
+                # Redirect to confirmation page instead of appointments list
+                return redirect('confirmation', appointment_id=appointment.id)
+
+            if capacity:
+                message = f"The {session.upper()} session on {appointment.preferred_date:%B %d, %Y} is fully booked."
+            else:
+                message = f"The {session.upper()} session on {appointment.preferred_date:%B %d, %Y} is closed."
+            nearest = find_nearest_available_slot(
+                appointment.preferred_date, appointment.preferred_time, appointment.certificate_type
+            )
+            if nearest:
+                message += f" The nearest open slot is {nearest['date']:%B %d, %Y} at {nearest['time']:%I:%M %p}."
+            else:
+                message += " Please choose another session or date."
+            form.add_error(None, message)
     else:
         initial_data = {}
         for field in ['certificate_type', 'purpose', 'preferred_date', 'preferred_time']:
@@ -75,6 +84,7 @@ def create_appointment(request):
 
     context = {
         'form': form,
+        'session_capacity': settings.APPOINTMENT_SESSION_CAPACITY,
     }
 
     return render(request, 'appointments/certification.html', context)
@@ -111,8 +121,10 @@ def claimed_appointments(request):
         action = request.POST.get('action')
         appointment = get_object_or_404(Appointment, id=appointment_id)
         if action == 'claimed':
-            appointment.status = 'completed'
-            appointment.save()
+            with transaction.atomic():
+                appointment.status = 'completed'
+                appointment.save()
+                record_event(request.user, AuditEvent.APPOINTMENT_COMPLETED, appointment.id)
             messages.success(request, "Successfully confirmed claimed appointment.")
         else: 
             messages.info(request, "Appointment is already completed")
@@ -145,10 +157,7 @@ def approved_appointments(request):
         messages.error(request, "You are not authorized to view this page.")
         return redirect('appointments')
     
-    approved_appointments = Appointment.objects.filter(status__in=['approved', 'claimed'])
-
-    for appt in approved_appointments:
-        appt.refresh_if_expired()
+    approved_appointments = Appointment.objects.filter(status__in=['approved', 'claimed']).select_related('resident__resident')
 
     today = dt.date.today()
 
@@ -163,8 +172,10 @@ def approved_appointments(request):
 
         if action == 'claimed':
             if appointment.status == 'approved':
-                appointment.status = 'claimed'
-                appointment.save()
+                with transaction.atomic():
+                    appointment.status = 'claimed'
+                    appointment.save()
+                    record_event(request.user, AuditEvent.APPOINTMENT_CLAIMED, appointment.id)
                 messages.success(request, "Appointment marked as claimed.")
             else:
                 messages.info(request, "Appointment is already marked as claimed.")
@@ -183,26 +194,50 @@ def approved_appointments(request):
                 else:
                     new_time_obj = new_time
                 
+                capacity = capacity_for(new_date, SlotUsage.session_for(new_time_obj), appointment.certificate_type)
+                
                 # Validate the new date/time
                 if new_date <= timezone.now().date():
                     messages.error(request, "You cannot reschedule to today or a past date.")
-                elif not (datetime_time(9, 0) <= new_time_obj <= datetime_time(16, 30)):
-                    messages.error(request, "Appointments are only available between 9:00 AM and 4:30 PM.")
+                elif not within_office_hours(new_time_obj):
+                    messages.error(request, f"Appointments are only available between {OFFICE_HOURS}.")
+                elif not capacity:
+                    messages.error(request, "The office is closed for that session.")
                 else:
                     # Update the appointment with new date/time and reason
-                    appointment.preferred_date = new_date
-                    appointment.preferred_time = new_time_obj
-                    appointment.reschedule_reason = reason
-                    appointment.rescheduled_at = timezone.now()
-                    appointment.save()
-                    messages.success(request, "Appointment rescheduled successfully.")
+                    previous = f"{appointment.preferred_date} {appointment.preferred_time:%H:%M}"
+                    with transaction.atomic():
+                        appointment.reschedule_reason = reason
+                        appointment.rescheduled_at = timezone.now()
+                        # Claims the new session's slot the same way booking does, so it cannot be overbooked
+                        rescheduled = appointment.reschedule(new_date, new_time_obj, capacity)
+                        if rescheduled:
+                            record_event(
+                                request.user, AuditEvent.APPOINTMENT_RESCHEDULED, appointment.id,
+                                previous=previous, reason=reason,
+                            )
+                    if rescheduled:
+                        messages.success(request, "Appointment rescheduled successfully.")
+                    else:
+                        messages.error(request, "That session is fully booked. Please choose another date or time.")
             else:
                 messages.error(request, "Please correct the errors below.")
     
+    # Today's appointments are listed separately; the rest is paged
+    page = paginate_keyset(
+        request,
+        approved_appointments.exclude(preferred_date=today),
+        ['preferred_date', 'preferred_time', 'id'],
+    )
+    if is_fragment_request(request):
+        return render_fragment(request, "appointments/partials/approved_rows.html", {"appointments": page}, page)
+
     context = {
-        "appointments": approved_appointments,
+        "appointments": page,
+        "page": page,
         "appointments_today": approved_appointments_today,
         "today": today,
+        "time_choices": TIME_CHOICES,
     }
 
     return render(request, "appointments/approved_appointments.html", context)
@@ -213,10 +248,7 @@ def pending_appointments(request):
         messages.error(request, "You are not authorized to view this page.")
         return redirect('appointments')
     
-    pending_appointments = Appointment.objects.filter(status='pending')
-
-    for appt in pending_appointments:
-        appt.refresh_if_expired()
+    pending_appointments = Appointment.objects.filter(status='pending').select_related('resident__resident')
     
     pending_appointments = pending_appointments.order_by('preferred_date', 'preferred_time')
 
@@ -227,8 +259,10 @@ def pending_appointments(request):
 
         if action == "approve":
             if appointment.status == 'pending':
-                appointment.status = 'approved'
-                appointment.save()
+                with transaction.atomic():
+                    appointment.status = 'approved'
+                    appointment.save()
+                    record_event(request.user, AuditEvent.APPOINTMENT_APPROVED, appointment.id)
                 messages.success(request, "Appointment approved.")
             else:
                 messages.info(request, "Appointment is already approved.")
@@ -239,9 +273,11 @@ def pending_appointments(request):
                 reason_form = CancellationReasonForm(request.POST)
                 if reason_form.is_valid():
                     reason = reason_form.cleaned_data['reason']
-                    appointment.status = 'cancelled'
-                    appointment.cancellation_reason = reason
-                    appointment.save()
+                    with transaction.atomic():
+                        appointment.status = 'cancelled'
+                        appointment.cancellation_reason = reason
+                        appointment.save()
+                        record_event(request.user, AuditEvent.APPOINTMENT_CANCELLED, appointment.id, reason=reason)
                     messages.success(request, "Appointment cancelled successfully.")
                 else:
                     # If form is not valid, show error and redisplay the page
@@ -267,10 +303,14 @@ def cancelled_appointments(request):
         messages.error(request, "You are not authorized to view this page.")
         return redirect('appointments')
     
-    cancelled_appointments = Appointment.objects.filter(status='cancelled').order_by('-preferred_date', '-preferred_time')
-    
+    cancelled_appointments = Appointment.objects.filter(status='cancelled').select_related('resident__resident')
+    page = paginate_keyset(request, cancelled_appointments, ['-preferred_date', '-preferred_time', '-id'])
+    if is_fragment_request(request):
+        return render_fragment(request, "appointments/partials/cancelled_rows.html", {"appointments": page}, page)
+
     context = {
-        "appointments": cancelled_appointments,
+        "appointments": page,
+        "page": page,
     }
 
     return render(request, "appointments/cancelled_appointments.html", context)
@@ -281,10 +321,14 @@ def completed_appointments(request):
         messages.error(request, "You are not authorized to view this page.")
         return redirect('appointments')
     
-    completed_appointments = Appointment.objects.filter(status='completed').order_by('-preferred_date', '-preferred_time')
-    
+    completed_appointments = Appointment.objects.filter(status='completed').select_related('resident__resident')
+    page = paginate_keyset(request, completed_appointments, ['-preferred_date', '-preferred_time', '-id'])
+    if is_fragment_request(request):
+        return render_fragment(request, "appointments/partials/completed_rows.html", {"appointments": page}, page)
+
     context = {
-        "appointments": completed_appointments,
+        "appointments": page,
+        "page": page,
     }
 
     return render(request, "appointments/completed_appointments.html", context)
@@ -297,30 +341,68 @@ def cancel_appointment(request, appointment_id):
         appointment.status = 'cancelled'
         # Automatically set cancellation reason for resident cancellations
         appointment.cancellation_reason = 'Resident cancelled the appointment'
-        appointment.save()
+        with transaction.atomic():
+            appointment.save()
+            record_event(request.user, AuditEvent.APPOINTMENT_CANCELLED, appointment.id)
         # messages.success(request, 'Appointment has been cancelled successfully.')
         return redirect('appointments')
 
     context = {'appointment': appointment}
     return render(request, 'appointments/confirm_cancel.html', context)
 
+def parse_date_range(request):
+    """Read the calendar's visible ``start``/``end`` range (end exclusive), defaulting to the current month."""
+    start_str = request.GET.get('start')
+    end_str = request.GET.get('end')
+    if start_str and end_str:
+        # FullCalendar-style ISO datetimes are accepted; only the date part is used
+        start = datetime.strptime(start_str[:10], '%Y-%m-%d').date()
+        end = datetime.strptime(end_str[:10], '%Y-%m-%d').date()
+        return start, end
+
+    start = date.today().replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
 @login_required
 def api_appointments_list(request):
+    try:
+        start, end = parse_date_range(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+
     appointments = Appointment.objects.all() if request.user.role == 'staff' else Appointment.objects.filter(resident=request.user)
-        
+
+    # One joined query for the visible window; no model instances or per-row lookups
+    rows = appointments.filter(
+        preferred_date__gte=start,
+        preferred_date__lt=end,
+    ).order_by('preferred_date', 'preferred_time').values_list(
+        'id', 'certificate_type', 'preferred_date', 'preferred_time', 'status',
+        'resident__resident__first_name', 'resident__resident__last_name',
+    )
+
+    certificate_names = dict(Appointment.CERTIFICATE_TYPE_CHOICES)
     data = []
-    for appointment in appointments:
-        # Get resident name from the Resident model
-        resident_name = f"{appointment.resident.resident.first_name} {appointment.resident.resident.last_name}"
-        
+    for appointment_id, certificate_type, preferred_date, preferred_time, status, first_name, last_name in rows:
         data.append({
-            'title': f"{appointment.get_certificate_type_display()} ({resident_name})",
-            'start': f"{appointment.preferred_date}T{appointment.preferred_time}",
-            'status': appointment.status,
-            'url': reverse('appointment_detail', args=[appointment.id]),
-            'resident_name': resident_name,
+            'id': appointment_id,
+            'start': f"{preferred_date}T{preferred_time}",
+            'status': status,
+            'certificate': certificate_names.get(certificate_type, certificate_type),
+            'resident_name': f"{first_name or ''} {last_name or ''}".strip(),
         })
-    return JsonResponse(data, safe=False)
+
+    body = json.dumps(data, separators=(',', ':'))
+    etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Let the browser keep the payload but revalidate it with If-None-Match every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
 def appointments_calendar_view(request):
@@ -370,12 +452,6 @@ def appointment_detail(request, appointment_id):
 
 @login_required
 def api_month_availability(request):
-    booked = defaultdict(lambda: {"am": 0, "pm": 0})
-
-    for appt in Appointment.objects.all():
-        period = "am" if appt.preferred_time.hour < 12 else "pm"
-        booked[str(appt.preferred_date)]["am" if period=="am" else "pm"] += 1
-
     # Current month
     today = date.today()
     first_day = today.replace(day=1)
@@ -384,21 +460,113 @@ def api_month_availability(request):
     else:
         next_month = first_day.replace(month=first_day.month+1, day=1)
 
-    days_in_month = (next_month - first_day).days
-
+    table = get_capacity_table()
     response = []
-    for i in range(days_in_month):
-        d = first_day + timedelta(days=i)
-        counts = booked.get(str(d), {"am": 0, "pm": 0})
+    for d, am_booked, pm_booked in get_booked_counts(first_day, next_month):
         response.append({
             "date": str(d),
-            "am": max(TOTAL_AM_SLOTS - counts["am"], 0),
-            "pm": max(TOTAL_PM_SLOTS - counts["pm"], 0),
+            "am": max(table.capacity(d, 'am') - am_booked, 0),
+            "pm": max(table.capacity(d, 'pm') - pm_booked, 0),
         })
 
     return JsonResponse(response, safe=False)
 
 
+MAX_AVAILABILITY_DAYS = 93
+
+
+@login_required
+def api_availability(request):
+    """AM/PM availability for every day in a ``start``/``end`` range (end exclusive) in one response"""
+    try:
+        start, end = parse_date_range(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    if not 0 < (end - start).days <= MAX_AVAILABILITY_DAYS:
+        return JsonResponse({'error': f'The range must cover 1 to {MAX_AVAILABILITY_DAYS} days'}, status=400)
+
+    table = get_capacity_table()
+    data = [
+        {
+            'date': day.isoformat(),
+            'am': max(table.capacity(day, 'am') - am_booked, 0),
+            'pm': max(table.capacity(day, 'pm') - pm_booked, 0),
+        }
+        for day, am_booked, pm_booked in get_booked_counts(start, end)
+    ]
+
+    body = json.dumps(data, separators=(',', ':'))
+    etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# Event channels each role may follow; staff also see appointment status changes
+LIVE_CHANNELS = {
+    'resident': ['availability'],
+    'staff': ['availability', 'staff'],
+}
+
+
+@login_required
+async def api_events(request):
+    """Server-Sent Events stream of slot count changes (and, for staff, appointment status changes)"""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI an open stream would hold a worker for good; 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        event_stream(LIVE_CHANNELS.get(user.role, ['availability'])), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+MAX_NEAREST_SLOTS = 10
+MAX_NEAREST_DAYS = 60
+
+
+@login_required
+def api_nearest_slots(request):
+    """Nearest free slots at or after ``date``/``time``, one per session, for when the chosen session is full"""
+    try:
+        preferred_date = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+        preferred_time = datetime_time.fromisoformat(request.GET.get('time') or '00:00')
+        limit = min(max(int(request.GET.get('limit', 3)), 1), MAX_NEAREST_SLOTS)
+        max_days = min(max(int(request.GET.get('max_days', 14)), 0), MAX_NEAREST_DAYS)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+
+    certificate_type = request.GET.get('certificate_type', '')
+    if certificate_type and certificate_type not in dict(Appointment.CERTIFICATE_TYPE_CHOICES):
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+
+    table = get_capacity_table()
+    slots = find_free_slots(
+        preferred_date, preferred_time, SLOT_TIMES,
+        lambda day, session: table.capacity(day, session, certificate_type),
+        limit=limit, max_days=max_days,
+    )
+    return JsonResponse({
+        'slots': [
+            {
+                'date': slot['date'].isoformat(),
+                'time': slot['time'].strftime('%H:%M'),
+                'session': slot['session'],
+                'available': slot['available'],
+            }
+            for slot in slots
+        ],
+    })
+
+
 @login_required
 def api_date_availability(request):
     """Get slot availability for a specific date"""
@@ -412,21 +580,14 @@ def api_date_availability(request):
     except ValueError:
         return JsonResponse({'error': 'Invalid date format'}, status=400)
     
-    # Count appointments for AM (before 12:00 PM) and PM (12:00 PM and after)
-    appointments = Appointment.objects.filter(
-        preferred_date=selected_date
-    ).exclude(status='cancelled')
-    
-    am_count = appointments.filter(preferred_time__lt=datetime_time(12, 0)).count()
-    pm_count = appointments.filter(preferred_time__gte=datetime_time(12, 0)).count()
-    
-    # Total slots per session (max 30 per session)
-    TOTAL_SLOTS = 30
+    # Booked AM (before 12:00 PM) and PM (12:00 PM and after) counts for the day
+    [(_, am_count, pm_count)] = get_booked_counts(selected_date, selected_date + timedelta(days=1))
+    table = get_capacity_table()
     
     response = {
         'date': date_str,
-        'am_available': max(TOTAL_SLOTS - am_count, 0),
-        'pm_available': max(TOTAL_SLOTS - pm_count, 0),
+        'am_available': max(table.capacity(selected_date, 'am') - am_count, 0),
+        'pm_available': max(table.capacity(selected_date, 'pm') - pm_count, 0),
         'am_booked': am_count,
         'pm_booked': pm_count
     }
@@ -3,6 +3,11 @@ ASGI config for boacms_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live event stream (appointments/api/events/, used by the booking form and
+the staff dashboard) holds a connection open per browser tab, so it is only
+served under ASGI, e.g. ``uvicorn boacms_project.asgi:application``. Under WSGI
+the endpoint answers 204 and the pages fall back to loading data on demand.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel that carries events between processes
+NOTIFY_CHANNEL = 'boacms_events'
+# Events a slow client may fall behind by before it is told to reload instead
+SUBSCRIBER_QUEUE_SIZE = 100
+# Comment lines sent on idle streams so proxies do not close them
+HEARTBEAT_SECONDS = 15
+# Browsers wait this long before reconnecting a dropped stream
+RETRY_MILLISECONDS = 5000
+
+# Sent in place of the events a client missed, so it reloads its data
+RESET = {'event': 'reset', 'data': {}}
+
+
+class Subscription:
+    """Queue of events for one open stream, filled from any thread."""
+
+    def __init__(self, channels, loop):
+        self.channels = set(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+class EventBroker:
+    """
+    Fan events out to the streams open in this process.
+
+    With Postgres, events are published with NOTIFY and one listener thread
+    per process passes them on, so a booking made by any worker reaches every
+    open stream. Other databases only reach streams in the publishing process.
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions.add(subscription)
+            if connection.vendor == 'postgresql' and self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='event-listener', daemon=True)
+                self.listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def dispatch(self, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            if message is RESET or message['channel'] in subscription.channels:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+
+    def listen(self):
+        wrapper = connections['default']
+        while True:
+            try:
+                listener = wrapper.get_new_connection(wrapper.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                # Anything published while disconnected was lost
+                self.dispatch(RESET)
+                while True:
+                    if not select.select([listener], [], [], HEARTBEAT_SECONDS)[0]:
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        self.dispatch(json.loads(listener.notifies.pop(0).payload))
+            except Exception:
+                logger.exception('Event listener lost its database connection, reconnecting')
+                time.sleep(RETRY_MILLISECONDS / 1000)
+
+
+broker = EventBroker()
+
+
+def publish(channel, event, data):
+    """
+    Send an event to the streams subscribed to ``channel`` once the current transaction commits.
+
+    Args:
+        channel: Name streams subscribe to, e.g. ``'availability'``
+        event: SSE event name the browser listens for
+        data: JSON-serialisable payload (kept small: NOTIFY payloads are capped at 8000 bytes)
+    """
+    message = {'channel': channel, 'event': event, 'data': data}
+    if connection.vendor == 'postgresql':
+        # NOTIFY is delivered on commit and dropped on rollback
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, json.dumps(message, cls=DjangoJSONEncoder)])
+    else:
+        transaction.on_commit(lambda: broker.dispatch(message))
+
+
+def format_event(message):
+    data = json.dumps(message['data'], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"event: {message['event']}\ndata: {data}\n\n"
+
+
+async def event_stream(channels, heartbeat=HEARTBEAT_SECONDS):
+    """Yield Server-Sent Events for ``channels`` until the client disconnects."""
+    subscription = broker.subscribe(channels)
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_event(message)
+    finally:
+        broker.unsubscribe(subscription)
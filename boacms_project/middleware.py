@@ -0,0 +1,97 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Database execute wrapper that counts queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class QueryTimingMiddleware:
+    """
+    Record the query count and database time of every request.
+
+    The numbers are added to the response as a ``Server-Timing`` header (shown
+    in the browser's network panel) and logged. Active when DEBUG or the
+    QUERY_TIMING setting is on. Works under WSGI and ASGI; streaming responses
+    (such as the event stream) are passed through untimed, since their body is
+    produced after the middleware returns.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled():
+            return self.get_response(request)
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        with self.timed_connections(stats):
+            response = self.get_response(request)
+        return self.add_timing(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not self.enabled():
+            return await self.get_response(request)
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        # Connections belong to the thread that runs the ORM, so install the wrappers there
+        stack = await sync_to_async(self.timed_connections)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.add_timing(request, response, stats, started)
+
+    def enabled(self):
+        return settings.DEBUG or getattr(settings, 'QUERY_TIMING', False)
+
+    def timed_connections(self, stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    def add_timing(self, request, response, stats, started):
+        if response.streaming:
+            return response
+        total = time.perf_counter() - started
+
+        timing = f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}, total;dur={total * 1000:.1f}'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        logger.info(
+            '%s %s: %d queries, %.1fms db, %.1fms total',
+            request.method, request.path, stats.count, stats.duration * 1000, total * 1000,
+        )
+        return response
@@ -0,0 +1,129 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from functools import reduce
+
+from django.core.exceptions import BadRequest, FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.shortcuts import render
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class KeysetPage:
+    """One page of a keyset-paginated list and the link to the page after it."""
+
+    def __init__(self, items, next_cursor, request, param):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.next_url = None
+        if self.has_next:
+            params = request.GET.copy()
+            params[param] = next_cursor
+            self.next_url = f"?{params.urlencode()}"
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _field_for(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _cursor_value(model, path, value):
+    try:
+        return _field_for(model, path).to_python(value)
+    except FieldDoesNotExist:
+        # Annotations such as a search rank are stored as plain JSON values
+        return value
+
+
+def _encode_cursor(item, ordering):
+    values = []
+    for field in ordering:
+        value = reduce(getattr, field.lstrip('-').split('__'), item)
+        values.append(value.isoformat() if isinstance(value, (date, datetime, time)) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, model, ordering):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        return [_cursor_value(model, field.lstrip('-'), value) for field, value in zip(ordering, values)]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        raise BadRequest('Invalid page cursor.')
+
+
+def _after(ordering, values):
+    """Build the filter for rows that sort after the cursor values."""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+
+    # The redundant bound on the leading column lets the index seek straight
+    # to the cursor, so deep pages cost the same as the first one
+    first = ordering[0]
+    bound = 'lte' if first.startswith('-') else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+
+def paginate_keyset(request, queryset, ordering, per_page=DEFAULT_PAGE_SIZE, param='cursor'):
+    """
+    Return one page of a queryset using keyset (cursor) pagination.
+
+    Pages are addressed by the sort values of the last row shown rather than
+    an offset, so the cursor stays valid when rows are added and reading page
+    N does not scan the N-1 pages before it.
+
+    Args:
+        request: The current request; the cursor is read from ``request.GET[param]``
+        queryset: Unordered queryset to paginate
+        ordering: Field or annotation names as for order_by(), ending with a unique field
+            such as ``id``. The fields must not be nullable.
+        per_page: Rows per page
+        param: Query string parameter holding the cursor
+
+    Returns:
+        KeysetPage: The rows of this page and the URL of the next one
+
+    Raises:
+        BadRequest: If the cursor in the request is malformed
+    """
+    queryset = queryset.order_by(*ordering)
+    cursor = request.GET.get(param)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, _decode_cursor(cursor, queryset.model, ordering)))
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = _encode_cursor(items[-1], ordering)
+    return KeysetPage(items, next_cursor, request, param)
+
+
+def is_fragment_request(request):
+    """True for the "Load more" fetches, which only need the next rows."""
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def render_fragment(request, template_name, context, page):
+    """Render just the rows of a page, passing the next page's URL in a header."""
+    response = render(request, template_name, context)
+    if page.has_next:
+        response['X-Next-Page'] = page.next_url
+    return response
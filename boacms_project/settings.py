@@ -53,8 +53,28 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'boacms_project.middleware.QueryTimingMiddleware',
 ]
 
+# Adds a Server-Timing header and a log line with the query count and DB time
+# of every request. Always on with DEBUG; set QUERY_TIMING=True to profile otherwise
+QUERY_TIMING = config('QUERY_TIMING', default=False, cast=bool)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # The per-request timing lines are only wanted while debugging or profiling
+        'boacms_project.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO' if DEBUG or QUERY_TIMING else 'WARNING',
+        },
+    },
+}
+
 ROOT_URLCONF = 'boacms_project.urls'
 
 TEMPLATES = [
@@ -91,6 +111,18 @@ DATABASES = {
 }
 
 
+# Cache
+# LocMemCache is per process; set CACHE_BACKEND/CACHE_LOCATION to a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) when running several workers
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='boacms'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -155,20 +187,46 @@ AUTHENTICATION_BACKENDS = (
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are streamed to a temporary file and hashed as they arrive, so
+# memory use per upload stays constant regardless of file size
+FILE_UPLOAD_HANDLERS = [
+    'accounts.uploadhandlers.StreamingDocumentUploadHandler',
+]
+MAX_DOCUMENT_UPLOAD_SIZE = config('MAX_DOCUMENT_UPLOAD_SIZE', default=10 * 1024 * 1024, cast=int)
+
+# Registration documents wait here until `python manage.py process_document_uploads`
+# sends them to Supabase, so the worker must run on the same host as the web process
+DOCUMENT_STAGING_ROOT = config('DOCUMENT_STAGING_ROOT', default=os.path.join(BASE_DIR, 'staged_documents'))
+
+# Audit events older than AUDIT_RETENTION_DAYS are moved here as gzipped JSON
+# lines by `python manage.py archive_audit_events`; point it at cold storage
+AUDIT_ARCHIVE_ROOT = config('AUDIT_ARCHIVE_ROOT', default=os.path.join(BASE_DIR, 'audit_archive'))
+AUDIT_RETENTION_DAYS = config('AUDIT_RETENTION_DAYS', default=180, cast=int)
+
+# Bookings per AM/PM session when no capacity rule (Django admin) applies
+APPOINTMENT_SESSION_CAPACITY = config('APPOINTMENT_SESSION_CAPACITY', default=20, cast=int)
+
 # Email configuration
 # Using Gmail SMTP with App Password for cost-free email service
 # Uncomment and configure these settings with your Gmail credentials
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
 EMAIL_HOST_USER = 'earlgeraldesparcia@gmail.com'  # Replace with your Gmail
 EMAIL_HOST_PASSWORD = 'wojw nghh xvbl ntqw'  # Replace with your 16-character app password
 DEFAULT_FROM_EMAIL = 'earlgeraldesparcia@gmail.com'  # Replace with your Gmail
 
-# For development, continue using console backend to prevent connection errors
-# EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# Emails are queued in the outbox and delivered by `python manage.py send_queued_emails`.
+# For development, set EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend in .env,
+# or point EMAIL_HOST/EMAIL_PORT at a local SMTP stand-in with EMAIL_USE_TLS=False.
 
 # Supabase configuration
 SUPABASE_URL = config('SUPABASE_URL', default='')
-SUPABASE_KEY = config('SUPABASE_KEY', default='')
\ No newline at end of file
+SUPABASE_KEY = config('SUPABASE_KEY', default='')
+# The client is created once per worker process and reuses keep-alive connections
+SUPABASE_TIMEOUT = config('SUPABASE_TIMEOUT', default=30, cast=float)
+SUPABASE_CONNECT_TIMEOUT = config('SUPABASE_CONNECT_TIMEOUT', default=5, cast=float)
+SUPABASE_MAX_CONNECTIONS = config('SUPABASE_MAX_CONNECTIONS', default=10, cast=int)
+SUPABASE_KEEPALIVE_EXPIRY = config('SUPABASE_KEEPALIVE_EXPIRY', default=60, cast=float)
\ No newline at end of file
@@ -0,0 +1,38 @@
+// "Load more" links fetch the next page of a keyset-paginated list as a rows
+// fragment and append it to the table body named in data-load-more.
+document.addEventListener('click', function (event) {
+    const link = event.target.closest('[data-load-more]');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    if (link.classList.contains('is-loading')) {
+        return;
+    }
+    link.classList.add('is-loading');
+
+    fetch(link.href, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            const nextPage = response.headers.get('X-Next-Page');
+            return response.text().then(html => ({ html, nextPage }));
+        })
+        .then(({ html, nextPage }) => {
+            const target = document.querySelector(link.dataset.loadMore);
+            target.insertAdjacentHTML('beforeend', html);
+            target.dispatchEvent(new CustomEvent('rows:loaded', { bubbles: true }));
+
+            if (nextPage) {
+                link.href = nextPage;
+                link.classList.remove('is-loading');
+            } else {
+                link.parentElement.remove();
+            }
+        })
+        .catch(() => {
+            // Fall back to a full page load of the next page
+            window.location.href = link.href;
+        });
+});